@@ -24,11 +24,69 @@ SOFTWARE.
 """
 
 # Import Libraries
-from bs4 import BeautifulSoup, SoupStrainer
+# requests takes most of the time needed to import this module, so it is
+# only loaded when a page is first fetched from the website (see
+# LazyModule below), as are a few slower standard modules that are only
+# needed then. Runs answered from local data never load them.
 import re
-import requests
+import array
+import atexit
+import bisect
+import codecs
+import collections
+import cStringIO
+import csv
+import functools
+import gc
+import hashlib
+import heapq
+import htmlentitydefs
+import itertools
+import importlib
+import json
+import HTMLParser
+import math
+import mmap
 import os.path
+import signal
 import unicodedata
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import urlparse
+import xml.parsers.expat
+import zlib
+
+class LazyModule(object):
+# Stands in for a module until one of its attributes is first used, and
+# only then imports it. Any code may use it as if it were the module.
+#
+# Usage
+# requests = LazyModule('requests')
+# session = requests.Session() # requests is imported here
+#
+# Inputs
+# name: the module's full name
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if(module is None):
+            module = importlib.import_module(self._name)
+            self.__dict__['_module'] = module
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        return '<lazy module %r>' % self._name
+
+requests = LazyModule('requests')
+tempfile = LazyModule('tempfile')
+urllib = LazyModule('urllib')
 
 def open_title_author_csv(file_name):
 # Opens the title/author csv file for editing by the program. If necessary,
@@ -111,6 +169,14 @@ def get_url_segment(name):
     
     # Base URL to add to the internal searches
     url_dict['base_url'] = "http://classify.oclc.org"
+
+    # The same searches and links for the classify XML service
+    url_dict['xml_isbn_search_beg'] = "http://classify.oclc.org/classify2/" \
+              "Classify?summary=true&isbn="
+    url_dict['xml_title_search_beg'] = "http://classify.oclc.org/classify2/" \
+              "Classify?summary=true&title="
+    url_dict['xml_title_search_mid'] = "&author="
+    url_dict['xml_search_url'] = "/classify2/Classify?summary=true&wi="
     
     # Return the requested one
     if(name not in url_dict):
@@ -119,6 +185,97 @@ def get_url_segment(name):
         
     return url_dict[name]
 
+def ISBN_has_valid_format(input_string):
+# Checks the given input string to see if it is shaped like an ISBN
+# number, without checking its check digit.
+#
+# Usage
+# ISBN_has_valid_format(input_string) # returns boolean
+#
+# Inputs
+# input_string: the string to test
+#
+# Outputs
+# boolean if it has the format of an ISBN
+
+    # Verify the ISBN using regex
+    # The first regex checks for an ISBN10 number, which has 10 digits
+    # the last digit can be an x.
+    # The second regex checks for an ISBN13 number, with 13 digits and no
+    # special characters
+    return (bool(re.search(r'^\d{9}[\dX]$', input_string, re.IGNORECASE)) or
+            bool(re.search(r'^\d{13}$', input_string)))
+
+def ISBN_has_valid_check_digit(ISBN):
+# Checks the last digit of an ISBN against the rest of its digits, which
+# catches most typos. The ISBN must already have a valid format.
+#
+# Usage
+# ISBN_has_valid_check_digit(ISBN) # returns boolean
+#
+# Inputs
+# ISBN: a string containing a 10 or 13 digit ISBN
+#
+# Outputs
+# boolean: true if the check digit matches
+
+    if(len(ISBN) == 10):
+        # ISBN-10: weights 10 down to 1, the total must divide by 11.
+        # An X stands for 10 in the last place.
+        if(not ISBN[:9].isdigit() or
+           not (ISBN[9].isdigit() or ISBN[9] in 'xX')):
+            return False
+        digits = [int(c) for c in ISBN[:9]]
+        digits.append(10 if ISBN[9] in 'xX' else int(ISBN[9]))
+        return sum((10 - i) * d for i, d in enumerate(digits)) % 11 == 0
+
+    # ISBN-13: alternating weights of 1 and 3, the total must divide by 10
+    if(not ISBN.isdigit()):
+        return False
+    return sum((3 if i % 2 else 1) * int(c)
+               for i, c in enumerate(ISBN)) % 10 == 0
+
+def canonical_ISBN(ISBN):
+# Converts a valid ISBN-10 or ISBN-13 into its ISBN-13 form, so both
+# forms of the same book share one key.
+#
+# Usage
+# key = canonical_ISBN(ISBN)
+#
+# Inputs
+# ISBN: a string containing a valid ISBN (see is_ISBN)
+#
+# Outputs
+# key: a string containing the 13 digit ISBN
+
+    if(len(ISBN) == 13):
+        return ISBN
+
+    # ISBN-10s become 978 + the first nine digits + a new check digit
+    return ISBN_13_check_digit('978' + ISBN[:9])
+
+def ISBN_13_check_digit(digits):
+# Adds the check digit to the first 12 digits of an ISBN-13
+
+    total = sum((3 if i % 2 else 1) * int(c) for i, c in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+def is_ISBN(input_string):
+# Checks the given input string to see if it is an ISBN number with a
+# correct check digit, without printing anything.
+#
+# Usage
+# is_ISBN(input_string) # returns boolean
+#
+# Inputs
+# input_string: the string to test
+#
+# Outputs
+# boolean if it is a ISBN
+
+    return (ISBN_has_valid_format(input_string) and
+            ISBN_has_valid_check_digit(input_string))
+
 def validate_ISBN(input_string):
 # Checks the given input string to see if it is an ISBN number. 
 # Returns a boolean
@@ -132,99 +289,382 @@ def validate_ISBN(input_string):
 # Outputs
 # boolean if it is a ISBN
  
-    # Verify the ISBN using regex
-    # The first regex checks for an ISBN10 number, which has 10 digits
-    # the last digit can be an x.
-    # The second regex checks for an ISBN13 number, with 13 digits and no
-    # special characters
-    if(bool(re.search(r'^\d{9}[\d|X]$', input_string, re.IGNORECASE)) or
-       bool(re.search(r'^\d{13}$', input_string)) ):
-           return True
+    if(is_ISBN(input_string)):
+        return True
         
-    print "    ERROR: ISBN is not valid. " \
-               "It should contain 10 or 13 characters."
+    if(ISBN_has_valid_format(input_string)):
+        print "    ERROR: ISBN is not valid. " \
+                   "Its check digit does not match, so it may have a typo."
+    else:
+        print "    ERROR: ISBN is not valid. " \
+                   "It should contain 10 or 13 characters."
     print "           Please try again."
     return False
     
-def get_classify_info(page):
-# Attempts to parse a classify.oclc.org webpage and scrape the title,
-# author, and LC Classification. If it fails, it will return empty
-# strings for each of these values.
+class ClassifyPageParser(HTMLParser.HTMLParser):
+# Reads a classify.oclc.org webpage in a single pass, collecting the
+# result links and the fields of the book's summary as the text goes by.
+# The text is split into non-blank lines, and the fields are found by
+# their position after their label, as the BeautifulSoup code it
+# replaced did (get_classify_info, kept in tests/bs4_extractors.py to
+# check against). That code also skipped the last line of the page, and
+# failed on a field found there; this parser reads it.
+#
+# Usage
+# parser = ClassifyPageParser()
+# parser.feed(text) # may be called several times
+# parser.close()
+# record = parser.record()
+
+    # Lines after each label that hold the field's value. The DDC row of
+    # the class scheme table is laid out the same way as the LCC row.
+    field_offsets = {'Title:': ('title', 1),
+                     'Author:': ('author', 1),
+                     'DDC:': ('ddc', 5),
+                     'LCC:': ('lcc', 5)}
+
+    def __init__(self):
+        HTMLParser.HTMLParser.__init__(self)
+        self.search_url = get_url_segment('search_url')
+        self.fields = {}
+        self.links = []
+        self.line = []
+        self.in_summary = False
+        self.labels_seen = set()
+        self.pending = [] # [field name, lines left] for labels being read
+        self.skip_depth = 0 # > 0 inside <script> and <style>
+
+    def handle_starttag(self, tag, attrs):
+        if(tag == 'a'):
+            for name, value in attrs:
+                if(name == 'href' and value and self.search_url in value):
+                    self.links.append(value)
+        elif(tag in ('script', 'style')):
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if(tag in ('script', 'style') and self.skip_depth > 0):
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if(self.skip_depth > 0):
+            return
+
+        # Each newline in the text ends the current line
+        parts = data.split('\n')
+        self.line.append(parts[0])
+        for part in parts[1:]:
+            self.end_line()
+            self.line.append(part)
+
+    def handle_entityref(self, name):
+        if(name in htmlentitydefs.name2codepoint):
+            self.handle_data(unichr(htmlentitydefs.name2codepoint[name]))
+        else:
+            self.handle_data('&' + name)
+
+    def handle_charref(self, name):
+        try:
+            if(name[0] in 'xX'):
+                self.handle_data(unichr(int(name[1:], 16)))
+            else:
+                self.handle_data(unichr(int(name)))
+        except ValueError:
+            self.handle_data('&#' + name)
+
+    def end_line(self):
+    # Processes the line collected so far
+
+        line = ''.join(self.line)
+        self.line = []
+        if(line == ''):
+            return
+
+        if(not self.in_summary):
+            self.in_summary = (line == "Summary")
+            return
+
+        # Count down the labels waiting for their values
+        for waiting in self.pending:
+            waiting[1] -= 1
+            if(waiting[1] == 0):
+                self.fields[waiting[0]] = line
+        self.pending = [waiting for waiting in self.pending if waiting[1] > 0]
+
+        # Only the first occurrence of each label is used
+        if(line in self.field_offsets and line not in self.labels_seen):
+            self.labels_seen.add(line)
+            self.pending.append(list(self.field_offsets[line]))
+
+    def close(self):
+        HTMLParser.HTMLParser.close(self)
+        self.end_line()
+
+    def complete(self):
+    # Returns True once the title, author and LCC have all been found and
+    # no label is still waiting for its value
+
+        return ('title' in self.fields and 'author' in self.fields and
+                'lcc' in self.fields and not self.pending)
+
+    def record(self):
+    # Returns the fields and links found so far as a dictionary
+
+        return {'title': self.fields.get('title', ''),
+                'author': self.fields.get('author', ''),
+                'lcc': self.fields.get('lcc', ''),
+                'ddc': self.fields.get('ddc', ''),
+                'links': list(self.links)}
+
+def extract_classify_page(page):
+# Gets everything needed from a classify.oclc.org webpage in a single
+# pass: the title, author, LCC and DDC of the book, and the links to
+# other search results.
 #
 # Usage
-# title, author, LCC = get_classify_info(page)
+# record = extract_classify_page(page)
 #
 # Inputs
-# page: The page returned by requests.get
+# page: The page returned by fetch_page
 #
 # Outputs
-# title: a string containing the title.
-# author: a string containing the author.
-# LCC: a string containing the LCC classification.
-# All of these will be blank if the webpage doesn't contain this information
+# record: a dictionary with the keys
+#         title, author, lcc, ddc: strings, blank if not on the page
+#         links: a list of strings, each a link to a search result
 
-    # Convert the HTML file into an organized array
-    soup = BeautifulSoup(page.text)
+    parser = ClassifyPageParser()
+    parser.feed(page.text)
+    parser.close()
+    return parser.record()
 
-    text = soup.get_text()
-    data =  filter(None,text.split('\n'))
-    
-    # Search for the title, author, and LCC
-    try:
-        data = data[data.index("Summary"):-1]
-    except ValueError:
-        return '','',''
-    
-    try:
-        i_title = data.index("Title:")+1
-        title = data[i_title]
-    except ValueError:
-        title = ''
-        
-    try:
-        i_author = data.index("Author:")+1
-        author = data[i_author]
-    except ValueError:
-        author = ''
-        
-    try:
-        i_lcc = data.index("LCC:")+5
-        lcc = data[i_lcc]
-    except ValueError:
-        lcc = ''
+class ClassifyXMLParser(object):
+# Reads a response from the classify XML service (the Classify API, as
+# opposed to the ClassifyDemo pages) as it arrives, with the same methods
+# as ClassifyPageParser. A response for a single work holds its title and
+# author as attributes of <work>, and its LCC and DDC as the sfa
+# attribute of <mostPopular> under <recommendations>. A response listing
+# several works (code 4) holds a <work> for each one, whose wi attribute
+# becomes a link to that work's own response.
+#
+# Usage
+# parser = ClassifyXMLParser()
+# parser.feed(data) # may be called several times
+# parser.close()
+# record = parser.record()
 
-    # Return the data
-    return title, author, lcc
-    
-def get_classify_search_links(page):
-# Gets all links for books to search through on a classify.oclc.org
-# webpage. It assumes that books will start on the 8th link
-# (found through empirical testing) and will be an internal link,
-# beginning with /classify2/ClassifyDemo?wi=
+    # The parser is given the raw bytes, since the XML declares its own
+    # encoding
+    reads_bytes = True
+
+    def __init__(self):
+        self.search_url = get_url_segment('xml_search_url')
+        self.fields = {}
+        self.links = []
+        self.path = []
+        self.failed = False
+        self.parser = xml.parsers.expat.ParserCreate()
+        self.parser.StartElementHandler = self.start_element
+        self.parser.EndElementHandler = self.end_element
+
+    def start_element(self, name, attrs):
+        # Drop any namespace prefix
+        name = name.rsplit(':', 1)[-1]
+        parent = self.path[-1] if self.path else None
+        self.path.append(name)
+
+        if(name == 'response'):
+            self.fields['code'] = attrs.get('code', '')
+        elif(name == 'work' and parent == 'classify'):
+            self.fields.setdefault('title', attrs.get('title', ''))
+            self.fields.setdefault('author', attrs.get('author', ''))
+        elif(name == 'work' and parent == 'works'):
+            if(attrs.get('wi')):
+                self.links.append(self.search_url + attrs['wi'])
+        elif(name == 'mostPopular' and parent in ('lcc', 'ddc') and
+             'recommendations' in self.path):
+            # Only the first (most popular) class number is used
+            self.fields.setdefault(parent,
+                                   attrs.get('sfa') or attrs.get('nsfa', ''))
+
+    def end_element(self, name):
+        self.path.pop()
+
+    def feed(self, data):
+        if(self.failed):
+            return
+        if(isinstance(data, unicode)):
+            data = data.encode('utf-8')
+        try:
+            self.parser.Parse(data, False)
+        except xml.parsers.expat.ExpatError:
+            # Keep what was found before the error, like HTMLParser does
+            self.failed = True
+
+    def close(self):
+        self.feed('')
+        if(not self.failed):
+            try:
+                self.parser.Parse('', True)
+            except xml.parsers.expat.ExpatError:
+                self.failed = True
+
+    def complete(self):
+    # Returns True once the title, author and LCC have all been found
+
+        return ('title' in self.fields and 'author' in self.fields and
+                'lcc' in self.fields)
+
+    def record(self):
+    # Returns the fields and links found so far, in the same dictionary
+    # as ClassifyPageParser.record
+
+        return {'title': self.fields.get('title', ''),
+                'author': self.fields.get('author', ''),
+                'lcc': self.fields.get('lcc', ''),
+                'ddc': self.fields.get('ddc', ''),
+                'links': list(self.links)}
+
+class ClassifyServiceParser(object):
+# Reads a response from an lcc_server.py lookup service, with the same
+# methods as ClassifyPageParser. The service answers each search with a
+# small JSON object holding the title, author and LCC it found, so there
+# are never any links to follow. Any other status than 200 (found) or 404
+# (not found), or an object with an error, means the lookup failed (see
+# check_classify_response). The service keeps its own results, so its
+# responses are not stored in the response cache.
 #
 # Usage
-# links = get_classify_search_links(soup)
+# parser = ClassifyServiceParser()
+# parser.feed(data)
+# parser.close()
+# record = parser.record()
+
+    reads_bytes = True
+    ok_statuses = (200, 404)
+    cacheable = False
+
+    def __init__(self):
+        self.chunks = []
+        self.fields = {}
+
+    def feed(self, data):
+        self.chunks.append(data)
+
+    def close(self):
+        try:
+            fields = json.loads(''.join(self.chunks))
+        except ValueError:
+            return
+        if(isinstance(fields, dict)):
+            self.fields = fields
+
+    def complete(self):
+    # The JSON can only be read once all of it has arrived
+
+        return False
+
+    def record(self):
+        return {'title': self.fields.get('title') or '',
+                'author': self.fields.get('author') or '',
+                'lcc': self.fields.get('lcc') or '',
+                'ddc': '',
+                'links': [],
+                'error': self.fields.get('error') or ''}
+
+def parse_page_content(content, encoding, parser_name):
+# Reads a whole page from its bytes with the named parser class. This is
+# the work done by the parsing processes (see open_parse_pool), so it
+# takes and returns only plain strings, lists and dictionaries.
 #
 # Inputs
-# page: The output of responses.get(url)
+# content: the bytes of the page
+# encoding: the page's encoding, or None for utf-8
+# parser_name: the name of one of the parser classes
 #
 # Outputs
-# links: an array of strings, each string is a link to a search result
+# record: the dictionary described in extract_classify_page
+
+    parsers = {'ClassifyPageParser': ClassifyPageParser,
+               'ClassifyXMLParser': ClassifyXMLParser,
+               'ClassifyServiceParser': ClassifyServiceParser}
+    parser_class = parsers[parser_name]
+    parser = parser_class()
+    if(getattr(parser_class, 'reads_bytes', False)):
+        parser.feed(content)
+    else:
+        parser.feed(content.decode(encoding or 'utf-8', 'replace'))
+    parser.close()
+    return parser.record()
+
+def parse_classify_page(page, parser_class):
+# Reads a whole page with the given parser class and returns its record.
+# Parsers with reads_bytes set are given the page's bytes, and the rest
+# its text. If a parsing pool is open, the page is parsed in one of its
+# processes.
+
+    if(parse_pool is not None):
+        return parse_pool.apply(parse_page_content,
+                                (page.content, page.encoding,
+                                 parser_class.__name__))
+
+    parser = parser_class()
+    if(getattr(parser_class, 'reads_bytes', False)):
+        parser.feed(page.content)
+    else:
+        parser.feed(page.text)
+    parser.close()
+    return parser.record()
+
+parse_pool = None
+
+def ignore_interrupts():
+# Leaves Ctrl-C to the main process, which stops the parsing processes
+# itself
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def open_parse_pool(processes=None):
+# Starts a pool of processes to parse pages in. Parsing holds the GIL, so
+# with many fetch threads it becomes the limit on how fast a batch runs;
+# parsing in separate processes lets it use every core. Once the pool is
+# open, fetch_classify_record reads each page whole and hands its bytes
+# to the pool, which sends back only the record.
+#
+# On Windows, each new process runs the calling script again from the
+# top, so no pool is started there and pages are parsed as before.
+#
+# Usage
+# open_parse_pool(4)
+#
+# Inputs
+# processes: the number of processes, or None for one per core
+#
+# Outputs
+# pool: the multiprocessing.Pool now in use, or None on Windows
+
+    global parse_pool
+
+    if(os.name == 'nt'):
+        return None
+
+    import multiprocessing
+    pool = multiprocessing.Pool(processes, ignore_interrupts)
+    parse_pool = pool
+    atexit.register(close_parse_pool)
+    return pool
+
+def close_parse_pool():
+# Stops the parsing processes. Pages are parsed in the calling thread
+# again afterwards.
+
+    global parse_pool
+
+    pool = parse_pool
+    if(pool is not None):
+        parse_pool = None
+        pool.close()
+        pool.join()
 
-    # The constant part of an internal classify search link
-    search_url = get_url_segment('search_url')
-    
-    # Extract all the hyperlinks from the webpage
-    a_tags = BeautifulSoup(page.text, parse_only=SoupStrainer('a'))
-    links = []
-    for link in a_tags.find_all('a'):
-        href = link.get('href')
-        # If they match the URL for a search result, add them to the list
-        if(search_url in href):
-            links.append(href)
-            
-    return links
-    
 def user_validation(title,author,lcc):
 # Requests the user to validate the search's results. Returns a boolean
 # based off the users response. It also detects when a user enters in
@@ -258,12 +698,14 @@ def user_validation(title,author,lcc):
     # Ask user if it is correct, and give directions
     print("\nPress enter if this information is correct")
     print "Type n if the information is not correct"
-    query = raw_input("\n    Is this correct? ")
+    with metrics.timer('validation_wait_seconds'):
+        query = raw_input("\n    Is this correct? ")
     
     query = query.lower()
     # Read user input, and act on it
     # If the query indicated yes, return true
     if(query == "" or query == 'y' or query == 'yes'):
+        metrics.count('validations_total', labels={'answer': 'yes'})
         return True
         
     # If it seems like the user tried to enter a new book, catch and respond
@@ -276,6 +718,7 @@ def user_validation(title,author,lcc):
         
     else:
         print "    User indicated incorrect data. Data was not saved.\n"
+        metrics.count('validations_total', labels={'answer': 'no'})
         return False
     
 def validate_info(title, author, lcc):
@@ -295,6 +738,23 @@ def validate_info(title, author, lcc):
 # boolean: true if it appears to be a valid LCC, false otherwise
 
     return len(title)!=0 and len(lcc)>3
+
+def validate_record(record):
+# Validates a BookRecord like validate_info, except that a book from the
+# offline LCC index needs no title, since the dumps often have none.
+#
+# Usage
+# validate_record(record) # returns boolean
+#
+# Inputs
+# record: the BookRecord returned by a search
+#
+# Outputs
+# boolean: true if it appears to be a valid LCC, false otherwise
+
+    if(getattr(record, 'offline', False)):
+        return len(record.lcc)>3
+    return validate_info(*record)
     
 def title_author_search_url(title, author):
 # Generates a search URL for classify.oclc.org from the title and author.
@@ -338,121 +798,4168 @@ def isbn_search_url(isbn):
     
     return get_url_segment('isbn_search_beg') + isbn
     
-def search_classify(*args):
-# Searches classify.oclc.org for the specified ISBN or title and author.
-# If it is not found, then the title, author and LCC will be blank.
+class HTMLClassifyBackend(object):
+# Searches classify.oclc.org through its ClassifyDemo web pages, the way
+# this program always has. The search URLs, the parser for the responses
+# and the links between them are kept together, so that search_classify
+# can use another backend (see XMLClassifyBackend) the same way.
 #
 # Usage
-# title, author, lcc = search_classify(ISBN, link_limit)
-# title, author, lcc = search_classify(title, author, link_limit)
+# backend = HTMLClassifyBackend()
+# url = backend.isbn_search_url(ISBN)
+# record = fetch_classify_record(url, parser_class=backend.parser_class)
+# url = backend.link_url(record['links'][0])
 #
-# Inputs:
-# ISBN: a string containing the ISBN
-# title: a string containing the title
-# author: a string containing the author
-# link_limit: the number of links to search through before giving up
-#             A value of -1 will search through all links.
+# Inputs
+# base_url: the scheme and host to send searches to, or None for
+#           classify.oclc.org
+
+    name = 'html'
+    parser_class = ClassifyPageParser
+
+    def __init__(self, base_url=None):
+        self.base_url = (base_url or get_url_segment('base_url')).rstrip('/')
+
+    def rebase(self, url):
+    # Moves a classify.oclc.org URL to the backend's base URL
+
+        default = get_url_segment('base_url')
+        if(url.startswith(default)):
+            url = self.base_url + url[len(default):]
+        return url
+
+    def isbn_search_url(self, ISBN):
+        return self.rebase(isbn_search_url(ISBN))
+
+    def title_author_search_url(self, title, author):
+        return self.rebase(title_author_search_url(title, author))
+
+    def link_url(self, link):
+    # Converts a link found by the parser into a full URL
+
+        return self.base_url + link
+
+class XMLClassifyBackend(HTMLClassifyBackend):
+# Searches the classify XML service instead of the web pages. Its
+# responses are a small fraction of the size of the pages and are read
+# with an incremental XML parser (ClassifyXMLParser), while the results
+# are the same records, so everything built on search_classify works
+# unchanged.
 #
-# Outputs:
-# title: string containing the title of the book
-# author: string containing the author of the book
-# lcc: string containing the LC classification of the book
+# Usage
+# configure_classify(backend='xml')
+# configure_classify(backend='xml', base_url='http://localhost:8080')
 
-    # Figure out which case we have, ISBN or title/author
-    # and generate the URL
-    if(len(args) == 2): # ISBN case
-        ISBN = args[0]
-        link_limit = args[1]
-        url = isbn_search_url(ISBN)
-        
-    elif(len(args) == 3):
-        title = args[0]
-        author = args[1]
-        link_limit = args[2]
-        url = title_author_search_url(title, author)
-    else:
-        raise TypeError("Invalid number of arguments for search_classify")
-        
-    try: 
-        page = requests.get(url)
-    except requests.ConnectionError:
-        print "    ERROR: Unable to access website. "\
-                   "Check your internet connection."
-        return '','',''
+    name = 'xml'
+    parser_class = ClassifyXMLParser
 
-    # Attempt to get the book's information
-    title, author, lcc = get_classify_info(page)
+    def isbn_search_url(self, ISBN):
+        return self.rebase(get_url_segment('xml_isbn_search_beg') +
+                           urllib.quote(ISBN))
 
-    # If I have the information, simply print that
-    if(validate_info(title, author, lcc)):
-        if(user_validation(title, author, lcc)):  
-            return title, author, lcc
-        
-    # Otherwise, get the links
-    links = get_classify_search_links(page)
+    def title_author_search_url(self, title, author):
+        if(isinstance(title, unicode)):
+            title = title.encode('utf-8')
+        if(isinstance(author, unicode)):
+            author = author.encode('utf-8')
+        return self.rebase(get_url_segment('xml_title_search_beg') +
+                           urllib.quote(title) +
+                           get_url_segment('xml_title_search_mid') +
+                           urllib.quote(author))
 
-    # Cycle through each link, searching for a valid pag014e 
-    # The number of links is limited in case many links are returned
-    for link in links[:link_limit]:
-        
-        url = get_url_segment('base_url') + link
-        page = requests.get(url)
-        title, author, lcc = get_classify_info(page)
-        if(validate_info(title, author, lcc)):
-            if(user_validation(title, author, lcc)):
-                return title, author, lcc
-                
-        print "Searching for other options..."
-            
-    # If I reach here, no valid box was found, return error
-    return '','',''
+class ServiceClassifyBackend(HTMLClassifyBackend):
+# Looks books up through an lcc_server.py service shared by several
+# stations, instead of each station searching classify.oclc.org itself.
+# The service follows the result links, so a search is a single request.
+#
+# Usage
+# configure_classify(backend='service', base_url='http://localhost:8090')
 
-def write_title_author_csv(title, author, lcc, csv):
-# Writes the title and author to the next line of the CSV file.
-# It will first convert the unicode to ascii for display purposes,
-# and then write them to the file in the proper format.
+    name = 'service'
+    parser_class = ClassifyServiceParser
+
+    def __init__(self, base_url=None):
+        if(base_url is None):
+            raise ValueError('The service backend needs the base_url of '
+                             'an lcc_server.py service')
+        HTMLClassifyBackend.__init__(self, base_url)
+
+    def isbn_search_url(self, ISBN):
+        return self.base_url + '/lcc?' + urllib.urlencode({'isbn': ISBN})
+
+    def title_author_search_url(self, title, author):
+        if(isinstance(title, unicode)):
+            title = title.encode('utf-8')
+        if(isinstance(author, unicode)):
+            author = author.encode('utf-8')
+        return self.base_url + '/lcc?' + urllib.urlencode(
+            [('title', title), ('author', author)])
+
+classify_backends = {
+    'html': HTMLClassifyBackend,
+    'xml': XMLClassifyBackend,
+    'service': ServiceClassifyBackend,
+}
+
+classify_settings = {
+    'backend': 'html', # a name in classify_backends
+    'base_url': None, # None for classify.oclc.org (required for service)
+}
+
+classify_backend = None
+classify_backend_lock = threading.Lock()
+
+def configure_classify(**settings):
+# Chooses how search_classify talks to the classify service. Any search
+# started afterwards uses the new settings.
 #
 # Usage
-# write_title_author_csv(title, author, lcc, csv)
+# configure_classify(backend='xml')
+# configure_classify(backend='xml', base_url='http://localhost:8080')
 #
 # Inputs
-# title: string holding the title
-# author: string holding the author
-# lcc: string holding the Library of Congress Classification
-# csv: CSV opened or created by open_title_author_csv
+# settings: keyword arguments with the names of classify_settings
+
+    global classify_backend
+
+    for name in settings:
+        if(name not in classify_settings):
+            raise ValueError(name + ' is not a classify setting')
+    if(settings.get('backend', classify_settings['backend'])
+       not in classify_backends):
+        raise ValueError(settings['backend'] +
+                         ' is not a classify backend')
+
+    with classify_backend_lock:
+        classify_settings.update(settings)
+        classify_backend = None
+
+def get_classify_backend():
+# Returns the backend chosen by configure_classify, creating it if
+# necessary.
 #
-# Warning
-# This function does not verify that you are writing to the
-# title_author_csv file. It simply will append to that file
+# Usage
+# backend = get_classify_backend()
 
-    # Convert title and author to ascii equivalents
-    title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore')
-    author = unicodedata.normalize('NFKD', author).encode('ascii', 'ignore')
+    global classify_backend
 
-    # Write to the file
-    csv.write('"'+title+'","'+author+'","'+lcc+'"\n')
-    csv.flush() #Force writing to the file (rather than buffering)
+    with classify_backend_lock:
+        if(classify_backend is None):
+            backend_class = classify_backends[classify_settings['backend']]
+            classify_backend = backend_class(classify_settings['base_url'])
+        return classify_backend
 
-def write_isbn_csv(ISBN, lcc, csv):
-# Writes the ISBN and LCC to the ISBN csv file. Currently, no extra
-# processing is done for the file.
+def service_url_argument(argv):
+# Returns the URL given after --service on the command line, or None if
+# --service was not given. If the URL is missing (or another option is
+# in its place), how to give it is printed and the program exits.
 #
 # Usage
-# write_isbn_csv(ISBN, lcc, csv)
+# url = service_url_argument(sys.argv)
+
+    if('--service' not in argv[1:]):
+        return None
+
+    position = argv.index('--service', 1) + 1
+    if(position >= len(argv) or
+       not argv[position].startswith(('http://', 'https://'))):
+        print "Usage: python " + os.path.basename(argv[0]) + \
+              " --service http://host:8090"
+        print "--service needs the URL of an lcc_server.py service"
+        sys.exit(2)
+    return argv[position]
+
+# Upper bounds, in seconds, of the buckets timings are counted in. They
+# run from a millisecond (a cached page) to minutes (a user away from the
+# keyboard).
+metrics_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+class Histogram(object):
+# Counts timings in fixed buckets, so their spread can be reported
+# without keeping every value.
+#
+# Usage
+# histogram = Histogram()
+# histogram.observe(seconds)
+# p90 = histogram.quantile(0.9)
 #
 # Inputs
-# ISBN: string containing the ISBN
-# lcc: string containing the Library of Congress Classification
-# csv: file object returned by open_isbn_csv
+# buckets: a sorted tuple of bucket upper bounds
+
+    def __init__(self, buckets=metrics_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+    # Returns the upper bound of the bucket holding the q quantile, or
+    # None if nothing has been observed
+
+        if(self.count == 0):
+            return None
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if(total >= rank):
+                return bound
+        return float('inf')
+
+    def cumulative_counts(self):
+    # Returns (upper bound, number of values at or below it) for every
+    # bucket, ending with +Inf
+
+        counts = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            counts.append((bound, total))
+        return counts
+
+class MetricsTimer(object):
+# Times a block of code into a histogram of a MetricsRegistry.
 #
-# Warning
-# This function does not verify that you are writing to the isbn_csv file.
-# It will simply append to that file.
+# Usage
+# with metrics.timer('fetch_seconds'):
 
-    # Save the information to the CSV file
-    csv.write('"'+ISBN+'","'+lcc+'"\n')
-    csv.flush() #Force writing to the file (rather than buffering)
+    def __init__(self, registry, name, labels=None):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.registry.observe(self.name, time.time() - self.start,
+                              self.labels)
+
+class MetricsRegistry(object):
+# Counters and timing histograms for each stage of a lookup, so a slow
+# session can be traced to the network, parsing, the user or the disk.
+# Each metric is named, and may carry labels such as an HTTP status.
+# Safe to use from several threads.
+#
+# Usage
+# metrics.count('cache_hits_total')
+# metrics.observe('parse_seconds', seconds)
+# with metrics.timer('csv_write_seconds'):
+# print metrics.to_prometheus()
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+    # Clears every metric
+
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.start_time = time.time()
+
+    def count(self, name, amount=1, labels=None):
+    # Adds amount to a counter
+
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, labels=None):
+    # Adds a timing to a histogram
+
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if(histogram is None):
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name, labels=None):
+    # Returns a context manager that times its block into a histogram
+
+        return MetricsTimer(self, name, labels)
+
+    def snapshot(self):
+    # Returns the metrics as a dictionary of plain values, suitable for
+    # JSON. Counters and histograms are listed with their labels, and each
+    # histogram gives its count, sum, estimated quantiles and buckets.
+
+        with self.lock:
+            counters = [{'name': name, 'labels': dict(labels),
+                         'value': value}
+                        for (name, labels), value
+                        in sorted(self.counters.iteritems())]
+            histograms = []
+            for (name, labels), histogram in \
+                    sorted(self.histograms.iteritems()):
+                histograms.append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'p50': histogram.quantile(0.5),
+                    'p90': histogram.quantile(0.9),
+                    'p99': histogram.quantile(0.99),
+                    'buckets': [[str(bound), total] for bound, total
+                                in histogram.cumulative_counts()],
+                })
+            start_time = self.start_time
+
+        return {'start_time': start_time,
+                'uptime_seconds': time.time() - start_time,
+                'counters': counters,
+                'histograms': histograms}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix='booktolcc_'):
+    # Returns the metrics in the Prometheus text exposition format
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if(not pairs):
+                return ''
+            return '{' + ','.join('%s="%s"' % (key, str(value).
+                                               replace('\\', '\\\\').
+                                               replace('"', '\\"'))
+                                  for key, value in pairs) + '}'
+
+        lines = ['# TYPE %sstart_time_seconds gauge' % prefix,
+                 '%sstart_time_seconds %f' % (prefix, self.start_time)]
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.iteritems()):
+                if(name not in typed):
+                    typed.add(name)
+                    lines.append('# TYPE %s%s counter' % (prefix, name))
+                lines.append('%s%s%s %d' % (prefix, name, label_text(labels),
+                                            value))
+
+            for (name, labels), histogram in \
+                    sorted(self.histograms.iteritems()):
+                if(name not in typed):
+                    typed.add(name)
+                    lines.append('# TYPE %s%s histogram' % (prefix, name))
+                for bound, total in histogram.cumulative_counts():
+                    if(bound == float('inf')):
+                        bound = '+Inf'
+                    lines.append('%s%s_bucket%s %d' % (
+                        prefix, name, label_text(labels, [('le', bound)]),
+                        total))
+                lines.append('%s%s_sum%s %f' % (prefix, name,
+                                                label_text(labels),
+                                                histogram.sum))
+                lines.append('%s%s_count%s %d' % (prefix, name,
+                                                  label_text(labels),
+                                                  histogram.count))
+
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+def write_metrics(json_file_name=None, prometheus_file_name=None):
+# Writes a snapshot of the metrics to a JSON file, a Prometheus text
+# file, or both. Each file is written under a temporary name and then
+# renamed, so a reader never sees half a file.
+#
+# Usage
+# write_metrics("LookupMetrics.json", "LookupMetrics.prom")
+
+    for file_name, text in ((json_file_name, metrics.to_json),
+                            (prometheus_file_name, metrics.to_prometheus)):
+        if(file_name is None):
+            continue
+        temp_name = file_name + '.tmp'
+        with open(temp_name, 'w') as metrics_file:
+            metrics_file.write(text())
+        if(os.name == 'nt' and os.path.isfile(file_name)):
+            # Windows cannot rename over an existing file
+            os.remove(file_name)
+        os.rename(temp_name, file_name)
+
+def export_metrics(json_file_name=None, prometheus_file_name=None,
+                   interval=None):
+# Writes the metrics files when the program exits, and also every
+# interval seconds if one is given, so that a long run can be watched
+# while it works.
+#
+# Usage
+# export_metrics("LookupMetrics.json", "LookupMetrics.prom")
+# export_metrics(None, "LookupMetrics.prom", interval=15)
+#
+# Inputs
+# json_file_name: the JSON file to write, or None
+# prometheus_file_name: the Prometheus text file to write, or None
+# interval: seconds between writes while running, or None
+
+    write = functools.partial(write_metrics, json_file_name,
+                              prometheus_file_name)
+    atexit.register(write)
+
+    if(interval is not None):
+        def write_periodically():
+            while(1):
+                time.sleep(interval)
+                write()
+
+        thread = threading.Thread(target=write_periodically)
+        thread.daemon = True
+        thread.start()
+
+class SamplingProfiler(object):
+# Samples the call stack of every thread at a fixed interval, to find
+# where a session spends its time without slowing every call the way a
+# deterministic profiler does. The samples are written as collapsed
+# stacks (one "frame;frame;frame count" line per stack), which
+# flamegraph.pl and speedscope read directly. Threads waiting on the
+# network or the user are sampled too, so the profile shows wall time,
+# not just CPU time.
+#
+# Usage
+# profiler = SamplingProfiler()
+# profiler.start()
+# ...
+# profiler.stop()
+# profiler.write_collapsed(file_name)
+#
+# Inputs
+# interval: seconds between samples
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = {}
+        self.running = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.running.set()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        if(self.thread is not None):
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        own_id = threading.current_thread().ident
+        while(self.running.is_set()):
+            names = dict((thread.ident, thread.name)
+                         for thread in threading.enumerate())
+            for thread_id, frame in sys._current_frames().items():
+                if(thread_id == own_id):
+                    continue
+                stack = []
+                while(frame is not None):
+                    code = frame.f_code
+                    stack.append('%s:%s' % (os.path.basename(code.co_filename),
+                                            code.co_name))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, 'thread'))
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            time.sleep(self.interval)
+
+    def write_collapsed(self, file_name):
+    # Writes the samples as collapsed stacks, the most common first
+
+        with open(file_name, 'w') as profile_file:
+            for stack, count in sorted(self.stacks.iteritems(),
+                                       key=lambda item: -item[1]):
+                profile_file.write('%s %d\n' % (stack, count))
+
+class AllocationTracker(object):
+# Tracks where memory is allocated during a session. With tracemalloc
+# (Python 3.4 and later, or a patched Python 2), the report lists the
+# lines of code that allocated the most memory still in use. Without it,
+# the report lists the kinds of objects whose numbers grew the most,
+# which points at the same data structures.
+#
+# Usage
+# tracker = AllocationTracker()
+# tracker.start()
+# ...
+# print tracker.report(25)
+
+    def __init__(self):
+        try:
+            import tracemalloc
+        except ImportError:
+            tracemalloc = None
+        self.tracemalloc = tracemalloc
+        self.start_counts = None
+
+    def start(self):
+        if(self.tracemalloc is not None):
+            self.tracemalloc.start(25)
+        else:
+            self.start_counts = self._type_counts()
+
+    def _type_counts(self):
+        counts = {}
+        for item in gc.get_objects():
+            name = type(item).__name__
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def report(self, top=25):
+    # Returns a text report of the top allocation sites or object types
+
+        lines = []
+        if(self.tracemalloc is not None):
+            snapshot = self.tracemalloc.take_snapshot()
+            current, peak = self.tracemalloc.get_traced_memory()
+            lines.append('Traced memory: %d KiB now, %d KiB at peak'
+                         % (current // 1024, peak // 1024))
+            lines.append('')
+            lines.append('Top %d allocation sites still in use:' % top)
+            for stat in snapshot.statistics('lineno')[:top]:
+                lines.append('  %s' % stat)
+        else:
+            counts = self._type_counts()
+            growth = sorted(((count - self.start_counts.get(name, 0), name,
+                              count) for name, count in counts.iteritems()),
+                            reverse=True)
+            lines.append('tracemalloc is not available; counting live '
+                         'objects by type instead.')
+            lines.append('')
+            lines.append('Top %d object types by growth:' % top)
+            for grown, name, count in growth[:top]:
+                lines.append('  %-30s %+9d  (%d live)' % (name, grown, count))
+
+        # Peak resident memory, where the platform reports it
+        try:
+            import resource
+        except ImportError:
+            resource = None
+        if(resource is not None):
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if(sys.platform == 'darwin'):
+                peak //= 1024 # Reported in bytes rather than KiB
+            lines.append('')
+            lines.append('Peak resident memory: %d KiB' % peak)
+
+        return '\n'.join(lines) + '\n'
+
+def profile_session(collapsed_file_name="LookupProfile.folded",
+                    allocation_file_name="LookupAllocations.txt", top=25):
+# Profiles the rest of the program. The call stacks are sampled and
+# memory allocation is tracked until the program exits, when the
+# collapsed stacks and a report of the top allocations are written.
+#
+# Usage
+# profile_session()
+#
+# Inputs
+# collapsed_file_name: the file for the collapsed stacks
+# allocation_file_name: the file for the allocation report
+# top: the number of allocation sites or object types to report
+
+    profiler = SamplingProfiler()
+    tracker = AllocationTracker()
+    tracker.start()
+    profiler.start()
+
+    def write_profile():
+        profiler.stop()
+        profiler.write_collapsed(collapsed_file_name)
+        with open(allocation_file_name, 'w') as report_file:
+            report_file.write(tracker.report(top))
+
+    atexit.register(write_profile)
+
+def normalize_url(url):
+# Converts a URL into a canonical form so that equivalent URLs share one
+# entry in the response cache. The scheme and host are lowercased, the
+# default port and any fragment are dropped, and the query parameters
+# are sorted and re-encoded.
+#
+# Usage
+# key = normalize_url(url)
+#
+# Inputs
+# url: string containing the URL
+#
+# Outputs
+# key: string containing the normalized URL
+
+    if(isinstance(url, unicode)):
+        url = url.encode('utf-8')
+
+    scheme, netloc, path, query, _ = urlparse.urlsplit(url.strip())
+    scheme = scheme.lower()
+    netloc = netloc.lower()
+    if(scheme == 'http' and netloc.endswith(':80')):
+        netloc = netloc[:-3]
+
+    path = urllib.quote(urllib.unquote(path)) or '/'
+    query = urllib.urlencode(sorted(urlparse.parse_qsl(query, True)))
+
+    return urlparse.urlunsplit((scheme, netloc, path, query, ''))
+
+
+class CachedPage(object):
+# A stand-in for the response returned by requests.get when a page is
+# served from the response cache. It provides the attributes used by
+# extract_classify_page.
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, url, content, encoding, partial=False):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.partial = partial # True if only the start of the page was kept
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', 'replace')
+
+
+class ResponseCache(object):
+# A persistent cache of classify.oclc.org responses, kept in a single
+# SQLite file. Pages are stored zlib compressed and keyed by their
+# normalized URL. Each entry expires after its own TTL, and once the
+# stored pages exceed max_bytes the least recently used entries are
+# evicted. Hits and misses are counted for the lifetime of the object.
+# Pages that were only partly read can be stored too; they are only
+# returned to callers that allow partial pages.
+#
+# Usage
+# cache = ResponseCache(file_name, ttl, max_bytes)
+# page = cache.get(url) # None on a miss
+# cache.put(url, content, encoding)
+# cache.remove(urls)
+#
+# Inputs
+# file_name: a string containing the SQLite file name
+# ttl: the number of seconds an entry stays valid
+# max_bytes: the maximum compressed size of all stored pages
+
+    def __init__(self, file_name, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        # The connection is shared by worker threads, guarded by self.lock
+        self.conn = sqlite3.connect(file_name, check_same_thread=False)
+        self.conn.text_factory = str
+        self.conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                          'url TEXT PRIMARY KEY, body BLOB, encoding TEXT, '
+                          'size INTEGER, expires REAL, accessed REAL, '
+                          'partial INTEGER DEFAULT 0)')
+
+        # Caches made before partial pages were stored lack the column
+        columns = [row[1] for row in
+                   self.conn.execute('PRAGMA table_info(responses)')]
+        if('partial' not in columns):
+            self.conn.execute('ALTER TABLE responses ADD COLUMN '
+                              'partial INTEGER DEFAULT 0')
+
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed '
+                          'ON responses (accessed)')
+        self.conn.commit()
+
+        self.total_bytes = self.conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, url, allow_partial=False):
+    # Returns a CachedPage for the URL, or None if it is missing or expired.
+    # Partly read pages count as missing unless allow_partial is True.
+
+        key = normalize_url(url)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT body, encoding, expires, partial '
+                                    'FROM responses WHERE url = ?',
+                                    (key,)).fetchone()
+            if(row is None or row[2] < now or (row[3] and not allow_partial)):
+                self.misses += 1
+                metrics.count('cache_misses_total')
+                return None
+
+            self.hits += 1
+            metrics.count('cache_hits_total')
+            self.conn.execute('UPDATE responses SET accessed = ? '
+                              'WHERE url = ?', (now, key))
+            self.conn.commit()
+
+        return CachedPage(url, zlib.decompress(row[0]), row[1], bool(row[3]))
+
+    def put(self, url, content, encoding, ttl=None, partial=False):
+    # Stores a page's raw content. ttl overrides the cache's default TTL,
+    # and partial marks content holding only the start of the page.
+
+        if(ttl is None):
+            ttl = self.ttl
+
+        key = normalize_url(url)
+        body = zlib.compress(content)
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute('SELECT size FROM responses WHERE url = ?',
+                                    (key,)).fetchone()
+            if(old is not None):
+                self.total_bytes -= old[0]
+
+            self.conn.execute('INSERT OR REPLACE INTO responses VALUES '
+                              '(?, ?, ?, ?, ?, ?, ?)',
+                              (key, sqlite3.Binary(body), encoding,
+                               len(body), now + ttl, now, int(partial)))
+            self.total_bytes += len(body)
+            self._evict()
+            self.conn.commit()
+
+    def remove(self, urls):
+    # Forgets the pages for a list of URLs, so they are fetched again
+
+        with self.lock:
+            for url in urls:
+                key = normalize_url(url)
+                old = self.conn.execute('SELECT size FROM responses '
+                                        'WHERE url = ?', (key,)).fetchone()
+                if(old is not None):
+                    self.total_bytes -= old[0]
+                    self.conn.execute('DELETE FROM responses WHERE url = ?',
+                                      (key,))
+            self.conn.commit()
+
+    def _evict(self):
+    # Removes expired entries, then the least recently used entries until
+    # the cache fits in max_bytes. The caller must hold self.lock.
+
+        if(self.total_bytes <= self.max_bytes):
+            return
+
+        self.conn.execute('DELETE FROM responses WHERE expires < ?',
+                          (time.time(),))
+        self.total_bytes = self.conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+        while(self.total_bytes > self.max_bytes):
+            rows = self.conn.execute('SELECT url, size FROM responses '
+                                     'ORDER BY accessed LIMIT 64').fetchall()
+            if(not rows):
+                break
+            for url, size in rows:
+                self.conn.execute('DELETE FROM responses WHERE url = ?',
+                                  (url,))
+                self.total_bytes -= size
+                if(self.total_bytes <= self.max_bytes):
+                    break
+
+    def stats(self):
+    # Returns a dictionary with the hit/miss counters and the cache size
+
+        with self.lock:
+            entries = self.conn.execute(
+                    'SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': entries, 'bytes': self.total_bytes}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# The response cache used by fetch_page. None disables caching.
+response_cache = None
+
+def open_response_cache(file_name, ttl=30*24*3600, max_bytes=100*1024*1024):
+# Opens (or creates) a persistent response cache and makes fetch_page use
+# it. Classifications rarely change, so entries default to 30 days.
+#
+# Usage
+# cache = open_response_cache(file_name)
+#
+# Inputs
+# file_name: a string containing the SQLite file name
+# ttl: the number of seconds an entry stays valid
+# max_bytes: the maximum compressed size of all stored pages
+#
+# Outputs
+# cache: the ResponseCache object now in use
+
+    global response_cache
+    response_cache = ResponseCache(file_name, ttl, max_bytes)
+    return response_cache
+
+def forget_pages(urls):
+# Removes pages from the response cache, if one is open. Used for the
+# pages of a search that found nothing, so that searching for the book
+# again once the miss expires (or in refresh mode) reaches the website
+# instead of reading the same empty pages back from the cache.
+#
+# Usage
+# forget_pages(urls)
+#
+# Inputs
+# urls: a list of URL strings
+
+    if(response_cache is not None and urls):
+        response_cache.remove(urls)
+
+class BloomFilter(object):
+# A compact set that can give false positives but never false
+# negatives: a key that was added is always found, and a key that was
+# not is found only with about the chance error_rate. It takes around
+# ten bits per key at a 1% error rate, however long the keys are.
+#
+# Usage
+# bloom = BloomFilter(capacity)
+# bloom.add(key)
+# if(key in bloom):
+#
+# Inputs
+# capacity: the number of keys the filter is sized for
+# error_rate: the chance of a false positive at that many keys
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.num_bits = max(int(-capacity * math.log(error_rate) /
+                                math.log(2) ** 2), 8)
+        self.num_hashes = max(int(round(self.num_bits * math.log(2) /
+                                        capacity)), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def positions(self, key):
+    # Returns the bits for a key. Two hashes taken from one digest are
+    # combined to give as many as needed.
+
+        if(isinstance(key, unicode)):
+            key = key.encode('utf-8')
+        first, second = struct.unpack('<QQ', hashlib.md5(key).digest())
+        return [(first + i * second) % self.num_bits
+                for i in xrange(self.num_hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self.positions(key):
+            if(not bits[position >> 3] & (1 << (position & 7))):
+                return False
+        return True
+
+class NegativeCache(object):
+# Remembers searches that found nothing, so that scanning the same book
+# again gives up at once instead of searching every link again. Misses
+# are kept in a SQLite file with a shorter TTL than the response cache,
+# since a book missing today may be added later. A Bloom filter of the
+# misses is kept in memory, so the many searches that are not known
+# misses are cleared without touching the file.
+#
+# In refresh mode, known misses are searched again as if they were new,
+# and are forgotten if they are found.
+#
+# Usage
+# cache = NegativeCache(file_name, ttl)
+# if(cache.is_miss(key)):
+# cache.add(key)
+# cache.remove(key)
+#
+# Inputs
+# file_name: a string containing the SQLite file name
+# ttl: the number of seconds a miss is remembered
+
+    def __init__(self, file_name, ttl):
+        self.ttl = ttl
+        self.refresh = False
+        self.lock = threading.Lock()
+
+        # The connection is shared by worker threads, guarded by self.lock
+        self.conn = sqlite3.connect(file_name, check_same_thread=False)
+        self.conn.text_factory = str
+        self.conn.execute('CREATE TABLE IF NOT EXISTS misses ('
+                          'key TEXT PRIMARY KEY, recorded REAL, '
+                          'expires REAL)')
+        self.conn.execute('DELETE FROM misses WHERE expires < ?',
+                          (time.time(),))
+        self.conn.commit()
+        self._build_filter()
+
+    def _build_filter(self):
+    # Fills a new Bloom filter with every stored miss, leaving room for
+    # as many again. The caller must hold self.lock, or be __init__.
+
+        count = self.conn.execute('SELECT COUNT(*) FROM misses').fetchone()[0]
+        bloom = BloomFilter(max(2 * count, 1000))
+        for (key,) in self.conn.execute('SELECT key FROM misses'):
+            bloom.add(key)
+        self.bloom = bloom
+
+    def is_miss(self, key):
+    # Returns True if the search found nothing within the TTL. Always
+    # False in refresh mode.
+
+        if(self.refresh or key not in self.bloom):
+            return False
+
+        # The filter can be wrong, and misses expire, so check the file
+        with self.lock:
+            row = self.conn.execute('SELECT expires FROM misses '
+                                    'WHERE key = ?', (key,)).fetchone()
+        return row is not None and row[0] >= time.time()
+
+    def add(self, key):
+    # Records that the search found nothing
+
+        now = time.time()
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO misses '
+                              '(key, recorded, expires) VALUES (?, ?, ?)',
+                              (key, now, now + self.ttl))
+            self.conn.commit()
+            self.bloom.add(key)
+            if(self.bloom.count > self.bloom.capacity):
+                self._build_filter()
+
+    def remove(self, key):
+    # Forgets a miss, such as a book that has now been found
+
+        with self.lock:
+            self.conn.execute('DELETE FROM misses WHERE key = ?', (key,))
+            self.conn.commit()
+
+    def keys(self, prefix=''):
+    # Returns the keys of every miss that has not expired, oldest first,
+    # for retrying them together
+
+        with self.lock:
+            rows = self.conn.execute('SELECT key FROM misses '
+                                     'WHERE expires >= ? AND key LIKE ? '
+                                     'ORDER BY recorded',
+                                     (time.time(), prefix + '%')).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+negative_cache = None
+
+def open_negative_cache(file_name, ttl=3*24*3600, refresh=False):
+# Opens (or creates) the cache of searches that found nothing, and makes
+# search_classify use it. Misses are remembered for 3 days by default.
+#
+# Usage
+# cache = open_negative_cache(file_name)
+# cache = open_negative_cache(file_name, refresh=True)
+#
+# Inputs
+# file_name: a string containing the SQLite file name
+# ttl: the number of seconds a miss is remembered
+# refresh: if True, known misses are searched again (see NegativeCache)
+#
+# Outputs
+# cache: the NegativeCache object now in use
+
+    global negative_cache
+    cache = NegativeCache(file_name, ttl)
+    cache.refresh = refresh
+    negative_cache = cache
+    return cache
+
+def search_miss_key(args):
+# Returns the key a search is remembered by in the negative cache: the
+# ISBN-13 for an ISBN, or the normalized title and author.
+#
+# Usage
+# key = search_miss_key((ISBN, link_limit))
+# key = search_miss_key((title, author, link_limit))
+
+    if(len(args) == 2):
+        ISBN = args[0]
+        if(is_ISBN(ISBN)):
+            ISBN = canonical_ISBN(ISBN)
+        return 'isbn:' + ISBN
+    return 'title:' + normalize_title_author(args[0], args[1])
+
+# Settings for the HTTP session shared by every fetch. Change them with
+# configure_session.
+http_settings = {
+    'pool_size': 10,        # connections kept open to each host
+    'retries': 3,           # retries on 5xx responses and dropped connections
+    'backoff': 0.5,         # seconds before the first retry, then doubled
+    'connect_timeout': 5,   # seconds to wait for a connection
+    'read_timeout': 20,     # seconds to wait for the server to respond
+    'stream': True,         # stop reading pages once the summary is found
+    'stream_chunk_size': 4096, # bytes read from the connection at a time
+}
+
+# The shared session, created by get_session on first use
+http_session = None
+http_session_lock = threading.Lock()
+
+def configure_session(**settings):
+# Changes the settings used for the shared HTTP session. The session is
+# rebuilt with the new settings on the next fetch.
+#
+# Usage
+# configure_session(pool_size=16, read_timeout=30)
+#
+# Inputs
+# settings: any of the keys in http_settings
+
+    global http_session
+
+    for name in settings:
+        if(name not in http_settings):
+            raise ValueError(name + ' is not a valid HTTP setting')
+
+    with http_session_lock:
+        http_settings.update(settings)
+        if(http_session is not None):
+            http_session.close()
+        http_session = None
+
+def get_session():
+# Returns the shared requests.Session, creating it if necessary. Its
+# connections are kept alive between fetches and pooled for use by
+# several threads. Failed connections and 5xx responses are retried with
+# exponential backoff, except for 503, which scheduled_get handles along
+# with 429 as a request to slow down.
+#
+# Usage
+# session = get_session()
+#
+# Outputs
+# session: the requests.Session used by fetch_page
+
+    global http_session
+
+    with http_session_lock:
+        if(http_session is None):
+            from requests.packages.urllib3.util.retry import Retry
+            retries = Retry(total=http_settings['retries'],
+                            backoff_factor=http_settings['backoff'],
+                            status_forcelist=(500, 502, 504),
+                            respect_retry_after_header=False,
+                            raise_on_status=False)
+            adapter = requests.adapters.HTTPAdapter(
+                                pool_connections=http_settings['pool_size'],
+                                pool_maxsize=http_settings['pool_size'],
+                                max_retries=retries)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            http_session = session
+
+        return http_session
+
+class RequestScheduler(object):
+# Paces the requests sent to classify.oclc.org. A token bucket limits the
+# request rate, and the number of requests in flight is adjusted AIMD
+# style: it grows slowly while the response time holds steady and is
+# halved when the server throttles us (429 or 503) or a request fails.
+# A Retry-After header holds back every request until it has passed.
+#
+# Usage
+# scheduler = RequestScheduler(rate, burst, min_concurrency, max_concurrency)
+# scheduler = RequestScheduler(rate, burst, min_concurrency, max_concurrency,
+#                              initial_concurrency)
+# scheduler.acquire() # waits for a turn
+# scheduler.release(latency, status, retry_after)
+#
+# Inputs
+# rate: the average number of requests allowed per second
+# burst: the number of requests that may be sent at once after a pause
+# min_concurrency, max_concurrency: the bounds for requests in flight
+# initial_concurrency: the requests in flight allowed at the start, before
+#                      any response has been seen (min_concurrency if
+#                      None)
+
+    def __init__(self, rate, burst, min_concurrency, max_concurrency,
+                 initial_concurrency=None):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        if(initial_concurrency is None):
+            initial_concurrency = min_concurrency
+        self.concurrency = float(min(max(initial_concurrency, min_concurrency),
+                                     max_concurrency))
+        self.tokens = self.burst
+        self.last_refill = time.time()
+        self.blocked_until = 0
+        self.active = 0
+        self.latency = None # moving average of the response time
+        self.throttled = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+    # Waits until a request may be sent, then takes a slot for it
+
+        with self.condition:
+            while(1):
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens +
+                                  (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if(now < self.blocked_until):
+                    wait = self.blocked_until - now
+                elif(self.active >= int(self.concurrency)):
+                    wait = 1 # until release notifies us
+                elif(self.tokens < 1):
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.active += 1
+                    return
+
+                self.condition.wait(wait)
+
+    def release(self, latency, status=None, retry_after=None):
+    # Frees the slot taken by acquire and adjusts the pace. status is None
+    # if the request failed without a response.
+
+        with self.condition:
+            self.active -= 1
+
+            if(status is None or status in (429, 503)):
+                # Back off quickly
+                self.throttled += 1
+                self.concurrency = max(self.min_concurrency,
+                                       self.concurrency / 2)
+                if(retry_after is not None):
+                    self.blocked_until = max(self.blocked_until,
+                                             time.time() + retry_after)
+            else:
+                # Grow by about one request per round while the response
+                # time is steady
+                if(self.latency is None or latency <= 2 * self.latency):
+                    self.concurrency = min(self.max_concurrency,
+                                           self.concurrency +
+                                           1.0 / self.concurrency)
+                if(self.latency is None):
+                    self.latency = latency
+                else:
+                    self.latency = 0.8 * self.latency + 0.2 * latency
+
+            self.condition.notify_all()
+
+    def stats(self):
+    # Returns a dictionary describing the scheduler's current state
+
+        with self.condition:
+            return {'concurrency': int(self.concurrency),
+                    'active': self.active,
+                    'latency': self.latency,
+                    'throttled': self.throttled}
+
+
+# Settings for the request scheduler. Change them with configure_scheduler.
+scheduler_settings = {
+    'rate': 5,              # requests per second on average
+    'burst': 10,            # requests that may be sent at once after a pause
+    'min_concurrency': 1,   # requests in flight after backing off
+    'max_concurrency': 16,  # requests in flight at most
+    'initial_concurrency': None, # requests in flight at the start (None
+                                 # for host_fetch_limit, so a search's
+                                 # links are fetched together from the
+                                 # first search on)
+    'max_retry_after': 600, # longest Retry-After (in seconds) to honor
+}
+
+# The shared scheduler, created by get_scheduler on first use
+request_scheduler = None
+request_scheduler_lock = threading.Lock()
+
+def configure_scheduler(**settings):
+# Changes the settings used for the request scheduler. A new scheduler is
+# created with the new settings on the next fetch.
+#
+# Usage
+# configure_scheduler(rate=2, max_concurrency=8)
+#
+# Inputs
+# settings: any of the keys in scheduler_settings
+
+    global request_scheduler
+
+    for name in settings:
+        if(name not in scheduler_settings):
+            raise ValueError(name + ' is not a valid scheduler setting')
+
+    with request_scheduler_lock:
+        scheduler_settings.update(settings)
+        request_scheduler = None
+
+def get_scheduler():
+# Returns the shared RequestScheduler, creating it if necessary
+
+    global request_scheduler
+
+    with request_scheduler_lock:
+        if(request_scheduler is None):
+            initial = scheduler_settings['initial_concurrency']
+            if(initial is None):
+                initial = host_fetch_limit
+            request_scheduler = RequestScheduler(
+                                    scheduler_settings['rate'],
+                                    scheduler_settings['burst'],
+                                    scheduler_settings['min_concurrency'],
+                                    scheduler_settings['max_concurrency'],
+                                    initial)
+        return request_scheduler
+
+def parse_retry_after(value):
+# Converts a Retry-After header, either a number of seconds or an HTTP
+# date, into seconds from now. Returns None if it cannot be read.
+
+    if(value is None):
+        return None
+
+    value = value.strip()
+    if(value.isdigit()):
+        seconds = int(value)
+    else:
+        import email.utils
+        date = email.utils.parsedate_tz(value)
+        if(date is None):
+            return None
+        seconds = email.utils.mktime_tz(date) - time.time()
+
+    return min(max(seconds, 0), scheduler_settings['max_retry_after'])
+
+def scheduled_get(url, stream=False):
+# Sends a GET request through the shared session when the scheduler
+# allows it. Responses that ask us to slow down (429 and 503) are
+# retried after the time the server gave, or after the backoff in
+# http_settings (doubled on each attempt) if it gave none, up to the
+# number of retries in http_settings.
+#
+# Usage
+# response = scheduled_get(url)
+#
+# Inputs
+# url: string containing the URL
+# stream: if True, the body is left to be read by the caller, and the
+#         request keeps its place in the scheduler until the response is
+#         closed
+#
+# Outputs
+# response: the requests.Response
+
+    scheduler = get_scheduler()
+    timeout = (http_settings['connect_timeout'], http_settings['read_timeout'])
+
+    for attempt in xrange(http_settings['retries'] + 1):
+        with metrics.timer('scheduler_wait_seconds'):
+            scheduler.acquire()
+        start = time.time()
+        status = None
+        retry_after = None
+        held = False
+        # The slot is given back however the request ends
+        try:
+            response = get_session().get(url, stream=stream, timeout=timeout)
+            status = response.status_code
+
+            # With stream, this is the time until the headers arrive
+            metrics.observe('http_request_seconds', time.time() - start)
+            metrics.count('http_responses_total', labels={'status': status})
+
+            if(status in (429, 503)):
+                retry_after = parse_retry_after(
+                                  response.headers.get('Retry-After'))
+                if(retry_after is None):
+                    retry_after = min(http_settings['backoff'] * 2 ** attempt,
+                                      scheduler_settings['max_retry_after'])
+            elif(stream):
+                # The body is still to come, so the slot is given back
+                # when the caller closes the response
+                release_on_close(response, scheduler, time.time() - start,
+                                 status)
+                held = True
+        except requests.RequestException as error:
+            metrics.count('http_errors_total',
+                          labels={'error': type(error).__name__})
+            raise
+        finally:
+            if(not held):
+                scheduler.release(time.time() - start, status, retry_after)
+
+        if(status not in (429, 503) or
+           attempt == http_settings['retries']):
+            return response
+        response.close()
+
+def release_on_close(response, scheduler, latency, status):
+# Makes closing a streamed response give its slot back to the scheduler.
+# The latency is the time until the headers arrived, as for other
+# responses. Closing it again does not release another slot.
+
+    close = response.close
+    released = []
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            if(not released):
+                released.append(True)
+                scheduler.release(latency, status)
+
+    response.close = close_and_release
+
+def fetch_page(url, use_cache=True):
+# Gets a classify.oclc.org page through the shared session, paced by the
+# request scheduler, using the response cache when one is open. Only
+# successful responses are stored.
+#
+# Usage
+# page = fetch_page(url)
+#
+# Inputs
+# url: string containing the URL
+# use_cache: if False, the response cache is neither read nor written
+#
+# Outputs
+# page: the response from the session, or a CachedPage
+
+    cache = response_cache if use_cache else None
+    if(cache is not None):
+        page = cache.get(url)
+        if(page is not None):
+            return page
+
+    page = scheduled_get(url)
+    if(cache is not None and page.status_code == 200):
+        cache.put(url, page.content, page.encoding or page.apparent_encoding)
+
+    return page
+
+def fetch_classify_record(url, need_links=False, parser_class=None):
+# Fetches a classify.oclc.org page and extracts its record. The response
+# is read in chunks and fed to the parser as it arrives, and the
+# connection is closed as soon as the title, author and LCC have been
+# seen, without downloading or parsing the rest of the page. Pages from
+# the response cache are parsed directly, and pages read from the
+# website are added to it (marked as partial if they were cut short).
+#
+# Usage
+# record = fetch_classify_record(url)
+# record = fetch_classify_record(url, need_links=True)
+#
+# Inputs
+# url: string containing the URL
+# need_links: if True, the whole page is always read so that every
+#             search result link is found
+# parser_class: the class that reads the page, by default the parser of
+#               the backend chosen by configure_classify
+#
+# Outputs
+# record: the dictionary described in extract_classify_page, with the
+#         extra key truncated, which is True if the page was not read to
+#         the end (so its links may be incomplete)
+#
+# The time spent parsing is recorded in the parse_seconds metric, and
+# the rest in fetch_seconds, labelled by where the page came from.
+
+    start = time.time()
+    timing = {'parse': 0.0, 'source': 'web'}
+    try:
+        if(parser_class is None):
+            parser_class = get_classify_backend().parser_class
+        return read_classify_record(url, need_links, parser_class, timing)
+    finally:
+        metrics.observe('parse_seconds', timing['parse'])
+        metrics.observe('fetch_seconds', time.time() - start - timing['parse'],
+                        {'source': timing['source']})
+
+def check_classify_response(url, status, record, parser_class):
+# Raises requests.HTTPError if a response is an error rather than an
+# answer, so that it is not taken for a book that was not found. Only
+# parsers with ok_statuses (ClassifyServiceParser) are checked; the
+# classify.oclc.org pages are read whatever their status, as always.
+#
+# Inputs
+# url: string containing the URL
+# status: the response's HTTP status
+# record: the record read from the response, whose error key is removed
+# parser_class: the class that read the response
+
+    error = record.pop('error', '')
+    statuses = getattr(parser_class, 'ok_statuses', None)
+    if(statuses is None):
+        return
+    if(status not in statuses or error):
+        raise requests.HTTPError('%d error for %s: %s' %
+                                 (status, url, error or 'no answer'))
+
+def read_classify_record(url, need_links, parser_class, timing):
+# Does the work of fetch_classify_record, adding the seconds spent
+# parsing to timing['parse'] and setting timing['source'] to 'cache' for
+# pages from the response cache.
+
+    use_cache = getattr(parser_class, 'cacheable', True)
+    cache = response_cache if use_cache else None
+    if(cache is not None):
+        page = cache.get(url, allow_partial=not need_links)
+        if(page is not None):
+            timing['source'] = 'cache'
+            start = time.time()
+            record = parse_classify_page(page, parser_class)
+            timing['parse'] += time.time() - start
+            record['truncated'] = page.partial
+            return record
+
+    # Without streaming, read the whole page as usual. Pages parsed in
+    # another process are always read whole.
+    if(not http_settings['stream'] or parse_pool is not None):
+        page = fetch_page(url, use_cache)
+        start = time.time()
+        record = parse_classify_page(page, parser_class)
+        timing['parse'] += time.time() - start
+        check_classify_response(url, page.status_code, record, parser_class)
+        record['truncated'] = False
+        return record
+
+    response = scheduled_get(url, stream=True)
+    try:
+        encoding = response.encoding or 'utf-8'
+        parser = parser_class()
+        if(getattr(parser_class, 'reads_bytes', False)):
+            decode = lambda chunk, final=False: chunk
+        else:
+            decode = codecs.getincrementaldecoder(encoding)('replace').decode
+        chunks = []
+
+        for chunk in response.iter_content(http_settings['stream_chunk_size']):
+            chunks.append(chunk)
+            start = time.time()
+            parser.feed(decode(chunk))
+            timing['parse'] += time.time() - start
+            if(not need_links and parser.complete()):
+                if(cache is not None and response.status_code == 200):
+                    cache.put(url, ''.join(chunks), encoding, partial=True)
+                record = parser.record()
+                record['truncated'] = True
+                return record
+
+        start = time.time()
+        parser.feed(decode('', True))
+        parser.close()
+        timing['parse'] += time.time() - start
+    finally:
+        # Closing an unfinished response drops the connection, which stops
+        # the rest of the page from being sent
+        response.close()
+
+    if(cache is not None and response.status_code == 200):
+        cache.put(url, ''.join(chunks), encoding)
+
+    record = parser.record()
+    check_classify_response(url, response.status_code, record, parser_class)
+    record['truncated'] = False
+    return record
+
+# The most pages fetched from a single host at the same time
+host_fetch_limit = 4
+
+# One semaphore per host, shared by every PageFetch
+host_semaphores = {}
+host_semaphores_lock = threading.Lock()
+
+def get_host_semaphore(url):
+# Returns the semaphore limiting concurrent fetches to the URL's host
+
+    host = urlparse.urlsplit(url)[1].lower()
+    with host_semaphores_lock:
+        if(host not in host_semaphores):
+            host_semaphores[host] = threading.BoundedSemaphore(
+                                                        host_fetch_limit)
+        return host_semaphores[host]
+
+class PageFetch(object):
+# A page being fetched on a background thread. No more than
+# host_fetch_limit fetches run against one host at a time.
+#
+# Usage
+# fetch = PageFetch(url)
+# page = fetch.result() # waits for the page
+#
+# Inputs
+# url: string containing the URL
+# fetch: the function used to get the page, fetch_page by default
+
+    def __init__(self, url, fetch=None):
+        self.url = url
+        self.fetch = fetch or fetch_page
+        self.page = None
+        self.error = None
+        self.done = threading.Event()
+
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        try:
+            with get_host_semaphore(self.url):
+                self.page = self.fetch(self.url)
+        except Exception:
+            self.error = sys.exc_info()
+        self.done.set()
+
+    def result(self):
+    # Waits for the fetch to finish and returns the page. Any exception
+    # raised by the fetch is raised again here.
+
+        # A timeout keeps Ctrl-C working while waiting
+        while(not self.done.wait(1)):
+            pass
+
+        if(self.error is not None):
+            raise self.error[0], self.error[1], self.error[2]
+        return self.page
+
+def fetch_pages(urls, fetch=None):
+# Starts fetching all of the URLs at once.
+#
+# Usage
+# fetches = fetch_pages(urls)
+# fetches = fetch_pages(urls, fetch_classify_record)
+#
+# Inputs
+# urls: list of strings containing the URLs
+# fetch: the function used to get each page, fetch_page by default
+#
+# Outputs
+# fetches: list of PageFetch objects, in the same order as urls
+
+    return [PageFetch(url, fetch) for url in urls]
+
+def classify_search_args(args):
+# Converts the arguments given to search_classify into the search URL
+# and the link limit.
+#
+# Usage
+# url, link_limit = classify_search_args((ISBN, link_limit))
+# url, link_limit = classify_search_args((title, author, link_limit))
+#
+# Inputs
+# args: a tuple holding the ISBN or title and author, then the link limit
+#
+# Outputs
+# url: string containing the search URL
+# link_limit: the number of links to search through
+
+    backend = get_classify_backend()
+
+    # Figure out which case we have, ISBN or title/author
+    # and generate the URL
+    if(len(args) == 2): # ISBN case
+        ISBN = args[0]
+        link_limit = args[1]
+        url = backend.isbn_search_url(ISBN)
+        
+    elif(len(args) == 3):
+        title = args[0]
+        author = args[1]
+        link_limit = args[2]
+        url = backend.title_author_search_url(title, author)
+    else:
+        raise TypeError("Invalid number of arguments for search_classify")
+
+    return url, link_limit
+
+def classify_candidates(url, link_limit, quiet=False, concurrent=False,
+                        raise_errors=False, errors=None, fetched=None):
+# Searches a classify.oclc.org search URL and yields each valid result in
+# turn, following the result links when the first page does not hold
+# the book's information. Nothing more is fetched until the next result
+# is asked for.
+#
+# Usage
+# for title, author, lcc in classify_candidates(url, link_limit):
+#
+# Inputs
+# url: string containing the search URL
+# link_limit: the number of links to search through before giving up
+# quiet: if True, progress and error messages are not printed
+# concurrent: if True, all of the result links are fetched at once instead
+#             of one at a time. They are still checked in their original
+#             order.
+# raise_errors: if True, a page that cannot be fetched raises its
+#               requests.RequestException instead of ending the search
+#               (or skipping the link), so the caller can tell a failed
+#               search from one that found nothing
+# errors: a list to add each requests.RequestException to when they
+#         are not raised, or None
+# fetched: a list to add each URL that is fetched to, or None
+#
+# Outputs
+# title, author, lcc: strings for each valid result found
+
+    backend = get_classify_backend()
+    fetch = functools.partial(fetch_classify_record,
+                              parser_class=backend.parser_class)
+    if(fetched is not None):
+        fetched.append(url)
+
+    # Attempt to get the book's information
+    try: 
+        record = fetch(url)
+    except requests.RequestException as error:
+        if(raise_errors):
+            raise
+        if(errors is not None):
+            errors.append(error)
+        if(not quiet):
+            print "    ERROR: Unable to access website. "\
+                       "Check your internet connection."
+        return
+    title, author, lcc = record['title'], record['author'], record['lcc']
+
+    # If I have the information, simply print that
+    if(validate_info(title, author, lcc)):
+        yield title, author, lcc
+        
+    # Otherwise, use the links. If the page was not read to the end,
+    # read all of it to find them.
+    if(record['truncated']):
+        try:
+            record = fetch(url, need_links=True)
+        except requests.RequestException as error:
+            if(raise_errors):
+                raise
+            if(errors is not None):
+                errors.append(error)
+            if(not quiet):
+                print "    ERROR: Unable to access website. "\
+                           "Check your internet connection."
+            return
+    links = record['links']
+
+    # The number of links is limited in case many links are returned
+    urls = [backend.link_url(link) for link in links[:link_limit]]
+    if(fetched is not None):
+        fetched.extend(urls)
+    if(concurrent):
+        record_getters = [page_fetch.result for page_fetch in
+                          fetch_pages(urls, fetch)]
+    else:
+        record_getters = [functools.partial(fetch, url) for url in urls]
+
+    # Cycle through each link, searching for a valid pag014e 
+    for get_record in record_getters:
+        
+        metrics.count('candidate_links_total')
+        try:
+            with metrics.timer('candidate_link_seconds'):
+                record = get_record()
+        except requests.RequestException as error:
+            if(raise_errors):
+                raise
+            if(errors is not None):
+                errors.append(error)
+            if(not quiet):
+                print "    ERROR: Unable to load a search result. Skipping it."
+            continue
+        title, author, lcc = record['title'], record['author'], record['lcc']
+        if(validate_info(title, author, lcc)):
+            yield title, author, lcc
+                
+        if(not quiet):
+            print "Searching for other options..."
+
+class BookRecord(object):
+# The title, author and LCC found for a book, as returned by the search
+# functions. It unpacks and compares like the (title, author, lcc) tuple
+# it replaces, but has named fields and no per-object dictionary, so
+# large numbers of them take little memory.
+#
+# Usage
+# record = BookRecord(title, author, lcc)
+# title, author, lcc = record
+# print record.lcc
+#
+# offline is True for a book found in the offline LCC index, which may
+# have no title. It is not part of the tuple.
+
+    __slots__ = ('title', 'author', 'lcc', 'offline')
+
+    def __init__(self, title='', author='', lcc='', offline=False):
+        self.title = title
+        self.author = author
+        self.lcc = lcc
+        self.offline = offline
+
+    def __iter__(self):
+        yield self.title
+        yield self.author
+        yield self.lcc
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, i):
+        return (self.title, self.author, self.lcc)[i]
+
+    def __eq__(self, other):
+        try:
+            return tuple(self) == tuple(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if(equal is NotImplemented):
+            return equal
+        return not equal
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return 'BookRecord(%r, %r, %r)' % tuple(self)
+
+    # Objects with __slots__ cannot be pickled without these
+    def __getstate__(self):
+        return tuple(self) + (self.offline,)
+
+    def __setstate__(self, state):
+        self.title, self.author, self.lcc, self.offline = state
+
+def search_classify_url(url, link_limit, accept, quiet=False,
+                        concurrent=False, raise_errors=False, miss_key=None):
+# Searches a classify.oclc.org search URL, following the result links
+# when the first page does not hold the book's information. Each valid
+# result is passed to accept, and the first one it approves is returned.
+#
+# Usage
+# title, author, lcc = search_classify_url(url, link_limit, accept)
+#
+# Inputs
+# url: string containing the search URL
+# link_limit: the number of links to search through before giving up
+# accept: function taking (title, author, lcc) and returning a boolean
+# quiet, concurrent, raise_errors: see classify_candidates
+# miss_key: the key (see search_miss_key) the search is remembered by in
+#           the negative cache, or None to not use it
+#
+# Outputs
+# record: the accepted BookRecord, or one with blank strings
+
+    # Searches that recently found nothing are not repeated
+    cache = negative_cache if miss_key is not None else None
+    if(cache is not None and cache.is_miss(miss_key)):
+        metrics.count('searches_total', labels={'result': 'known_miss'})
+        if(not quiet):
+            print "    This book was not found when last searched for."
+        return BookRecord()
+
+    # A known miss searched again must not be answered from the response
+    # cache, or it could never be found
+    if(cache is not None and cache.refresh):
+        forget_pages([url])
+
+    errors = []
+    fetched = []
+    found_any = False
+    for title, author, lcc in classify_candidates(url, link_limit, quiet,
+                                                  concurrent, raise_errors,
+                                                  errors, fetched):
+        found_any = True
+        if(accept(title, author, lcc)):
+            metrics.count('searches_total', labels={'result': 'found'})
+            if(cache is not None and cache.refresh):
+                cache.remove(miss_key)
+            return BookRecord(title, author, lcc)
+            
+    # Only a search that reached the website and found nothing counts as a
+    # miss, not one the user turned down
+    if(cache is not None and not found_any and not errors):
+        cache.add(miss_key)
+        forget_pages(fetched)
+
+    # If I reach here, no valid box was found, return error
+    metrics.count('searches_total', labels={'result': 'not_found'})
+    return BookRecord()
+
+def search_classify(*args):
+# Searches classify.oclc.org for the specified ISBN or title and author.
+# If it is not found, then the title, author and LCC will be blank.
+#
+# Usage
+# title, author, lcc = search_classify(ISBN, link_limit)
+# title, author, lcc = search_classify(title, author, link_limit)
+#
+# Inputs:
+# ISBN: a string containing the ISBN
+# title: a string containing the title
+# author: a string containing the author
+# link_limit: the number of links to search through before giving up
+#             A value of -1 will search through all links.
+#
+# Outputs:
+# title: string containing the title of the book
+# author: string containing the author of the book
+# lcc: string containing the LC classification of the book
+# (together a BookRecord, which also has them as .title, .author and .lcc)
+#
+# If open_lcc_dump_index has been called, an ISBN search first checks the
+# offline LCC index. If open_title_author_index has been called, a title
+# and author search first offers the closest book already classified, if
+# it is close enough.
+
+    result = search_local_indexes(args, user_validation)
+    if(result is not None):
+        return result
+
+    url, link_limit = classify_search_args(args)
+    return search_classify_url(url, link_limit, user_validation,
+                               miss_key=search_miss_key(args))
+
+def search_classify_concurrent(*args):
+# Searches classify.oclc.org like search_classify, but fetches all of the
+# result links at once when the first page does not hold the book's
+# information. The results are still shown to the user in their original
+# order, so a fallback lookup costs about two round trips instead of one
+# per link.
+#
+# Usage
+# title, author, lcc = search_classify_concurrent(ISBN, link_limit)
+# title, author, lcc = search_classify_concurrent(title, author, link_limit)
+#
+# Inputs and outputs are the same as search_classify
+
+    result = search_local_indexes(args, user_validation)
+    if(result is not None):
+        return result
+
+    url, link_limit = classify_search_args(args)
+    return search_classify_url(url, link_limit, user_validation,
+                               concurrent=True, miss_key=search_miss_key(args))
+
+class PrefetchedLookup(object):
+# A search of classify.oclc.org started on a background thread, so that
+# it can run while the user is busy with another book. The first valid
+# result is found in the background; validate then shows it to the user
+# without waiting on the network, and only looks further if it is
+# rejected.
+#
+# Usage
+# lookup = PrefetchedLookup((ISBN, link_limit))
+# lookup = PrefetchedLookup((title, author, link_limit))
+# title, author, lcc = lookup.validate()
+#
+# Inputs
+# args: a tuple with the same arguments as search_classify
+#
+# A book in the local indexes is offered first, so the website is not
+# searched in the background for it, only if it is rejected.
+
+    def __init__(self, args):
+        self.args = args
+        self.miss_key = search_miss_key(args)
+        self.errors = []
+        self.fetched = []
+        self.known_miss = (negative_cache is not None and
+                           negative_cache.is_miss(self.miss_key))
+        self.candidates = iter(())
+        self.first = None
+        self.error = None
+        self.started = False
+        self.done = threading.Event()
+
+        if(not has_local_match(args)):
+            self.start()
+
+    def start(self):
+    # Starts the search on a background thread
+
+        self.started = True
+        if(not self.known_miss):
+            # A known miss found nothing last time, so there is nothing to
+            # fetch
+            url, link_limit = classify_search_args(self.args)
+            if(negative_cache is not None and negative_cache.refresh):
+                forget_pages([url])
+            self.candidates = classify_candidates(url, link_limit,
+                                                  quiet=True,
+                                                  concurrent=True,
+                                                  errors=self.errors,
+                                                  fetched=self.fetched)
+
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        try:
+            self.first = next(self.candidates, None)
+        except Exception:
+            self.error = sys.exc_info()
+        self.done.set()
+
+    def ready(self):
+    # Returns True once the first result has been found (or ruled out), or
+    # if a match in the local indexes is waiting to be offered
+
+        return not self.started or self.done.is_set()
+
+    def validate(self, accept=user_validation):
+    # Waits for the background search, then passes each valid result to
+    # accept until one is approved. A match in the local indexes is
+    # offered first, without waiting.
+    #
+    # Outputs
+    # record: the accepted BookRecord, or one with blank strings
+    #
+    # If nothing was accepted and part of the search could not be
+    # fetched, the first requests.RequestException is raised instead, so
+    # the failure is not taken for a book that was not found.
+
+        result = search_local_indexes(self.args, accept)
+        if(result is not None):
+            return result
+        if(not self.started):
+            self.start()
+
+        # A timeout keeps Ctrl-C working while waiting
+        while(not self.done.wait(1)):
+            pass
+
+        if(self.error is not None):
+            raise self.error[0], self.error[1], self.error[2]
+
+        candidate = self.first
+        while(candidate is not None):
+            if(accept(*candidate)):
+                if(negative_cache is not None and negative_cache.refresh):
+                    negative_cache.remove(self.miss_key)
+                return BookRecord(*candidate)
+            candidate = next(self.candidates, None)
+
+        if(self.errors):
+            raise self.errors[0]
+
+        # Remember a search that reached the website and found nothing
+        if(negative_cache is not None and self.first is None and
+           not self.known_miss):
+            negative_cache.add(self.miss_key)
+            forget_pages(self.fetched)
+
+        return BookRecord()
+
+def prefetch_classify(*args):
+# Starts searching classify.oclc.org in the background for the specified
+# ISBN or title and author. The result is checked by the user later.
+#
+# Usage
+# lookup = prefetch_classify(ISBN, link_limit)
+# lookup = prefetch_classify(title, author, link_limit)
+# ...
+# title, author, lcc = lookup.validate()
+#
+# Inputs are the same as search_classify
+#
+# Outputs
+# lookup: a PrefetchedLookup
+
+    return PrefetchedLookup(args)
+
+def accept_info(title, author, lcc):
+# Accepts any result without asking the user. Used in place of
+# user_validation when no one is at the keyboard.
+
+    return True
+
+def search_classify_auto(*args):
+# Searches classify.oclc.org like search_classify, but without any
+# prompts or messages. The first valid result is accepted, so it is
+# safe to call from worker threads in batch runs. If the website cannot
+# be reached, requests.RequestException is raised rather than returning
+# blank strings. Since nobody checks the result, the title/author index
+# only answers for the same title and author, not a close spelling.
+#
+# Usage
+# title, author, lcc = search_classify_auto(ISBN, link_limit)
+# title, author, lcc = search_classify_auto(title, author, link_limit)
+#
+# Inputs and outputs are the same as search_classify
+
+    result = search_local_indexes(args, accept_info, quiet=True, exact=True)
+    if(result is not None):
+        return result
+
+    url, link_limit = classify_search_args(args)
+    return search_classify_url(url, link_limit, accept_info, quiet=True,
+                               raise_errors=True,
+                               miss_key=search_miss_key(args))
+
+class CoalescingLookup(object):
+# Runs lookups for many callers at once, such as the stations served by
+# lcc_server.py. When a lookup is asked for while the same one is
+# already running, the caller waits for that one instead of starting
+# another, so the website is searched once however many ask. Finished
+# results are kept in memory for a while, so a book scanned at one
+# station is answered at once at the next.
+#
+# Usage
+# lookups = CoalescingLookup(search_classify_auto)
+# result, how = lookups.get(key, ISBN, link_limit)
+#
+# Inputs
+# lookup: the function doing the lookup
+# ttl: the number of seconds results are kept
+# max_entries: the most results kept, the least recently used going first
+
+    def __init__(self, lookup, ttl=3600, max_entries=10000):
+        self.lookup = lookup
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.results = collections.OrderedDict() # key -> (expires, result)
+        self.running = {} # key -> RunningLookup
+        self.counts = {'cache': 0, 'shared': 0, 'searched': 0}
+        self.lock = threading.Lock()
+
+    def get(self, key, *args):
+    # Returns the result of lookup(*args), and how it was found: 'cache'
+    # for a kept result, 'shared' for one that was already running, or
+    # 'searched'. Lookups that raise an exception are not kept, and the
+    # exception is raised for every caller waiting on them.
+
+        with self.lock:
+            kept = self.results.get(key)
+            if(kept is not None and kept[0] >= time.time()):
+                # Move it to the most recently used end
+                del self.results[key]
+                self.results[key] = kept
+                self.counts['cache'] += 1
+                metrics.count('coalesced_lookups_total',
+                              labels={'how': 'cache'})
+                return kept[1], 'cache'
+
+            running = self.running.get(key)
+            starting = running is None
+            if(starting):
+                running = self.running[key] = RunningLookup()
+            how = 'searched' if starting else 'shared'
+            self.counts[how] += 1
+        metrics.count('coalesced_lookups_total', labels={'how': how})
+
+        if(starting):
+            try:
+                running.result = self.lookup(*args)
+            except Exception:
+                running.error = sys.exc_info()
+
+            with self.lock:
+                del self.running[key]
+                if(running.error is None):
+                    self.results[key] = (time.time() + self.ttl,
+                                         running.result)
+                    while(len(self.results) > self.max_entries):
+                        self.results.popitem(last=False)
+            running.done.set()
+        else:
+            # A timeout keeps Ctrl-C working while waiting
+            while(not running.done.wait(1)):
+                pass
+
+        if(running.error is not None):
+            raise running.error[0], running.error[1], running.error[2]
+        return running.result, how
+
+    def stats(self):
+    # Returns a dictionary with the number of lookups answered each way,
+    # the number running and the number of results kept
+
+        with self.lock:
+            stats = dict(self.counts)
+            stats['running'] = len(self.running)
+            stats['kept'] = len(self.results)
+        return stats
+
+class RunningLookup(object):
+# A lookup in progress in a CoalescingLookup, which other callers can
+# wait on
+
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class BufferedCSVWriter(object):
+# Collects rows for a CSV file and writes them in groups, instead of
+# writing and flushing every row on its own. The rows are committed
+# (written, flushed and optionally synced to disk) once max_rows are
+# waiting or the oldest has waited max_delay seconds, whichever comes
+# first. Anything committed survives a crash. Waiting rows are also
+# committed when the program exits.
+#
+# Usage
+# csv = BufferedCSVWriter(open_isbn_csv(file_name))
+# write_isbn_csv(ISBN, lcc, csv)
+# csv.close()
+#
+# Inputs
+# csv_file: a file object returned by open_isbn_csv or
+#           open_title_author_csv
+# max_rows: the number of rows to collect before committing
+# max_delay: the longest time in seconds a row waits to be committed
+# fsync: if True, each commit waits for the data to reach the disk
+
+    def __init__(self, csv_file, max_rows=100, max_delay=1.0, fsync=False):
+        self.csv_file = csv_file
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.chunks = []
+        self.num_rows = 0
+        self.timer = None
+        self.lock = threading.RLock()
+        atexit.register(self.commit)
+
+    def add(self, text, num_rows=1):
+    # Adds text holding num_rows formatted rows to the waiting rows
+
+        with self.lock:
+            self.chunks.append(text)
+            self.num_rows += num_rows
+
+            if(self.num_rows >= self.max_rows):
+                self.commit()
+            elif(self.timer is None):
+                self.timer = threading.Timer(self.max_delay, self.commit)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def commit(self):
+    # Writes all waiting rows to the file in one write
+
+        with self.lock:
+            if(self.timer is not None):
+                self.timer.cancel()
+                self.timer = None
+            if(not self.chunks or self.csv_file.closed):
+                return
+
+            with metrics.timer('csv_commit_seconds'):
+                self.csv_file.write(''.join(self.chunks))
+                self.csv_file.flush()
+                if(self.fsync):
+                    os.fsync(self.csv_file.fileno())
+            self.chunks = []
+            self.num_rows = 0
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.csv_file.close()
+
+def format_csv_row(fields):
+# Formats one row of a CSV file, quoting every field the way Readerware
+# expects. Quotes inside a field are doubled.
+#
+# Usage
+# text = format_csv_row(fields)
+#
+# Inputs
+# fields: a list of strings
+#
+# Outputs
+# text: a string holding the row, ending in a newline
+
+    fields = [field.encode('utf-8') if isinstance(field, unicode) else field
+              for field in fields]
+    text = cStringIO.StringIO()
+    csv.writer(text, quoting=csv.QUOTE_ALL, lineterminator='\n'). \
+        writerow(fields)
+    return text.getvalue()
+
+def write_csv_rows(csv_out, fields, copies):
+# Writes copies of one row to a CSV file. A BufferedCSVWriter collects
+# them for its next commit; a plain file is written and flushed at once.
+# Either way, all of the copies go out in a single write.
+
+    start = time.time()
+    text = format_csv_row(fields) * copies
+    if(isinstance(csv_out, BufferedCSVWriter)):
+        csv_out.add(text, copies)
+    else:
+        csv_out.write(text)
+        csv_out.flush() #Force writing to the file (rather than buffering)
+    metrics.observe('csv_write_seconds', time.time() - start)
+    metrics.count('csv_rows_total', copies)
+
+def write_title_author_csv(title, author, lcc, csv, copies=1):
+# Writes the title and author to the next line of the CSV file.
+# It will first convert the unicode to ascii for display purposes,
+# and then write them to the file in the proper format.
+#
+# Usage
+# write_title_author_csv(title, author, lcc, csv)
+# write_title_author_csv(title, author, lcc, csv, copies)
+#
+# Inputs
+# title: string holding the title
+# author: string holding the author
+# lcc: string holding the Library of Congress Classification
+# csv: CSV opened or created by open_title_author_csv, a
+#      BufferedCSVWriter around it, or a CatalogStore
+# copies: the number of identical rows to write
+#
+# Warning
+# This function does not verify that you are writing to the
+# title_author_csv file. It simply will append to that file
+
+    # Convert title and author to ascii equivalents
+    title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore')
+    author = unicodedata.normalize('NFKD', author).encode('ascii', 'ignore')
+
+    # Write to the file
+    if(isinstance(csv, CatalogStore)):
+        csv.write_title_author(title, author, lcc, copies)
+    else:
+        write_csv_rows(csv, [title, author, lcc], copies)
+
+    # Later searches can find the book without the website
+    if(title_author_index is not None):
+        title_author_index.add(title, author, lcc)
+
+def write_isbn_csv(ISBN, lcc, csv, copies=1):
+# Writes the ISBN and LCC to the ISBN csv file. Currently, no extra
+# processing is done for the file.
+#
+# Usage
+# write_isbn_csv(ISBN, lcc, csv)
+# write_isbn_csv(ISBN, lcc, csv, copies)
+#
+# Inputs
+# ISBN: string containing the ISBN
+# lcc: string containing the Library of Congress Classification
+# csv: file object returned by open_isbn_csv, a BufferedCSVWriter
+#      around it, or a CatalogStore
+# copies: the number of identical rows to write
+#
+# Warning
+# This function does not verify that you are writing to the isbn_csv file.
+# It will simply append to that file.
+
+    # Save the information to the CSV file
+    if(isinstance(csv, CatalogStore)):
+        csv.write_isbn(ISBN, lcc, copies)
+    else:
+        write_csv_rows(csv, [ISBN, lcc], copies)
     
+def normalize_title_author(title, author):
+# Reduces a title and author to a key that ignores case, accents,
+# punctuation and spacing, so small differences in how a book was typed
+# still match.
+#
+# Usage
+# key = normalize_title_author(title, author)
+#
+# Inputs
+# title: string holding the title
+# author: string holding the author
+#
+# Outputs
+# key: a string combining the normalized title and author
+
+    return normalize_text(title) + '|' + normalize_text(author)
+
+def normalize_text(text):
+# Lowercases a string and reduces it to ascii letters and digits, with
+# single spaces between the words.
+
+    if(isinstance(text, unicode)):
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore')
+    return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+
+class ClassifiedIndex(object):
+# An in-memory index of the books already saved to the CSV files, so a
+# book that is scanned again can be answered without searching for it
+# (and without adding a duplicate row). ISBNs are keyed by their ISBN-13
+# form, and titles and authors by normalize_title_author.
+#
+# Usage
+# index = ClassifiedIndex()
+# index.load_isbn_csv(file_name)
+# index.load_title_author_index(title_author_index)
+# lcc = index.lookup_isbn(ISBN) # None if not known
+# index.add_isbn(ISBN, lcc)
+
+    def __init__(self):
+        self.isbns = {}
+        self.titles = {}
+
+    def load_isbn_csv(self, file_name):
+    # Adds every row of an ISBN CSV file to the index. The file is read
+    # one row at a time. Missing files are ignored.
+
+        if(not os.path.isfile(file_name)):
+            return
+
+        isbns = self.isbns
+        with open(file_name, 'rb') as csv_file:
+            for row in csv.reader(csv_file):
+                # Skip the header and anything else that isn't a book
+                if(len(row) < 2):
+                    continue
+                ISBN = row[0]
+                if(len(ISBN) == 13):
+                    isbns[ISBN] = row[1]
+                elif(len(ISBN) == 10):
+                    isbns[canonical_ISBN(ISBN)] = row[1]
+
+    def load_title_author_csv(self, file_name):
+    # Adds every row of a title/author CSV file to the index. The file is
+    # read one row at a time. Missing files are ignored.
+
+        if(not os.path.isfile(file_name)):
+            return
+
+        titles = self.titles
+        with open(file_name, 'rb') as csv_file:
+            rows = csv.reader(csv_file)
+            next(rows, None) # Skip the header
+            for row in rows:
+                if(len(row) >= 3):
+                    titles[normalize_title_author(row[0], row[1])] = row[2]
+
+    def load_title_author_index(self, index):
+    # Adds every book in a TitleAuthorIndex to the index, so a
+    # title/author CSV file that was already read for it is not read
+    # again
+
+        with index.lock:
+            for key, position in index.keys.iteritems():
+                self.titles[key] = index.books[position][2]
+
+    def lookup_isbn(self, ISBN):
+    # Returns the LCC saved for the ISBN, or None
+
+        if(len(ISBN) == 10):
+            ISBN = canonical_ISBN(ISBN)
+        return self.isbns.get(ISBN)
+
+    def lookup_title_author(self, title, author):
+    # Returns the LCC saved for the title and author, or None
+
+        return self.titles.get(normalize_title_author(title, author))
+
+    def add_isbn(self, ISBN, lcc):
+        if(len(ISBN) == 10):
+            ISBN = canonical_ISBN(ISBN)
+        self.isbns[ISBN] = lcc
+
+    def add_title_author(self, title, author, lcc):
+        self.titles[normalize_title_author(title, author)] = lcc
+
+def open_classified_index(isbn_file_name=None, title_author_file_name=None):
+# Builds a ClassifiedIndex from the existing CSV files.
+#
+# Usage
+# index = open_classified_index("ISBNsLCC.csv", "TitleAuthorLCC.csv")
+# index = open_classified_index("ISBNsLCC.csv")
+# index.load_title_author_index(open_title_author_index("TitleAuthorLCC.csv"))
+#
+# Inputs
+# isbn_file_name: the ISBN CSV file, or None
+# title_author_file_name: the title/author CSV file, or None
+#
+# Outputs
+# index: the ClassifiedIndex
+
+    index = ClassifiedIndex()
+    if(isbn_file_name is not None):
+        index.load_isbn_csv(isbn_file_name)
+    if(title_author_file_name is not None):
+        index.load_title_author_csv(title_author_file_name)
+    return index
+
+# The class part of an LCC, such as QA76.73 in QA76.73.P98 L88 2013. It is
+# shared by many books, while the cutter and date after it rarely are.
+lcc_class_pattern = re.compile(r'[A-Z]{1,3} ?\d+(?:\.\d+)?(?=\.?[A-Z]| |$)')
+
+def split_lcc(lcc):
+# Splits an LCC into its class and the rest, so that lcc == lcc_class +
+# rest. The class is blank if the LCC does not start with one.
+#
+# Usage
+# lcc_class, rest = split_lcc("QA76.73.P98 L88 2013")
+# # "QA76.73", ".P98 L88 2013"
+
+    match = lcc_class_pattern.match(lcc)
+    if(match is None):
+        return lcc[:0], lcc
+    return lcc[:match.end()], lcc[match.end():]
+
+# The parts of an LCC call number, such as QA76.73.P98 L88 2013: the class
+# letters (QA), class number (76.73), cutters (.P98 L88) and whatever
+# follows (2013)
+lcc_call_number_pattern = re.compile(r'([A-Z]{1,3}) ?(\d{1,4})(?:\.(\d+))?'
+                                     r'((?: ?\.? ?[A-Z]\d+)*)(.*)$')
+lcc_cutter_pattern = re.compile(r'([A-Z])(\d+)')
+
+# The widths of the parts of an LCC sort key. Digits past these widths are
+# ignored when sorting.
+lcc_key_decimals = 6 # digits of the class number after the point
+lcc_key_cutters = 3 # cutters, each a letter and up to lcc_key_decimals digits
+lcc_key_rest = 24 # characters of what follows the cutters
+lcc_sort_key_width = 3 + 4 + lcc_key_decimals + \
+                     lcc_key_cutters * (1 + lcc_key_decimals) + lcc_key_rest
+
+def parse_lcc(lcc):
+# Splits an LCC call number into its parts.
+#
+# Usage
+# parts = parse_lcc("QA76.73.P98 L88 2013")
+# # ('QA', '76', '73', [('P', '98'), ('L', '88')], '2013')
+#
+# Inputs
+# lcc: a string holding the LCC
+#
+# Outputs
+# parts: (letters, class number, decimals, cutters, rest), or None if
+#        the string is not an LCC
+
+    if(isinstance(lcc, unicode)):
+        lcc = unicodedata.normalize('NFKD', lcc).encode('ascii', 'ignore')
+    match = lcc_call_number_pattern.match(lcc.strip().upper())
+    if(match is None):
+        return None
+    letters, number, decimals, cutters, rest = match.groups()
+    return (letters, number, decimals or '',
+            lcc_cutter_pattern.findall(cutters), rest.strip())
+
+def lcc_sort_key(lcc):
+# Returns a byte string that sorts in shelf order, for sorting LCCs with
+# plain string comparison. As strings, QA76.8 sorts before QA76.73 and
+# QA9 after QA76; as keys they sort as they stand on the shelf. Every key
+# is lcc_sort_key_width long, so keys can be sorted as fixed width
+# records. LCCs that cannot be read sort after all the others, and blank
+# ones last.
+#
+# Usage
+# lccs.sort(key=lcc_sort_key)
+#
+# Inputs
+# lcc: a string holding the LCC
+#
+# Outputs
+# key: a byte string of lcc_sort_key_width characters
+
+    parts = parse_lcc(lcc)
+    if(parts is None):
+        if(isinstance(lcc, unicode)):
+            lcc = lcc.encode('utf-8')
+        text = ' '.join(lcc.upper().split())
+        if(not text):
+            return '~' * lcc_sort_key_width
+        return ('~' + text).ljust(lcc_sort_key_width)[:lcc_sort_key_width]
+
+    letters, number, decimals, cutters, rest = parts
+
+    # Class numbers are whole numbers, but the digits after the point and
+    # in cutters are decimal fractions, so .73 comes before .8. Spaces
+    # pad them because a space sorts before any digit.
+    key = [letters.ljust(3), number.zfill(4),
+           decimals[:lcc_key_decimals].ljust(lcc_key_decimals)]
+    for letter, digits in cutters[:lcc_key_cutters]:
+        key.append(letter + digits[:lcc_key_decimals].ljust(lcc_key_decimals))
+    key.append(' ' * (1 + lcc_key_decimals) *
+               (lcc_key_cutters - len(cutters)))
+
+    # Further cutters join the rest, where numbers such as years and volumes
+    # are padded with zeros so v.2 sorts before v.10
+    for letter, digits in cutters[lcc_key_cutters:]:
+        rest = letter + digits + ' ' + rest
+    rest = re.sub(r'\d+', lambda number: number.group().zfill(6),
+                  ' '.join(rest.split()))
+    key.append(rest[:lcc_key_rest].ljust(lcc_key_rest))
+    return ''.join(key)
+
+def lcc_sort_keys(lccs):
+# Returns the sort keys of a whole column of LCCs at once. A catalog
+# repeats the same LCC for every copy of a book and often for other
+# volumes, so each different LCC is parsed only once.
+#
+# Most of the time goes to matching each LCC against
+# lcc_call_number_pattern, which NumPy cannot do a column at a time.
+# Splitting the parsed parts into NumPy columns to pad and join them (as
+# BulkISBN.py does with ISBN digits) was about twice as slow as this on
+# 100,000 LCCs, whether or not they repeated, so NumPy is not used here.
+#
+# Usage
+# keys = lcc_sort_keys(lccs)
+#
+# Inputs
+# lccs: a list of strings holding the LCCs
+#
+# Outputs
+# keys: a list of the lcc_sort_key of each, in the same order
+
+    keys = dict.fromkeys(lccs)
+    for lcc in keys:
+        keys[lcc] = lcc_sort_key(lcc)
+    return map(keys.__getitem__, lccs)
+
+def write_shelf_list(csv_file_name, shelf_file_name, chunk_size=200000):
+# Writes a copy of ISBNsLCC.csv or TitleAuthorLCC.csv with its rows in
+# shelf order, so the books can be checked against the shelves or
+# shelved from the list. Books with the same LCC keep the order they
+# were scanned in. The rows are sorted with external_sort, so files
+# larger than memory can be sorted. The copy is written under a temporary
+# name and renamed when done.
+#
+# Usage
+# count = write_shelf_list("ISBNsLCC.csv", "ISBNsLCCShelf.csv")
+#
+# Inputs
+# csv_file_name: the CSV file to sort, whose last column holds the LCC
+# shelf_file_name: the sorted file to write
+# chunk_size: the number of rows sorted in memory at a time
+#
+# Outputs
+# count: the number of rows written, not counting the header
+
+    with open(csv_file_name, 'rb') as csv_file:
+        rows = csv.reader(csv_file)
+        header = next(rows, None)
+
+        temp_name = shelf_file_name + '.tmp'
+        count = 0
+        with open(temp_name, 'wb') as shelf_file:
+            if(header is not None):
+                shelf_file.write(format_csv_row(header))
+            start = lcc_sort_key_width + 12
+            for record in external_sort(shelf_list_records(rows),
+                                        chunk_size, fixed_width=False):
+                shelf_file.write(record[start:])
+                count += 1
+
+    if(os.name == 'nt' and os.path.isfile(shelf_file_name)):
+        # Windows cannot rename over an existing file
+        os.remove(shelf_file_name)
+    os.rename(temp_name, shelf_file_name)
+    return count
+
+def shelf_list_records(rows, batch_size=10000):
+# Yields a record for each CSV row to be sorted by write_shelf_list: the
+# sort key of the row's LCC, its row number, and the row's text. The
+# rows are read in batches so their keys are made with lcc_sort_keys.
+
+    number = 0
+    while(True):
+        batch = list(itertools.islice(rows, batch_size))
+        if(not batch):
+            return
+        batch = [row for row in batch if row] # Skip blank lines
+        keys = lcc_sort_keys([row[-1] for row in batch])
+        for key, row in zip(keys, batch):
+            yield key + '%012d' % number + format_csv_row(row)
+            number += 1
+
+# A range of call numbers in the LCC outline, such as QA75.5-76.95 or
+# KJ-KKZ
+lcc_range_pattern = re.compile(r'([A-Z]{1,3}) ?(\d+(?:\.\d+)?)?'
+                               r'(?: ?- ?([A-Z]{1,3})? ?(\d+(?:\.\d+)?)?)?$')
+
+def lcc_range_bounds(range_text):
+# Returns the keys (see lcc_sort_key) at which a range of the outline
+# starts and ends. Every LCC in the range has a key at least as large as
+# the start and smaller than the end. An end without a class number
+# covers every number under its letters, and one with a class number
+# covers its decimals (76.95 covers 76.951).
+#
+# Usage
+# start, end = lcc_range_bounds("QA75.5-76.95")
+#
+# Inputs
+# range_text: a string holding the range
+#
+# Outputs
+# start, end: byte strings to compare with the start of an LCC sort key
+
+    match = lcc_range_pattern.match(range_text.strip().upper())
+    if(match is None):
+        raise ValueError(range_text + ' is not a range of LCCs')
+    letters, number, end_letters, end_number = match.groups()
+    if(end_letters is None and end_number is None):
+        end_letters, end_number = letters, number
+    elif(end_letters is None):
+        end_letters = letters
+
+    def bound(letters, number, end):
+        key = letters.ljust(3)
+        if(number is not None):
+            whole, point, decimals = number.partition('.')
+            key += whole.zfill(4) + decimals
+        return key + '~' if end else key
+
+    return bound(letters, number, False), bound(end_letters, end_number, True)
+
+class LCCOutline(object):
+# An interval index over the ranges of an LCC outline, such as the one in
+# LCCOutline.txt, for finding the classes and subclasses an LCC falls in.
+# The start and end of every range divide the call numbers into segments
+# that each lie in the same ranges; the ranges of each segment are worked
+# out once when the index is built, so finding an LCC's ranges is a
+# binary search for its segment.
+#
+# Usage
+# outline = LCCOutline()
+# outline.add("QA", "Mathematics")
+# outline.build()
+# path = outline.classify("QA76.73.P98 L88 2013")
+# # [('Q-QR', 'Science'), ('QA', 'Mathematics'), ...]
+
+    def __init__(self):
+        self.ranges = [] # (start, end, range_text, caption)
+        self.segment_starts = []
+        self.segment_ranges = []
+
+    def add(self, range_text, caption):
+    # Adds a range to the outline. build must be called again afterwards.
+
+        start, end = lcc_range_bounds(range_text)
+        self.ranges.append((start, end, range_text, caption))
+
+    def load(self, file_name):
+    # Adds the ranges in an outline file: one range and its caption per
+    # line, separated by a tab. Blank lines and lines starting with # are
+    # skipped.
+
+        with codecs.open(file_name, 'r', 'utf-8') as outline_file:
+            for line in outline_file:
+                line = line.strip()
+                if(not line or line.startswith('#')):
+                    continue
+                range_text, tab, caption = line.partition('\t')
+                self.add(range_text.strip(), caption.strip())
+
+    def build(self):
+    # Works out the ranges of each segment by sweeping over the starts and
+    # ends of the ranges in order
+
+        starting = collections.defaultdict(list)
+        ending = collections.defaultdict(list)
+        for number, (start, end, range_text, caption) in \
+                enumerate(self.ranges):
+            starting[start].append(number)
+            ending[end].append(number)
+
+        active = set()
+        self.segment_starts = []
+        self.segment_ranges = []
+        for point in sorted(set(starting) | set(ending)):
+            active.difference_update(ending[point])
+            active.update(starting[point])
+            # Wider ranges first: those starting earlier, then ending later
+            numbers = sorted(active, key=lambda number: self.ranges[number][1],
+                             reverse=True)
+            numbers.sort(key=lambda number: self.ranges[number][0])
+            self.segment_starts.append(point)
+            self.segment_ranges.append(tuple(numbers))
+
+    def segment(self, lcc):
+    # Returns the number of the segment an LCC falls in, or -1
+
+        key = lcc_sort_key(lcc)
+        return bisect.bisect_right(self.segment_starts, key) - 1
+
+    def ranges_of_segment(self, segment):
+    # Returns the numbers of the ranges a segment lies in, widest first
+
+        if(segment < 0):
+            return ()
+        return self.segment_ranges[segment]
+
+    def classify(self, lcc):
+    # Returns the ranges an LCC falls in, from its class down to the
+    # narrowest, as (range, caption) pairs. The list is empty if the LCC
+    # is not in any of them.
+
+        return [self.ranges[number][2:]
+                for number in self.ranges_of_segment(self.segment(lcc))]
+
+    def depths(self, count=None):
+    # Returns the depth of each range: 0 for the ranges not inside any
+    # other, 1 for those inside one, and so on. If count is given, only
+    # the first count ranges are counted as holding others, so ranges
+    # added after them (such as a report's own) leave them where they are.
+
+        if(count is None):
+            count = len(self.ranges)
+        depths = [0] * len(self.ranges)
+        for numbers in self.segment_ranges:
+            depth = 0
+            for number in numbers:
+                depths[number] = max(depths[number], depth)
+                if(number < count):
+                    depth += 1
+        return depths
+
+def load_lcc_outline(file_name=None):
+# Reads an LCC outline file into an LCCOutline, ready for searching.
+#
+# Usage
+# outline = load_lcc_outline() # The LCCOutline.txt next to this module
+# outline = load_lcc_outline(file_name)
+#
+# Inputs
+# file_name: a string containing the outline file's name, or None
+#
+# Outputs
+# outline: the LCCOutline
+
+    if(file_name is None):
+        file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'LCCOutline.txt')
+    outline = LCCOutline()
+    outline.load(file_name)
+    outline.build()
+    return outline
+
+def count_subjects(outline, csv_file_names):
+# Counts the books in each range of an outline, for a report on the
+# subjects of a collection. The CSV files are read in one pass, a row at
+# a time, and each row is counted once in its segment of the outline; the
+# counts of the ranges are added up from those of their segments at the
+# end. Each row is a book, so copies are counted separately.
+#
+# Usage
+# counts = count_subjects(outline, ["ISBNsLCC.csv", "TitleAuthorLCC.csv"])
+#
+# Inputs
+# outline: the LCCOutline
+# csv_file_names: a list of CSV files whose last column holds the LCC.
+#                 Missing files are ignored.
+#
+# Outputs
+# counts: a dictionary with the number of books in each range, by its
+#         number in outline.ranges, along with 'total' and 'unclassified'
+#         (books outside every range, or with no LCC)
+
+    segment_counts = collections.defaultdict(int)
+    segments = {} # The segment of each class part of an LCC already seen
+    total = 0
+    for file_name in csv_file_names:
+        if(not os.path.isfile(file_name)):
+            continue
+        with open(file_name, 'rb') as csv_file:
+            rows = csv.reader(csv_file)
+            next(rows, None) # Skip the header
+            for row in rows:
+                if(not row):
+                    continue
+                total += 1
+                lcc_class = split_lcc(row[-1])[0]
+                segment = segments.get(lcc_class) if lcc_class else None
+                if(segment is None):
+                    segment = outline.segment(row[-1])
+                    if(lcc_class):
+                        segments[lcc_class] = segment
+                segment_counts[segment] += 1
+
+    counts = collections.defaultdict(int)
+    classified = 0
+    for segment, count in segment_counts.items():
+        numbers = outline.ranges_of_segment(segment)
+        for number in numbers:
+            counts[number] += count
+        if(numbers):
+            classified += count
+    counts['total'] = total
+    counts['unclassified'] = total - classified
+    return dict(counts)
+
+# ISBN-13s are packed into 4 bytes by keeping whether they start with 978
+# or 979 and the nine digits after that; the check digit is worked out
+# again when they are read back. This marks a book with no ISBN.
+no_packed_ISBN = 0xFFFFFFFF
+
+def pack_ISBN(ISBN):
+# Returns an ISBN-10 or ISBN-13 packed into an integer below 2**32, or
+# no_packed_ISBN if it is blank, invalid or has neither prefix
+
+    if(not ISBN or not is_ISBN(ISBN)):
+        return no_packed_ISBN
+    ISBN = canonical_ISBN(ISBN)
+    if(ISBN[:3] not in ('978', '979')):
+        return no_packed_ISBN
+    return (ISBN[2] == '9') * 1000000000 + int(ISBN[3:12])
+
+def unpack_ISBN(number):
+# Returns the ISBN-13 packed by pack_ISBN, or a blank string
+
+    if(number == no_packed_ISBN):
+        return ''
+    prefix, middle = divmod(number, 1000000000)
+    return ISBN_13_check_digit('97%d%09d' % (8 + prefix, middle))
+
+class BookCatalog(object):
+# A large collection of classified books held in as little memory as
+# possible, for reports over a whole catalog. Each field is kept in its
+# own column rather than as an object per book: ISBNs as 4 byte integers,
+# titles and the ends of the LCCs packed into single byte strings, and
+# authors and LCC classes, which repeat from book to book, stored once
+# each and referred to by number. A million books take around a sixth of
+# the memory of a list of (title, author, lcc) tuples.
+#
+# Books are numbered in the order they were added, and read back as
+# BookRecords.
+#
+# Usage
+# catalog = BookCatalog()
+# catalog.load_isbn_csv(file_name)
+# catalog.add(ISBN, title, author, lcc)
+# record = catalog[i]
+# ISBN = catalog.isbn(i) # blank if it was added without one
+# for ISBN, record in catalog.items():
+# record = catalog.find_ISBN(ISBN) # None if not known
+
+    def __init__(self):
+        self.isbns = array.array('I') # See pack_ISBN
+        self.titles = bytearray() # utf-8, one after another
+        self.title_ends = array.array('L')
+        self.author_ids = array.array('I')
+        self.class_ids = array.array('I')
+        self.lcc_rests = bytearray()
+        self.lcc_rest_ends = array.array('L')
+        self.strings = [] # Each author and LCC class, once
+        self.string_ids = {}
+        self.isbn_order = None # Built by find_ISBN
+
+    def __len__(self):
+        return len(self.isbns)
+
+    def intern(self, text):
+    # Returns the number of a shared author or LCC class string, adding it
+    # if it is new
+
+        if(not isinstance(text, unicode)):
+            text = text.decode('utf-8', 'replace')
+        number = self.string_ids.get(text)
+        if(number is None):
+            number = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return number
+
+    def encode(self, text):
+    # Returns text as UTF-8 bytes. Bytes that are not UTF-8 are replaced,
+    # as in intern, so that every book can be read back.
+
+        if(not isinstance(text, unicode)):
+            text = text.decode('utf-8', 'replace')
+        return text.encode('utf-8')
+
+    def add(self, ISBN, title, author, lcc):
+    # Adds a book to the end of the catalog. ISBN may be blank, or an
+    # ISBN-10 or ISBN-13.
+
+        self.isbns.append(pack_ISBN(ISBN))
+
+        self.titles.extend(self.encode(title))
+        self.title_ends.append(len(self.titles))
+
+        self.author_ids.append(self.intern(author))
+
+        lcc_class, rest = split_lcc(lcc)
+        self.class_ids.append(self.intern(lcc_class))
+        self.lcc_rests.extend(self.encode(rest))
+        self.lcc_rest_ends.append(len(self.lcc_rests))
+
+        self.isbn_order = None
+
+    def __getitem__(self, i):
+        if(i < 0):
+            i += len(self)
+        if(i < 0 or i >= len(self)):
+            raise IndexError('catalog index out of range')
+
+        start = self.title_ends[i - 1] if i > 0 else 0
+        title = self.titles[start:self.title_ends[i]].decode('utf-8')
+        start = self.lcc_rest_ends[i - 1] if i > 0 else 0
+        rest = self.lcc_rests[start:self.lcc_rest_ends[i]].decode('utf-8')
+        return BookRecord(title, self.strings[self.author_ids[i]],
+                          self.strings[self.class_ids[i]] + rest)
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def isbn(self, i):
+    # Returns the ISBN-13 of a book, or a blank string
+
+        return unpack_ISBN(self.isbns[i])
+
+    def items(self):
+    # Yields (ISBN, record) for every book, in the order they were added
+
+        for i in xrange(len(self)):
+            yield self.isbn(i), self[i]
+
+    def find_ISBN(self, ISBN):
+    # Returns the record of the book last added with the ISBN, or None.
+    # The first search after an add sorts the ISBNs, and each search is
+    # then a binary search.
+
+        number = pack_ISBN(ISBN)
+        if(number == no_packed_ISBN):
+            return None
+
+        if(self.isbn_order is None):
+            isbns = self.isbns
+            # sorted is stable, so equal ISBNs stay in the order added
+            order = array.array('L', sorted(xrange(len(isbns)),
+                                            key=isbns.__getitem__))
+            self.isbn_order = (order,
+                               array.array('I', (isbns[i] for i in order)))
+        order, keys = self.isbn_order
+
+        position = bisect.bisect_right(keys, number) - 1
+        if(position < 0 or keys[position] != number):
+            return None
+        return self[order[position]]
+
+    def load_isbn_csv(self, file_name):
+    # Adds every row of an ISBN CSV file to the catalog, with a blank
+    # title and author. Missing files are ignored.
+
+        if(not os.path.isfile(file_name)):
+            return
+
+        with open(file_name, 'rb') as csv_file:
+            for row in csv.reader(csv_file):
+                # Skip the header and anything else that isn't a book
+                if(len(row) >= 2 and is_ISBN(row[0])):
+                    self.add(row[0], '', '', row[1])
+
+    def load_title_author_csv(self, file_name):
+    # Adds every row of a title/author CSV file to the catalog, with no
+    # ISBN. Missing files are ignored.
+
+        if(not os.path.isfile(file_name)):
+            return
+
+        with open(file_name, 'rb') as csv_file:
+            rows = csv.reader(csv_file)
+            next(rows, None) # Skip the header
+            for row in rows:
+                if(len(row) >= 3):
+                    self.add('', row[0], row[1], row[2])
+
+def load_book_catalog(isbn_file_name=None, title_author_file_name=None):
+# Reads the existing CSV files into a BookCatalog, the ISBN file first.
+#
+# Usage
+# catalog = load_book_catalog("ISBNsLCC.csv", "TitleAuthorLCC.csv")
+#
+# Inputs
+# isbn_file_name: the ISBN CSV file, or None
+# title_author_file_name: the title/author CSV file, or None
+#
+# Outputs
+# catalog: the BookCatalog
+
+    catalog = BookCatalog()
+    if(isbn_file_name is not None):
+        catalog.load_isbn_csv(isbn_file_name)
+    if(title_author_file_name is not None):
+        catalog.load_title_author_csv(title_author_file_name)
+    return catalog
+
+class CatalogStore(object):
+# A catalog of classified books kept in a SQLite file, as an alternative
+# to ISBNsLCC.csv and TitleAuthorLCC.csv. The books are indexed by ISBN,
+# by normalized title and author, and by LCC sort key, so a book can be
+# looked up, and the catalog listed in shelf order, without reading every
+# row. The file is in WAL mode, so several stations can add books to the
+# same file at once while reports read it.
+#
+# It is used in place of both CSV files and of the ClassifiedIndex built
+# from them: pass it to write_isbn_csv and write_title_author_csv, and
+# look books up with lookup_isbn and lookup_title_author. Like a
+# BufferedCSVWriter, it collects books and commits them in a single
+# transaction once max_rows are waiting or the oldest has waited
+# max_delay seconds. export_catalog_store writes the CSV files again.
+#
+# Other names a book is known by, such as the ISBN of a book found by its
+# title and author, or the spelling of a title that was typed, are kept
+# as aliases (see add_isbn). They are found by the lookups but are not
+# books of their own, so they are not exported.
+#
+# Usage
+# store = CatalogStore(file_name)
+# write_isbn_csv(ISBN, lcc, store)
+# lcc = store.lookup_isbn(ISBN) # None if not known
+# store.close()
+#
+# Inputs
+# file_name: a string containing the SQLite file name
+# max_rows: the number of books to collect before committing
+# max_delay: the longest time in seconds a book waits to be committed
+
+    def __init__(self, file_name, max_rows=100, max_delay=1.0):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.rows = []
+        self.aliases = {} # waiting aliases, key -> (lcc, time added)
+        self.timer = None
+        self.closed = False
+        self.lock = threading.RLock()
+
+        # The connection is shared by threads, guarded by self.lock. Other
+        # stations writing the file are waited on for up to 30 seconds.
+        self.conn = sqlite3.connect(file_name, timeout=30,
+                                    check_same_thread=False)
+        self.conn.text_factory = str
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS books ('
+                          'id INTEGER PRIMARY KEY, isbn TEXT, '
+                          'isbn13 TEXT, title TEXT, author TEXT, '
+                          'title_author TEXT, lcc TEXT, lcc_key TEXT, '
+                          'copies INTEGER, added REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS books_isbn13 '
+                          'ON books (isbn13)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS books_title_author '
+                          'ON books (title_author)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS books_lcc_key '
+                          'ON books (lcc_key)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS aliases ('
+                          'key TEXT PRIMARY KEY, lcc TEXT, added REAL)')
+        self.conn.commit()
+        atexit.register(self.commit)
+
+    def write_isbn(self, ISBN, lcc, copies=1):
+    # Adds a book found by its ISBN, as write_isbn_csv does
+
+        ISBN13 = canonical_ISBN(ISBN) if is_ISBN(ISBN) else ISBN
+        self.add((ISBN, ISBN13, None, None, None, lcc, lcc_sort_key(lcc),
+                  copies, time.time()))
+
+    def write_title_author(self, title, author, lcc, copies=1):
+    # Adds a book found by its title and author, as write_title_author_csv
+    # does
+
+        self.add((None, None, title, author,
+                  normalize_title_author(title, author), lcc,
+                  lcc_sort_key(lcc), copies, time.time()))
+
+    def add(self, row):
+    # Adds a row of the books table to the waiting rows
+
+        with self.lock:
+            self.rows.append(row)
+            self.schedule_commit()
+
+    def schedule_commit(self):
+    # Commits if enough rows and aliases are waiting, or else makes sure
+    # they are committed within max_delay. The caller must hold self.lock.
+
+        if(len(self.rows) + len(self.aliases) >= self.max_rows):
+            self.commit()
+        elif(self.timer is None):
+            self.timer = threading.Timer(self.max_delay, self.commit)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def commit(self):
+    # Adds all waiting books and aliases in one transaction
+
+        with self.lock:
+            if(self.timer is not None):
+                self.timer.cancel()
+                self.timer = None
+            if((not self.rows and not self.aliases) or self.closed):
+                return
+
+            with metrics.timer('csv_commit_seconds'):
+                with self.conn:
+                    self.conn.executemany(
+                        'INSERT INTO books (isbn, isbn13, title, author, '
+                        'title_author, lcc, lcc_key, copies, added) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', self.rows)
+                    self.conn.executemany(
+                        'INSERT OR REPLACE INTO aliases (key, lcc, added) '
+                        'VALUES (?, ?, ?)',
+                        [(key, lcc, added) for key, (lcc, added)
+                         in self.aliases.iteritems()])
+            self.rows = []
+            self.aliases = {}
+
+    def lookup_isbn(self, ISBN):
+    # Returns the LCC saved for the ISBN, or None
+
+        if(is_ISBN(ISBN)):
+            ISBN = canonical_ISBN(ISBN)
+        return self.lookup(1, 'isbn13', ISBN, 'isbn:' + ISBN)
+
+    def lookup_title_author(self, title, author):
+    # Returns the LCC saved for the title and author, or None
+
+        key = normalize_title_author(title, author)
+        return self.lookup(4, 'title_author', key, 'title:' + key)
+
+    def lookup(self, position, column, value, alias_key):
+    # Returns the LCC of the newest book whose column (at position in the
+    # waiting rows) holds value, or else of the alias, or None
+
+        with self.lock:
+            # Books still waiting are newer than any in the file
+            for row in reversed(self.rows):
+                if(row[position] == value):
+                    return row[5]
+            row = self.conn.execute('SELECT lcc FROM books WHERE ' + column +
+                                    ' = ? ORDER BY id DESC LIMIT 1',
+                                    (value,)).fetchone()
+            if(row is None):
+                if(alias_key in self.aliases):
+                    return self.aliases[alias_key][0]
+                row = self.conn.execute('SELECT lcc FROM aliases '
+                                        'WHERE key = ?',
+                                        (alias_key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def add_isbn(self, ISBN, lcc):
+    # Remembers the LCC of an ISBN without adding a book, such as when the
+    # book was found by its title and author instead. Lets the store stand
+    # in for a ClassifiedIndex.
+
+        if(is_ISBN(ISBN)):
+            ISBN = canonical_ISBN(ISBN)
+        self.add_alias('isbn:' + ISBN, lcc, self.lookup_isbn(ISBN))
+
+    def add_title_author(self, title, author, lcc):
+    # Remembers the LCC of a title and author without adding a book, such
+    # as the spelling the user typed for a book found under another
+
+        key = normalize_title_author(title, author)
+        self.add_alias('title:' + key, lcc,
+                       self.lookup_title_author(title, author))
+
+    def add_alias(self, key, lcc, known_lcc):
+    # Adds an alias to the waiting aliases, unless the lookup already
+    # gives its LCC (known_lcc)
+
+        if(lcc == known_lcc):
+            return
+        with self.lock:
+            self.aliases[key] = (lcc, time.time())
+            self.schedule_commit()
+
+    def books(self, kind, shelf_order=False):
+    # Yields the books found by ISBN (kind 'isbn') as (ISBN, lcc, copies),
+    # or by title and author (kind 'title_author') as (title, author, lcc,
+    # copies), in the order they were added or in shelf order. Waiting
+    # books are committed first.
+
+        if(kind == 'isbn'):
+            query = 'SELECT isbn, lcc, copies FROM books WHERE isbn IS NOT NULL'
+        else:
+            query = ('SELECT title, author, lcc, copies FROM books '
+                     'WHERE isbn IS NULL')
+        query += ' ORDER BY lcc_key, id' if shelf_order else ' ORDER BY id'
+
+        # The books are read a row at a time from a cursor of their own, so
+        # nothing else should use the store until they have all been read
+        self.commit()
+        cursor = self.conn.cursor()
+        for row in cursor.execute(query):
+            yield row
+
+    def stored_copies(self, column, value, lcc):
+    # Returns the number of copies in the file of the book whose column
+    # holds value, with the given LCC
+
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(SUM(copies), 0) '
+                                     'FROM books WHERE ' + column +
+                                     ' = ? AND lcc = ?',
+                                     (value, lcc)).fetchone()[0]
+
+    def load_isbn_csv(self, file_name):
+    # Adds the rows of an ISBN CSV file to the store. Each row is a copy,
+    # and only copies beyond those already stored are added, so loading a
+    # file again adds nothing. Missing files are ignored.
+    #
+    # Outputs
+    # count: the number of rows added
+
+        count = 0
+        if(not os.path.isfile(file_name)):
+            return count
+
+        self.commit()
+        seen = collections.Counter()
+        stored = {}
+        with open(file_name, 'rb') as csv_file:
+            for row in csv.reader(csv_file):
+                # Skip the header and anything else that isn't a book
+                if(len(row) < 2 or not is_ISBN(row[0])):
+                    continue
+                key = (canonical_ISBN(row[0]), row[1])
+                if(key not in stored):
+                    stored[key] = self.stored_copies('isbn13', *key)
+                seen[key] += 1
+                if(seen[key] > stored[key]):
+                    self.write_isbn(row[0], row[1])
+                    count += 1
+        return count
+
+    def load_title_author_csv(self, file_name):
+    # Adds the rows of a title/author CSV file to the store, like
+    # load_isbn_csv. Missing files are ignored.
+    #
+    # Outputs
+    # count: the number of rows added
+
+        count = 0
+        if(not os.path.isfile(file_name)):
+            return count
+
+        self.commit()
+        seen = collections.Counter()
+        stored = {}
+        with open(file_name, 'rb') as csv_file:
+            rows = csv.reader(csv_file)
+            next(rows, None) # Skip the header
+            for row in rows:
+                if(len(row) < 3):
+                    continue
+                key = (normalize_title_author(row[0], row[1]), row[2])
+                if(key not in stored):
+                    stored[key] = self.stored_copies('title_author', *key)
+                seen[key] += 1
+                if(seen[key] > stored[key]):
+                    self.write_title_author(row[0], row[1], row[2])
+                    count += 1
+        return count
+
+    def close(self):
+    # Commits the waiting books and closes the file. Closing it again does
+    # nothing, so it can be closed as both the ISBN and title/author output.
+
+        with self.lock:
+            self.commit()
+            if(not self.closed):
+                self.closed = True
+                self.conn.close()
+
+def open_catalog_store(file_name, max_rows=100, max_delay=1.0):
+# Opens (or creates) a catalog store. See CatalogStore.
+#
+# Usage
+# store = open_catalog_store("Catalog.db")
+#
+# Inputs
+# file_name: a string containing the SQLite file name
+# max_rows, max_delay: see CatalogStore
+#
+# Outputs
+# store: the CatalogStore
+
+    return CatalogStore(file_name, max_rows, max_delay)
+
+def export_catalog_store(store, isbn_file_name=None,
+                         title_author_file_name=None, shelf_order=False):
+# Writes the books in a catalog store to CSV files laid out like
+# ISBNsLCC.csv and TitleAuthorLCC.csv, for importing into Readerware.
+# Each copy of a book is a row of its own, as when the CSV files are
+# written directly. Each file is written under a temporary name and then
+# renamed.
+#
+# Usage
+# export_catalog_store(store, "ISBNsLCC.csv", "TitleAuthorLCC.csv")
+#
+# Inputs
+# store: the CatalogStore
+# isbn_file_name: the ISBN CSV file to write, or None
+# title_author_file_name: the title/author CSV file to write, or None
+# shelf_order: if True, the books are written in shelf order rather than
+#              the order they were added
+#
+# Outputs
+# counts: a dictionary with the number of rows written to each file
+
+    counts = {}
+    for kind, file_name, header in (
+            ('isbn', isbn_file_name, ['ISBN', 'Call_Number']),
+            ('title_author', title_author_file_name,
+             ['Title', 'Author', 'Call_Number'])):
+        if(file_name is None):
+            continue
+
+        count = 0
+        temp_name = file_name + '.tmp'
+        with open(temp_name, 'wb') as csv_file:
+            csv_file.write(format_csv_row(header))
+            for row in store.books(kind, shelf_order):
+                copies = row[-1] or 1
+                csv_file.write(format_csv_row(row[:-1]) * copies)
+                count += copies
+
+        if(os.name == 'nt' and os.path.isfile(file_name)):
+            # Windows cannot rename over an existing file
+            os.remove(file_name)
+        os.rename(temp_name, file_name)
+        counts[file_name] = count
+    return counts
+
+class TitleAuthorIndex(object):
+# An inverted index of the books already classified by title and author,
+# used to answer a title/author search without the website when the
+# same book was found before under a slightly different spelling.
+#
+# Titles and authors are normalized as in normalize_title_author and
+# split into words, and each word is indexed by its three letter pieces,
+# so a typo only changes a few of the terms. Each term is weighted by how
+# rare it is among the indexed books, and a book's score is the weighted
+# share of terms it has in common with the search (1.0 for the same
+# words), worked out separately for the title and the author.
+#
+# Usage
+# index = TitleAuthorIndex()
+# index.load_title_author_csv(file_name)
+# index.add(title, author, lcc)
+# match = index.search(title, author) # (title, author, lcc, score) or None
+# match = index.lookup(title, author) # the same spelling only
+# index.add_alias(typed_title, typed_author, title, author)
+# title, author = index.stored_spelling(typed_title, typed_author, lcc)
+#
+# Inputs
+# threshold: the lowest score returned by search
+
+    # How much the title counts toward the score compared to the author
+    title_weight = 0.7
+
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+        self.books = [] # (title, author, lcc, title terms, author terms)
+        self.keys = {} # normalize_title_author key -> position in books
+        self.aliases = {} # key of another spelling -> position in books
+        self.postings = {} # term -> set of positions in books
+        self.lock = threading.Lock()
+
+    def load_title_author_csv(self, file_name):
+    # Adds every row of a title/author CSV file to the index. Missing
+    # files are ignored.
+
+        if(not os.path.isfile(file_name)):
+            return
+
+        with open(file_name, 'rb') as csv_file:
+            rows = csv.reader(csv_file)
+            next(rows, None) # Skip the header
+            for row in rows:
+                if(len(row) >= 3):
+                    self.add(row[0], row[1], row[2])
+
+    def load_catalog_store(self, store):
+    # Adds every book found by title and author in a CatalogStore
+
+        for title, author, lcc, copies in store.books('title_author'):
+            self.add(title, author, lcc)
+
+    def add(self, title, author, lcc):
+    # Adds a classified book to the index. A book that is already indexed
+    # has its LCC replaced.
+
+        key = normalize_title_author(title, author)
+        title_terms = title_author_terms(title, 't')
+        author_terms = title_author_terms(author, 'a')
+
+        with self.lock:
+            position = self.keys.get(key)
+            if(position is not None):
+                old = self.books[position]
+                self.books[position] = (title, author, lcc, old[3], old[4])
+                return
+
+            position = len(self.books)
+            self.keys[key] = position
+            self.books.append((title, author, lcc, title_terms,
+                               author_terms))
+            for term in title_terms | author_terms:
+                self.postings.setdefault(term, set()).add(position)
+
+    def __len__(self):
+        return len(self.books)
+
+    def add_alias(self, title, author, stored_title, stored_author):
+    # Lets lookup find an indexed book by another spelling of its title
+    # and author, such as the one typed before the book was found. Nothing
+    # is added if the book is not indexed, or the spelling is a book of
+    # its own.
+
+        key = normalize_title_author(title, author)
+        stored_key = normalize_title_author(stored_title, stored_author)
+        with self.lock:
+            position = self.keys.get(stored_key)
+            if(position is not None and key not in self.keys):
+                self.aliases[key] = position
+
+    def lookup(self, title, author):
+    # Finds the indexed book with the same title and author once both are
+    # normalized, or the book the spelling was made an alias of, without
+    # trying other spellings.
+    #
+    # Outputs
+    # match: (title, author, lcc, 1.0), or None
+
+        key = normalize_title_author(title, author)
+        with self.lock:
+            position = self.keys.get(key, self.aliases.get(key))
+            if(position is None):
+                return None
+            book = self.books[position]
+        return (book[0], book[1], book[2], 1.0)
+
+    def stored_spelling(self, title, author, lcc):
+    # Returns the title and author as they were saved for a book already
+    # classified as lcc. The book is looked up as in lookup, or else is
+    # the closest match with the same LCC. The title and author are
+    # returned unchanged if neither is found. Spellings read from the CSV
+    # file are returned as unicode, as typed ones are.
+
+        match = self.lookup(title, author)
+        if(match is None or match[2] != lcc):
+            match = self.search(title, author)
+        if(match is None or match[2] != lcc):
+            return title, author
+        return tuple(text.decode('utf-8', 'replace')
+                     if isinstance(text, str) else text
+                     for text in match[:2])
+
+    def search(self, title, author):
+    # Finds the indexed book that best matches the title and author.
+    #
+    # Outputs
+    # match: (title, author, lcc, score) for the best book scoring at
+    #        least the threshold, or None
+
+        title_terms = title_author_terms(title, 't')
+        author_terms = title_author_terms(author, 'a')
+        if(not title_terms):
+            return None
+
+        with self.lock:
+            num_books = len(self.books)
+            postings = self.postings
+
+            def weight(term):
+                # Terms found in fewer books say more about a match
+                return math.log(1.0 + float(num_books) /
+                                max(len(postings.get(term, ())), 1))
+
+            # Total the weight each book shares with the search, for the
+            # title and the author
+            shared = {}
+            for field, terms in enumerate((title_terms, author_terms)):
+                for term in terms:
+                    books = postings.get(term)
+                    if(not books):
+                        continue
+                    term_weight = weight(term)
+                    for position in books:
+                        totals = shared.get(position)
+                        if(totals is None):
+                            totals = shared[position] = [0.0, 0.0]
+                        totals[field] += term_weight
+
+            # Only the title counts if no author was given
+            if(author_terms):
+                title_weight = self.title_weight
+            else:
+                title_weight = 1.0
+            title_total = sum(weight(term) for term in title_terms)
+            author_total = sum(weight(term) for term in author_terms) or 1
+
+            best = None
+            for position, (title_shared, author_shared) in \
+                    shared.iteritems():
+                # The best score a book could reach if all of its terms
+                # were shared. Books that cannot reach the threshold are
+                # not scored in full.
+                bound = 2 * (title_weight * title_shared / title_total +
+                             (1 - title_weight) * author_shared /
+                             author_total)
+                if(bound < self.threshold):
+                    continue
+                book = self.books[position]
+                score = title_weight * dice_score(title_terms, book[3],
+                                                  weight)
+                if(author_terms):
+                    score += (1 - title_weight) * dice_score(
+                        author_terms, book[4], weight)
+                if(score >= self.threshold and
+                   (best is None or score > best[3])):
+                    best = (book[0], book[1], book[2], score)
+
+        return best
+
+def title_author_terms(text, field):
+# Splits a title or author into the terms used by TitleAuthorIndex: the
+# three letter pieces of each normalized word, marked with the field
+# they came from.
+#
+# Inputs
+# text: string holding the title or author
+# field: a short prefix naming the field
+#
+# Outputs
+# terms: a set of strings
+
+    terms = set()
+    for word in normalize_text(text).split():
+        word = ' ' + word + ' '
+        for start in xrange(len(word) - 2):
+            terms.add(field + word[start:start + 3])
+    return terms
+
+def dice_score(terms_a, terms_b, weight):
+# Returns the weighted share of terms two sets have in common, from 0.0
+# for none to 1.0 for the same terms.
+
+    total = sum(weight(term) for term in terms_a) + \
+            sum(weight(term) for term in terms_b)
+    if(total == 0):
+        return 0.0
+    return 2 * sum(weight(term) for term in terms_a & terms_b) / total
+
+title_author_index = None
+
+def open_title_author_index(file_name, threshold=0.8):
+# Builds the title/author index from a title/author CSV file. Once it is
+# open, title and author searches check it before the website, and books
+# written by write_title_author_csv are added to it.
+#
+# Usage
+# open_title_author_index("TitleAuthorLCC.csv")
+#
+# Inputs
+# file_name: a string containing the CSV file's name
+# threshold: the lowest score, from 0.0 to 1.0, accepted as a match
+#
+# Outputs
+# index: the TitleAuthorIndex now in use
+
+    global title_author_index
+    index = TitleAuthorIndex(threshold)
+    index.load_title_author_csv(file_name)
+    title_author_index = index
+    return index
+
+def search_title_author_index(args, accept, quiet=False, exact=False):
+# Checks the title/author index for a title and author search, so that
+# a book classified before can be answered without the website.
+#
+# Usage
+# result = search_title_author_index((title, author, link_limit), accept)
+#
+# Inputs
+# args: a tuple with the same arguments as search_classify
+# accept: function taking (title, author, lcc) and returning a boolean
+# quiet: if True, no message is printed
+# exact: if True, only a book with the same normalized title and author
+#        is offered, for searches where nobody checks a close match
+#
+# Outputs
+# result: the accepted BookRecord, or None
+
+    index = title_author_index
+    if(index is None or len(args) != 3):
+        return None
+
+    if(exact):
+        match = index.lookup(args[0], args[1])
+    else:
+        match = index.search(args[0], args[1])
+    if(match is None):
+        return None
+
+    title, author, lcc, score = match
+    metrics.count('local_index_hits_total', labels={'index': 'title_author'})
+    if(not quiet):
+        print "Found a close match among the books already classified."
+    if(accept(title, author, lcc)):
+        return BookRecord(title, author, lcc)
+    return None
+
+# Layout of the offline LCC index file built by build_lcc_dump_index. A
+# short header is followed by fixed width records sorted by ISBN-13, so a
+# book is found by binary search straight from the file.
+lcc_dump_magic = 'LCCIDX1\n'
+lcc_dump_header = struct.Struct('<8sQHH') # magic, count, lcc and title width
+lcc_dump_settings = {
+    'lcc_width': 40,
+    'title_width': 75,
+    'sort_chunk': 200000, # records sorted in memory at a time
+}
+
+class LCCDumpIndex(object):
+# A read-only view of an offline LCC index file. The file is memory
+# mapped rather than read, so opening it takes the same time at any size
+# and only the pages touched by a search are loaded from disk.
+#
+# Usage
+# index = LCCDumpIndex(file_name)
+# result = index.lookup(ISBN) # (title, lcc) or None
+#
+# Inputs
+# file_name: a string containing the index file's name
+
+    def __init__(self, file_name):
+        self.index_file = open(file_name, 'rb')
+        header = self.index_file.read(lcc_dump_header.size)
+        if(len(header) != lcc_dump_header.size or
+           header[:len(lcc_dump_magic)] != lcc_dump_magic):
+            self.index_file.close()
+            raise ValueError("%s is not an LCC index file" % file_name)
+
+        magic, self.count, self.lcc_width, self.title_width = \
+            lcc_dump_header.unpack(header)
+        self.record_width = 13 + self.lcc_width + self.title_width
+
+        # An empty file cannot be mapped
+        if(self.count > 0):
+            self.data = mmap.mmap(self.index_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            self.data = ''
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, ISBN):
+    # Returns (title, lcc) for the ISBN, or None if it is not in the file.
+    # The title may be blank or cut short.
+
+        if(not is_ISBN(ISBN)):
+            return None
+        key = canonical_ISBN(ISBN)
+
+        data = self.data
+        width = self.record_width
+        base = lcc_dump_header.size
+        low = 0
+        high = self.count
+        while(low < high):
+            middle = (low + high) // 2
+            start = base + middle * width
+            if(data[start:start + 13] < key):
+                low = middle + 1
+            else:
+                high = middle
+
+        start = base + low * width
+        if(low == self.count or data[start:start + 13] != key):
+            return None
+        lcc = data[start + 13:start + 13 + self.lcc_width].rstrip()
+        title = data[start + 13 + self.lcc_width:start + width].rstrip()
+        return title, lcc
+
+    def close(self):
+        if(self.count > 0):
+            self.data.close()
+        self.index_file.close()
+
+lcc_dump_index = None
+
+def open_lcc_dump_index(file_name):
+# Opens an offline LCC index file. Once it is open, ISBN searches check
+# it before the website. A missing file is ignored.
+#
+# Usage
+# open_lcc_dump_index("LCCDump.idx")
+#
+# Inputs
+# file_name: a string containing the index file's name
+#
+# Outputs
+# index: the LCCDumpIndex now in use, or None if the file does not exist
+
+    global lcc_dump_index
+    if(not os.path.isfile(file_name)):
+        return None
+    lcc_dump_index = LCCDumpIndex(file_name)
+    return lcc_dump_index
+
+def find_ISBNs(text):
+# Returns the valid ISBNs in a piece of text, such as "0306406152 (pbk.)"
+# or several ISBNs separated by semicolons, in their ISBN-13 form.
+
+    ISBNs = []
+    for candidate in re.findall(r'[\dXx][\dXx -]{8,15}[\dXx]', text):
+        candidate = candidate.replace('-', '').replace(' ', '')
+        if(is_ISBN(candidate)):
+            ISBNs.append(canonical_ISBN(candidate))
+    return ISBNs
+
+def clean_dump_text(text):
+# Reduces a call number or title from a dump to plain ascii on one line.
+# MARC subfield markers such as $a or |b become spaces, and the
+# punctuation MARC leaves at the end of a title is removed.
+
+    if(isinstance(text, str)):
+        text = text.decode('utf-8', 'ignore')
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore')
+    text = re.sub(r'[$|][a-z]', ' ', text)
+    return ' '.join(text.split()).rstrip(' /:;,.=')
+
+def read_marc_records(marc_file):
+# Reads a file of MARC 21 records (ISO 2709) and yields the ISBNs, LC
+# call number and title of each one. The file is read in blocks, so it
+# may be any size.
+#
+# Usage
+# for ISBNs, lcc, title in read_marc_records(marc_file):
+#
+# Inputs
+# marc_file: a file object opened in binary mode
+#
+# Outputs
+# ISBNs: a list of the record's valid ISBNs (from field 020)
+# lcc: the call number from field 050, or a blank string
+# title: the title from field 245, or a blank string
+
+    remainder = ''
+    while(1):
+        block = marc_file.read(1 << 20)
+        records = (remainder + block).split('\x1d')
+        remainder = records.pop()
+        for record in records:
+            fields = marc_fields(record)
+            if(fields is not None):
+                yield fields
+        if(not block):
+            break
+
+def marc_fields(record):
+# Picks the ISBNs, call number and title out of one MARC record. Returns
+# None if the record cannot be read.
+
+    try:
+        base = int(record[12:17])
+    except ValueError:
+        return None
+
+    ISBNs = []
+    lcc = ''
+    title = ''
+    directory = record[24:base - 1]
+    for entry in xrange(0, len(directory) - 11, 12):
+        tag = directory[entry:entry + 3]
+        if(tag not in ('020', '050', '245')):
+            continue
+        try:
+            length = int(directory[entry + 3:entry + 7])
+            start = base + int(directory[entry + 7:entry + 12])
+        except ValueError:
+            return None
+
+        # Data fields are two indicators, then subfields that each start
+        # with \x1f and a one letter code
+        subfields = record[start:start + length].rstrip('\x1e')
+        subfields = [(part[:1], part[1:])
+                     for part in subfields.split('\x1f')[1:]]
+        if(tag == '020'):
+            for code, value in subfields:
+                if(code == 'a'):
+                    ISBNs += find_ISBNs(value)
+        elif(tag == '050' and not lcc):
+            lcc = ' '.join(value for code, value in subfields
+                           if code in 'ab')
+        elif(tag == '245'):
+            title = ' '.join(value for code, value in subfields
+                             if code in 'ab')
+
+    return ISBNs, clean_dump_text(lcc), clean_dump_text(title)
+
+def read_dump_csv_records(csv_file):
+# Reads a CSV export with a header row and yields the ISBNs, LC call
+# number and title of each row. The columns are found by their headers:
+# one naming ISBN or 020, one naming LCC, call number or 050, and an
+# optional title or 245 column.
+#
+# Usage
+# for ISBNs, lcc, title in read_dump_csv_records(csv_file):
+#
+# Inputs
+# csv_file: a file object opened in binary mode
+#
+# Outputs
+# the same as read_marc_records
+
+    rows = csv.reader(csv_file)
+    header = [name.strip().lower() for name in next(rows, [])]
+
+    def find_column(names):
+        for column, name in enumerate(header):
+            if(any(part in name for part in names)):
+                return column
+        return None
+
+    isbn_column = find_column(('isbn', '020'))
+    lcc_column = find_column(('lcc', 'call', '050', 'classification'))
+    title_column = find_column(('title', '245'))
+    if(isbn_column is None or lcc_column is None):
+        raise ValueError("The CSV file needs an ISBN and an LCC column")
+
+    for row in rows:
+        if(len(row) <= max(isbn_column, lcc_column)):
+            continue
+        title = ''
+        if(title_column is not None and title_column < len(row)):
+            title = row[title_column]
+        yield (find_ISBNs(row[isbn_column]), clean_dump_text(row[lcc_column]),
+               clean_dump_text(title))
+
+def external_sort(records, chunk_size, fixed_width=True):
+# Sorts byte strings that may not fit in memory. They are sorted in
+# chunks, each chunk is written to a temporary file, and the files are
+# then merged.
+#
+# Usage
+# for record in external_sort(records, chunk_size):
+# for record in external_sort(records, chunk_size, fixed_width=False):
+#
+# Inputs
+# records: an iterable of byte strings
+# chunk_size: the number of records sorted in memory at a time
+# fixed_width: True if the records are all the same width. Otherwise
+#              each record is written with its length in front.
+#
+# Outputs
+# record: each record in sorted order
+
+    runs = []
+    width = None
+    try:
+        chunk = []
+        for record in records:
+            width = len(record)
+            chunk.append(record)
+            if(len(chunk) >= chunk_size):
+                runs.append(write_sorted_run(chunk, fixed_width))
+                chunk = []
+        if(len(runs) == 0):
+            # Small enough to sort in memory
+            chunk.sort()
+            for record in chunk:
+                yield record
+            return
+        if(chunk):
+            runs.append(write_sorted_run(chunk, fixed_width))
+
+        def read_run(run):
+            run.seek(0)
+            if(fixed_width):
+                for record in iter(functools.partial(run.read, width), ''):
+                    yield record
+                return
+            size = run_length.size
+            for length in iter(functools.partial(run.read, size), ''):
+                yield run.read(run_length.unpack(length)[0])
+
+        for record in heapq.merge(*[read_run(run) for run in runs]):
+            yield record
+    finally:
+        for run in runs:
+            run.close()
+
+# The length written before each record in the runs of variable width
+# records
+run_length = struct.Struct('<I')
+
+def write_sorted_run(chunk, fixed_width=True):
+# Sorts the records and writes them to a temporary file, which is
+# deleted when closed.
+
+    chunk.sort()
+    run = tempfile.TemporaryFile()
+    if(fixed_width):
+        run.write(''.join(chunk))
+    else:
+        pack = run_length.pack
+        run.write(''.join([pack(len(record)) + record for record in chunk]))
+    return run
+
+def build_lcc_dump_index(dump_records, file_name, lcc_width=None,
+                         title_width=None):
+# Builds an offline LCC index file from the records of bulk dumps, such
+# as those read by read_marc_records or read_dump_csv_records. When an
+# ISBN appears more than once, only one of its records is kept: the one
+# whose LCC (and then title) sorts first, so the result does not depend on
+# the order of the dumps.
+# The file is written under a temporary name and renamed when done.
+#
+# Usage
+# count = build_lcc_dump_index(read_marc_records(marc_file), "LCCDump.idx")
+#
+# Inputs
+# dump_records: an iterable of (ISBNs, lcc, title)
+# file_name: a string containing the index file's name
+# lcc_width, title_width: the number of characters kept of each LCC and
+#                         title (see lcc_dump_settings)
+#
+# Outputs
+# count: the number of ISBNs in the index
+
+    if(lcc_width is None):
+        lcc_width = lcc_dump_settings['lcc_width']
+    if(title_width is None):
+        title_width = lcc_dump_settings['title_width']
+
+    def index_records():
+        for ISBNs, lcc, title in dump_records:
+            if(len(lcc) <= 3): # The same test as validate_info
+                continue
+            value = lcc[:lcc_width].ljust(lcc_width) + \
+                    title[:title_width].ljust(title_width)
+            for ISBN in ISBNs:
+                yield ISBN + value
+
+    count = 0
+    temp_name = file_name + '.tmp'
+    with open(temp_name, 'wb') as index_file:
+        index_file.write(lcc_dump_header.pack(lcc_dump_magic, 0,
+                                              lcc_width, title_width))
+        last_ISBN = None
+        for record in external_sort(index_records(),
+                                    lcc_dump_settings['sort_chunk']):
+            if(record[:13] == last_ISBN):
+                continue
+            last_ISBN = record[:13]
+            index_file.write(record)
+            count += 1
+
+        # Fill in the number of records now that it is known
+        index_file.seek(0)
+        index_file.write(lcc_dump_header.pack(lcc_dump_magic, count,
+                                              lcc_width, title_width))
+        index_file.flush()
+        os.fsync(index_file.fileno())
+
+    if(os.name == 'nt' and os.path.isfile(file_name)):
+        # Windows cannot rename over an existing file
+        os.remove(file_name)
+    os.rename(temp_name, file_name)
+    return count
+
+def search_lcc_dump_index(args, accept, quiet=False):
+# Checks the offline LCC index for an ISBN search, so the book can be
+# answered without the website.
+#
+# Usage
+# result = search_lcc_dump_index((ISBN, link_limit), accept)
+#
+# Inputs
+# args: a tuple with the same arguments as search_classify
+# accept: function taking (title, author, lcc) and returning a boolean
+# quiet: if True, no message is printed
+#
+# Outputs
+# result: the accepted BookRecord, or None
+
+    index = lcc_dump_index
+    if(index is None or len(args) != 2):
+        return None
+
+    match = index.lookup(args[0])
+    if(match is None):
+        return None
+
+    # The dumps do not always hold a title, so it may be blank
+    title, lcc = match
+    metrics.count('local_index_hits_total', labels={'index': 'lcc_dump'})
+    if(not quiet):
+        print "Found in the offline LCC index."
+    if(accept(title, '', lcc)):
+        return BookRecord(title, '', lcc, offline=True)
+    return None
+
+def has_local_match(args):
+# Returns True if search_local_indexes has a book to offer for a search,
+# without offering it
+#
+# Usage
+# if(has_local_match((ISBN, link_limit))):
+
+    if(len(args) == 2):
+        return (lcc_dump_index is not None and
+                lcc_dump_index.lookup(args[0]) is not None)
+    return (title_author_index is not None and
+            title_author_index.search(args[0], args[1]) is not None)
+
+def search_local_indexes(args, accept, quiet=False, exact=False):
+# Checks the offline LCC index (for an ISBN) or the title/author index
+# (for a title and author) before the website is searched.
+#
+# Usage
+# result = search_local_indexes(args, accept)
+#
+# Inputs and outputs are the same as search_lcc_dump_index, and exact is
+# passed on to search_title_author_index
+
+    if(len(args) == 2):
+        return search_lcc_dump_index(args, accept, quiet)
+    return search_title_author_index(args, accept, quiet, exact)
+
+class JobJournal(object):
+# A write-ahead journal of the items in a long lookup job, so that a run
+# that dies part way through can pick up where it stopped. Each change
+# of an item's state is appended to the file as a line holding the
+# state, the item's key and a value (such as the LCC found), and is
+# flushed before the work it describes goes ahead. When the file is
+# opened again, the last state of each item is read back; a line left
+# half written by a crash is ignored.
+#
+# Once the file holds many more lines than items, it is compacted: the
+# latest state of every item is written to a new file, which then
+# replaces the old one.
+#
+# Usage
+# journal = JobJournal(file_name)
+# journal.record(key, 'pending')
+# journal.record(key, 'resolved', lcc)
+# state, value = journal.state(key) # None if never recorded
+#
+# Inputs
+# file_name: a string containing the journal's file name
+# compact_every: the number of lines appended between compactions
+# fsync: if True, each line waits for the data to reach the disk
+
+    # States after which an item does not need to be looked up again
+    final_states = ('resolved', 'missing')
+
+    def __init__(self, file_name, compact_every=10000, fsync=False):
+        self.file_name = file_name
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.states = {}
+        self.lock = threading.Lock()
+
+        # Read back the last state of every item
+        good_bytes = 0
+        if(os.path.isfile(file_name)):
+            with open(file_name, 'rb') as journal_file:
+                for line in journal_file:
+                    if(not line.endswith('\n')):
+                        break # Cut off by a crash
+                    good_bytes += len(line)
+                    fields = line[:-1].split('\t', 2)
+                    if(len(fields) == 3):
+                        self.states[fields[1]] = (fields[0], fields[2])
+
+        self.journal_file = open(file_name, 'ab')
+        # Drop a half written line so new lines do not run into it
+        self.journal_file.truncate(good_bytes)
+        self.lines_since_compact = 0
+
+    def state(self, key):
+    # Returns the (state, value) last recorded for the key, or None
+
+        return self.states.get(key)
+
+    def is_done(self, key):
+    # Returns True if the key has reached one of the final states
+
+        state = self.states.get(key)
+        return state is not None and state[0] in self.final_states
+
+    def record(self, key, state, value=''):
+    # Records a new state for the key, before the caller acts on it
+
+        if(isinstance(value, unicode)):
+            value = value.encode('utf-8')
+        value = value.replace('\t', ' ').replace('\n', ' ')
+
+        with self.lock:
+            self.journal_file.write('%s\t%s\t%s\n' % (state, key, value))
+            self.journal_file.flush()
+            if(self.fsync):
+                os.fsync(self.journal_file.fileno())
+            self.states[key] = (state, value)
+
+            self.lines_since_compact += 1
+            if(self.lines_since_compact >= self.compact_every):
+                self._compact()
+
+    def compact(self):
+    # Rewrites the journal with only the latest state of each item
+
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+    # The caller must hold self.lock
+
+        temp_name = self.file_name + '.tmp'
+        with open(temp_name, 'wb') as temp_file:
+            for key, (state, value) in self.states.iteritems():
+                temp_file.write('%s\t%s\t%s\n' % (state, key, value))
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+
+        self.journal_file.close()
+        if(os.name == 'nt'):
+            # Windows cannot rename over an existing file
+            os.remove(self.file_name)
+        os.rename(temp_name, self.file_name)
+        self.journal_file = open(self.file_name, 'ab')
+        self.lines_since_compact = 0
+
+    def counts(self):
+    # Returns a dictionary with the number of items in each state
+
+        counts = {}
+        with self.lock:
+            for state, _ in self.states.itervalues():
+                counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    def close(self):
+        with self.lock:
+            self.journal_file.close()
+
+def open_job_journal(file_name, compact_every=10000, fsync=False):
+# Opens (or creates) a job journal, reading back the state of any
+# earlier run.
+#
+# Usage
+# journal = open_job_journal(file_name)
+#
+# Inputs
+# file_name: a string containing the journal's file name
+# compact_every: the number of lines appended between compactions
+# fsync: if True, each line waits for the data to reach the disk
+#
+# Outputs
+# journal: the JobJournal
+
+    return JobJournal(file_name, compact_every, fsync)
+
 def get_num_copies():
 # Prompts the user for a how many copies of a book is present. It then
 # returns that number. It will also error check to ensure the input is valid.
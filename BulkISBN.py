@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Checks and converts large numbers of ISBNs at once using NumPy, so that
+# intake files can be cleaned before any of them are searched for. Every
+# ISBN-10 and ISBN-13 is checked against its check digit and converted to
+# its ISBN-13 form, which is used as the key for the book.
+
+# Import Libraries
+import itertools
+import numpy as np
+
+# Weights applied to each digit when computing the check digits
+isbn10_weights = np.arange(10, 0, -1)
+isbn13_weights = np.array([1, 3] * 6 + [1])
+
+# Value of each place in a 13 digit number
+isbn13_places = 10 ** np.arange(12, -1, -1, dtype=np.int64)
+
+def canonicalize_isbns(isbns):
+# Checks an array of ISBN strings and converts them to ISBN-13 keys.
+# Spaces and hyphens are ignored. An ISBN is rejected if it does not
+# have 10 or 13 characters, contains anything but digits (or an X as the
+# last character of an ISBN-10), or has the wrong check digit.
+#
+# Usage
+# keys, rejected = canonicalize_isbns(isbns)
+#
+# Inputs
+# isbns: a list or array of ASCII strings
+#
+# Outputs
+# keys: an int64 array of the ISBN-13s as numbers, 0 where rejected
+# rejected: a boolean array, true for each ISBN that was rejected
+
+    isbns = np.asarray(isbns)
+    if(isbns.dtype.kind == 'U'):
+        isbns = isbns.astype('S')
+    if(len(isbns) == 0):
+        return np.zeros(0, np.int64), np.zeros(0, bool)
+
+    # Remove the separators and put the characters in an n x 13 grid
+    isbns = np.char.upper(np.char.replace(np.char.replace(isbns, ' ', ''),
+                                          '-', ''))
+    lengths = np.char.str_len(isbns)
+    grid = np.frombuffer(isbns.astype('S13').tobytes(), np.uint8)
+    digits = grid.reshape(len(isbns), 13).astype(np.int64) - ord('0')
+    is_digit = (digits >= 0) & (digits <= 9)
+
+    # ISBN-10: nine digits and a digit or X, weights 10 down to 1 whose
+    # total divides by 11
+    is10 = lengths == 10
+    last10 = digits[:, 9].copy()
+    last10_x = grid.reshape(len(isbns), 13)[:, 9] == ord('X')
+    last10[last10_x] = 10
+    valid10 = (is10 & is_digit[:, :9].all(axis=1) &
+               (is_digit[:, 9] | last10_x))
+    total10 = np.dot(np.where(is_digit[:, :9], digits[:, :9], 0),
+                     isbn10_weights[:9]) + np.where(valid10, last10, 0)
+    valid10 &= total10 % 11 == 0
+
+    # ISBN-13: thirteen digits, alternating weights of 1 and 3 whose total
+    # divides by 10
+    is13 = lengths == 13
+    safe = np.where(is_digit, digits, 0)
+    valid13 = is13 & is_digit.all(axis=1)
+    valid13 &= np.dot(safe, isbn13_weights) % 10 == 0
+
+    # ISBN-10s become 978 + the first nine digits + a new check digit
+    converted = np.zeros_like(safe)
+    converted[:, :3] = [9, 7, 8]
+    converted[:, 3:12] = safe[:, :9]
+    converted[:, 12] = (10 - np.dot(converted[:, :12],
+                                    isbn13_weights[:12]) % 10) % 10
+
+    keys = np.where(valid10, np.dot(converted, isbn13_places),
+                    np.dot(safe, isbn13_places))
+    rejected = ~(valid10 | valid13)
+    keys[rejected] = 0
+
+    return keys, rejected
+
+def format_isbn_keys(keys):
+# Converts ISBN-13 keys from canonicalize_isbns back into 13 character
+# strings.
+#
+# Usage
+# isbns = format_isbn_keys(keys)
+#
+# Inputs
+# keys: an int64 array of ISBN-13s
+#
+# Outputs
+# isbns: an array of strings
+
+    return np.char.zfill(keys.astype('S13'), 13)
+
+def clean_isbn_file(in_file, out_file, reject_file=None, chunk_size=100000):
+# Reads ISBNs from a file, one per line, and writes the ISBN-13 form of
+# each valid one to another file. The input is read chunk_size lines at
+# a time, so files of any size can be cleaned in constant memory.
+#
+# Usage
+# num_valid, num_rejected = clean_isbn_file(in_file, out_file)
+#
+# Inputs
+# in_file: a file object to read the ISBNs from
+# out_file: a file object to write the ISBN-13s to
+# reject_file: a file object to write the rejected lines to, if given
+# chunk_size: the number of lines to check at once
+#
+# Outputs
+# num_valid: the number of ISBNs written to out_file
+# num_rejected: the number of non-blank lines that were rejected
+
+    num_valid = 0
+    num_rejected = 0
+    while(1):
+        lines = list(itertools.islice(in_file, chunk_size))
+        if(not lines):
+            break
+
+        lines = np.char.strip(np.array(lines, 'S'))
+        lines = lines[np.char.str_len(lines) > 0]
+        keys, rejected = canonicalize_isbns(lines)
+
+        valid = format_isbn_keys(keys[~rejected])
+        if(len(valid)):
+            out_file.write('\n'.join(valid) + '\n')
+        if(reject_file is not None and rejected.any()):
+            reject_file.write('\n'.join(lines[rejected]) + '\n')
+
+        num_valid += len(valid)
+        num_rejected += int(rejected.sum())
+
+    return num_valid, num_rejected
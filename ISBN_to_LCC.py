@@ -24,19 +24,101 @@ THE SOFTWARE.
 """
 
 from BookToLCC import *
+import sys
 
 # Number of links to search through before giving up
 link_limit = 5
 
-while(1):
+# With --metrics, timings and counts for each stage of the lookups are
+# written to LookupMetrics.json and LookupMetrics.prom on exit
+if('--metrics' in sys.argv[1:]):
+    export_metrics("LookupMetrics.json", "LookupMetrics.prom")
+
+# With --xml, books are searched through the classify XML service rather
+# than its web pages
+if('--xml' in sys.argv[1:]):
+    configure_classify(backend='xml')
+
+# With --service http://host:8090, books are looked up through an
+# lcc_server.py service shared with the other stations
+service_url = service_url_argument(sys.argv)
+if(service_url is not None):
+    configure_classify(backend='service', base_url=service_url)
+
+# With --profile, the session's call stacks are sampled and its memory use
+# tracked, and on exit they are written to LookupProfile.folded (for a
+# flame graph) and LookupAllocations.txt
+if('--profile' in sys.argv[1:]):
+    profile_session()
+
+# Keep classify.oclc.org responses so repeated lookups are answered locally
+open_response_cache("ClassifyCache.db")
+# Searches that found nothing are not repeated for a few days
+open_negative_cache("ClassifyMisses.db")
+
+# With --catalog, books are kept in Catalog.db instead of the CSV file
+# (export_catalog.py writes the CSV files from it)
+if('--catalog' in sys.argv[1:]):
+    catalog = open_catalog_store("Catalog.db")
+    known = catalog
+else:
+    catalog = None
+    # Books already in the CSV file are answered without searching again
+    known = open_classified_index("ISBNsLCC.csv")
+# ISBNs in the offline LCC index, if one was built with import_LCC_dump.py,
+# are answered without searching the website
+open_lcc_dump_index("LCCDump.idx")
+
+if(catalog is not None):
+    csv_file = catalog
+else:
+    while(1):
+        try:
+            csv_file = BufferedCSVWriter(
+                           open_title_author_csv("ISBNsLCC.csv"))
+            break
+        except IOError:
+            print 'ERROR: Unable to open CSV file. '\
+            'Check to see if it is open in another program or if you '\
+            'have permissions to modify it. \nPress enter to continue.'
+            raw_input()
+    
+# With --pipeline, each ISBN is looked up in the background while the
+# previous book is being checked
+pipeline = '--pipeline' in sys.argv[1:]
+pending = [] # (ISBN, lookup) pairs waiting to be checked, oldest first
+
+def save_isbn(ISBN, record):
+    # Check if the information was actually written
+    title, author, lcc = record
+    if(not validate_record(record)):
+        print("    ERROR: ISBN did not return any results.")
+        print("           Try again, or set aside for later processing.")
+        return
+        
+    # Save the information to the CSV file
+    write_isbn_csv(ISBN, lcc, csv_file)
+    known.add_isbn(ISBN, lcc)
+
+def check_oldest():
+    ISBN, lookup = pending.pop(0)
+    print "\nResults for ISBN " + ISBN + ":"
+    
+    # The same book may have been scanned twice in a row, and saved since
+    # this one was queued
+    lcc = known.lookup_isbn(ISBN)
+    if(lcc is not None):
+        print "    Already classified. LC Classification: " + lcc
+        return
+    
     try:
-        csv_file = open_title_author_csv("ISBNsLCC.csv")
-        break
-    except IOError:
-        print 'ERROR: Unable to open CSV file. '\
-        'Check to see if it is open in another program or if you '\
-        'have permissions to modify it. \nPress enter to continue.'
-        raw_input()
+        record = lookup.validate()
+    except requests.RequestException:
+        print("    ERROR: Unable to access website. "
+              "Check your internet connection.")
+        print("           Try again, or set aside for later processing.")
+        return
+    save_isbn(ISBN, record)
     
 # Main Loop
 while(1):
@@ -54,16 +136,24 @@ while(1):
     if(not validate_ISBN(ISBN)):
         continue
         
-    # Try to get the book's information
-    title, author, lcc = search_classify(ISBN, link_limit)
-    
-    # Check if the information was actually written
-    if(not validate_info(title, author, lcc)):
-        print("    ERROR: ISBN did not return any results.")
-        print("           Try again, or set aside for later processing.")
+    # Books that were already saved don't need to be searched again
+    lcc = known.lookup_isbn(ISBN)
+    if(lcc is not None):
+        print "    Already classified. LC Classification: " + lcc
         continue
         
-    # Save the information to the CSV file
-    write_isbn_csv(ISBN, lcc, csv_file)
+    # Start the lookup, and check the previous book while it runs
+    if(pipeline):
+        pending.append((ISBN, prefetch_classify(ISBN, link_limit)))
+        if(len(pending) > 1):
+            check_oldest()
+        continue
+        
+    # Try to get the book's information
+    save_isbn(ISBN, search_classify_concurrent(ISBN, link_limit))
+    
+# Check the books still waiting
+while(pending):
+    check_oldest()
     
 csv_file.close()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Resolves a list of ISBNs without any prompts. The ISBNs are read from a
+# file (or stdin), one per line, and looked up by a pool of worker threads.
+# Every book that is found is added to the ISBN CSV file, and ISBNs that
+# are invalid or return no results are reported so they can be set aside.
+#
+# Usage
+# python batch_ISBN_to_LCC.py isbns.txt
+# python batch_ISBN_to_LCC.py --workers 8 < isbns.txt
+# python batch_ISBN_to_LCC.py --refresh-misses
+#
+# The progress of each ISBN is kept in a journal next to the output file.
+# If a run is stopped or crashes, running it again on the same input skips
+# every ISBN that was already resolved, and retries only the rest.
+
+from BookToLCC import *
+import argparse
+import cStringIO
+import Queue
+import sys
+
+parser = argparse.ArgumentParser(description='Look up the LCC for a list '
+                                 'of ISBNs, one per line.')
+parser.add_argument('input', nargs='?', default='-',
+                    help='file of ISBNs to read, or - for stdin (default)')
+parser.add_argument('--workers', type=int, default=4,
+                    help='number of lookups to run at once (default 4)')
+parser.add_argument('--output', default='ISBNsLCC.csv',
+                    help='CSV file to add the results to')
+parser.add_argument('--rate', type=float,
+                    default=scheduler_settings['rate'],
+                    help='average requests per second sent to the website')
+parser.add_argument('--link-limit', type=int, default=5,
+                    help='number of links to search through before giving up')
+parser.add_argument('--dump-index', default='LCCDump.idx',
+                    help='offline LCC index built by import_LCC_dump.py, '
+                    'checked before the website (default LCCDump.idx)')
+parser.add_argument('--backend', choices=sorted(classify_backends),
+                    default=classify_settings['backend'],
+                    help='search the classify web pages (html, the '
+                    'default), its XML service (xml), or an lcc_server.py '
+                    'service (service)')
+parser.add_argument('--base-url',
+                    help='send searches to this address instead of '
+                    'classify.oclc.org, such as a classify_standin_server.py')
+parser.add_argument('--parse-processes', type=int, default=0,
+                    help='number of processes to parse pages in, so that '
+                    'parsing uses every core (default 0: parse in the '
+                    'workers)')
+parser.add_argument('--metrics', action='store_true',
+                    help='write timings and counts for each stage to '
+                    'LookupMetrics.json and LookupMetrics.prom every 15 '
+                    'seconds')
+parser.add_argument('--refresh-misses', action='store_true',
+                    help='search again for every ISBN that recently found '
+                    'nothing, instead of reading ISBNs from the input')
+parser.add_argument('--catalog',
+                    help='SQLite catalog (such as Catalog.db) to add the '
+                    'results to instead of the CSV file')
+parser.add_argument('--journal',
+                    help='file that records the progress of the job '
+                    '(default: the output file name + .journal)')
+args = parser.parse_args()
+if(args.workers < 1):
+    parser.error('--workers must be at least 1')
+if(args.rate <= 0):
+    parser.error('--rate must be more than 0')
+
+# Start the parsing processes before any threads, so each starts clean
+if(args.parse_processes > 0):
+    open_parse_pool(args.parse_processes)
+
+if(args.metrics):
+    export_metrics("LookupMetrics.json", "LookupMetrics.prom", interval=15)
+
+# Keep enough connections open for every worker, and pace the requests
+configure_session(pool_size=max(args.workers, http_settings['pool_size']))
+configure_scheduler(rate=args.rate)
+configure_classify(backend=args.backend, base_url=args.base_url)
+
+# Keep classify.oclc.org responses so repeated lookups are answered locally
+open_response_cache("ClassifyCache.db")
+# ISBNs that recently found nothing are set aside without searching,
+# unless they are being refreshed
+misses = open_negative_cache("ClassifyMisses.db",
+                             refresh=args.refresh_misses)
+# ISBNs in the offline LCC index are answered without the website
+open_lcc_dump_index(args.dump_index)
+
+if(args.refresh_misses):
+    input_file = cStringIO.StringIO(''.join(key[len('isbn:'):] + '\n'
+                                            for key in misses.keys('isbn:')))
+elif(args.input == '-'):
+    input_file = sys.stdin
+else:
+    input_file = open(args.input, 'r')
+# ISBNs already in the output file are skipped
+if(args.catalog):
+    known = isbn_csv = open_catalog_store(args.catalog)
+else:
+    known = open_classified_index(args.output)
+    isbn_csv = BufferedCSVWriter(open_isbn_csv(args.output))
+# Picks up the results of an earlier run of the same job
+journal = open_job_journal(args.journal or args.output + '.journal')
+
+# Both queues are bounded, so only a few lines of the input are ever held
+# in memory no matter how long it is
+isbn_queue = Queue.Queue(args.workers * 2)
+result_queue = Queue.Queue(args.workers * 2)
+
+def read_isbns():
+# Feeds the cleaned ISBNs from the input file to the workers, then tells
+# each worker to stop. Invalid and already classified ISBNs go straight
+# to the result queue, as do ISBNs that an earlier run already resolved.
+
+    try:
+        for line_num, line in enumerate(iter(input_file.readline, ''), 1):
+            ISBN = ''.join(line.split()) #Remove all whitespace
+            ISBN = ISBN.replace("-","") #Remove all hyphens
+            if(ISBN == ''):
+                continue
+            if(not is_ISBN(ISBN)):
+                result_queue.put((line_num, ISBN, 'invalid', ''))
+                continue
+            if(known.lookup_isbn(ISBN) is not None):
+                result_queue.put((line_num, ISBN, 'known', ''))
+                continue
+            key = canonical_ISBN(ISBN)
+            state = journal.state(key)
+            if(state is not None and state[0] == 'resolved'):
+                # Found before, but the CSV row may not have been written
+                result_queue.put((line_num, ISBN, 'found', state[1]))
+                continue
+            if(state is not None and state[0] == 'missing' and
+               not args.refresh_misses):
+                result_queue.put((line_num, ISBN, 'missing', ''))
+                continue
+            journal.record(key, 'pending')
+            isbn_queue.put((line_num, ISBN))
+    finally:
+        for _ in xrange(args.workers):
+            isbn_queue.put(None)
+
+def lookup_isbns():
+# Resolves ISBNs from the queue until told to stop
+
+    try:
+        while(1):
+            item = isbn_queue.get()
+            if(item is None):
+                break
+            line_num, ISBN = item
+            key = canonical_ISBN(ISBN)
+            try:
+                record = search_classify_auto(ISBN, args.link_limit)
+            except requests.RequestException:
+                # Left for the next run to retry
+                journal.record(key, 'failed')
+                result_queue.put((line_num, ISBN, 'failed', ''))
+                continue
+            lcc = record.lcc
+            if(validate_record(record)):
+                journal.record(key, 'resolved', lcc)
+                result_queue.put((line_num, ISBN, 'found', lcc))
+            else:
+                journal.record(key, 'missing')
+                result_queue.put((line_num, ISBN, 'missing', ''))
+    finally:
+        result_queue.put(None)
+
+threads = [threading.Thread(target=read_isbns)]
+threads += [threading.Thread(target=lookup_isbns)
+            for _ in xrange(args.workers)]
+for thread in threads:
+    thread.daemon = True
+    thread.start()
+
+# Write the results as they arrive. Only this thread touches the CSV file.
+found = 0
+missing = 0
+skipped = 0
+failed = 0
+workers_left = args.workers
+while(workers_left > 0):
+    try:
+        # A timeout keeps Ctrl-C working while waiting on the queue
+        item = result_queue.get(True, 1)
+    except Queue.Empty:
+        continue
+
+    if(item is None):
+        workers_left -= 1
+        continue
+
+    line_num, ISBN, status, lcc = item
+    if(status == 'invalid'):
+        sys.stderr.write('Line %d: %s is not a valid ISBN\n'
+                         % (line_num, ISBN))
+        missing += 1
+    elif(status == 'missing'):
+        sys.stderr.write('Line %d: %s did not return any results\n'
+                         % (line_num, ISBN))
+        missing += 1
+    elif(status == 'failed'):
+        sys.stderr.write('Line %d: %s could not be reached, run again to '
+                         'retry it\n' % (line_num, ISBN))
+        failed += 1
+    elif(status == 'known' or known.lookup_isbn(ISBN) is not None):
+        # Repeats of an ISBN still being looked up are caught here
+        skipped += 1
+    else:
+        write_isbn_csv(ISBN, lcc, isbn_csv)
+        known.add_isbn(ISBN, lcc)
+        found += 1
+
+    processed = found + missing + skipped + failed
+    if(processed % 100 == 0):
+        print "%d ISBNs processed" % processed
+
+print "Done. %d ISBNs found, %d already classified, %d set aside." \
+      % (found, skipped, missing)
+if(failed):
+    print "%d ISBNs could not be reached and will be retried next run." \
+          % failed
+isbn_csv.close()
+journal.close()
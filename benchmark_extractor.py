@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Compares the time taken to read a classify.oclc.org page with the single
+# pass extract_classify_page against the BeautifulSoup pair it replaced,
+# get_classify_info and get_classify_search_links, which are kept in
+# tests/bs4_extractors.py. Saved pages can be given on the command line;
+# otherwise a page laid out like a classify summary page is generated.
+#
+# Usage
+# python benchmark_extractor.py
+# python benchmark_extractor.py saved_page.html [saved_page2.html ...]
+
+from BookToLCC import *
+import os
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'tests'))
+from bs4_extractors import get_classify_info, get_classify_search_links
+
+class SavedPage(object):
+# Holds the text of a page in the same attribute as requests' responses
+
+    def __init__(self, text):
+        self.text = text
+
+def sample_page(num_links):
+# Builds a page with the same structure as a classify summary page: some
+# boilerplate, the summary fields, the class scheme table, and a list of
+# links to other editions.
+
+    rows = ''.join('<tr><td><a href="%s%d">Edition %d</a></td>'
+                   '<td>Publisher %d</td></tr>\n'
+                   % (get_url_segment('search_url'), i, i, i)
+                   for i in xrange(num_links))
+    nav = ''.join('<li><a href="/classify2/Page%d">Menu %d</a></li>\n'
+                  % (i, i) for i in xrange(40))
+    return (u'<html><head><title>Classify</title>\n'
+            u'<script type="text/javascript">\nvar x = 1;\n</script>\n'
+            u'</head><body>\n<ul>\n' + nav + u'</ul>\n'
+            u'<div>Summary</div>\n'
+            u'<dl><dt>Title:</dt>\n<dd>Programming Python</dd>\n'
+            u'<dt>Author:</dt>\n<dd>Lutz, Mark</dd></dl>\n'
+            u'<table><tr><td>DDC:</td>\n<td>1</td>\n<td>2</td>\n'
+            u'<td>3</td>\n<td>005.133</td>\n</tr>\n'
+            u'<tr><td>LCC:</td>\n<td>1</td>\n<td>2</td>\n<td>3</td>\n'
+            u'<td>QA76.73.P98 L88 2013</td>\n</tr></table>\n'
+            u'<table>\n' + rows + u'</table>\n'
+            u'<p>&copy; OCLC &amp; partners</p>\n</body></html>\n')
+
+def old_pair(page):
+    get_classify_info(page)
+    get_classify_search_links(page)
+
+if(len(sys.argv) > 1):
+    pages = [SavedPage(open(name).read().decode('utf-8', 'replace'))
+             for name in sys.argv[1:]]
+else:
+    pages = [SavedPage(sample_page(25))]
+
+repeats = 200
+for i, page in enumerate(pages):
+    old_time = min(timeit.repeat(lambda: old_pair(page),
+                                 number=repeats, repeat=3)) / repeats
+    new_time = min(timeit.repeat(lambda: extract_classify_page(page),
+                                 number=repeats, repeat=3)) / repeats
+
+    print "Page %d (%d characters)" % (i + 1, len(page.text))
+    print "    get_classify_info + get_classify_search_links: %.3f ms" \
+          % (old_time * 1000)
+    print "    extract_classify_page:                         %.3f ms" \
+          % (new_time * 1000)
+    print "    Speedup: %.1fx" % (old_time / new_time)
+
+    # Both methods must agree for the comparison to mean anything
+    record = extract_classify_page(page)
+    if((record['title'], record['author'], record['lcc']) !=
+       get_classify_info(page) or
+       record['links'] != get_classify_search_links(page)):
+        print "    WARNING: the results of the two methods differ"
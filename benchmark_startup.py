@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Measures how long each program takes from being started to showing its
+# first prompt, so that changes to startup time can be tracked. Each
+# program is run several times in an empty directory and stopped once it
+# asks for its first book. For comparison, each is also timed with bs4
+# and requests imported before it starts, which is what every run cost
+# before they were loaded lazily.
+#
+# Usage
+# python benchmark_startup.py
+# python benchmark_startup.py --runs 10 ISBN_to_LCC.py
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description='Time from start to the first '
+                                 'prompt of each program.')
+parser.add_argument('scripts', nargs='*',
+                    default=['ISBN_to_LCC.py', 'classify_book.py',
+                             'classify_book_copies.py',
+                             'title_author_to_LCC.py'],
+                    help='programs to time (default: all of them)')
+parser.add_argument('--runs', type=int, default=5,
+                    help='number of times to run each program (default 5)')
+args = parser.parse_args()
+
+package_dir = os.path.dirname(os.path.abspath(__file__))
+prompt = re.compile(r'Enter [a-zA-Z]+: ')
+
+def time_to_prompt(command, work_dir):
+# Starts a program and returns the seconds until its first prompt
+
+    start = time.time()
+    process = subprocess.Popen(command, cwd=work_dir, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    output = ''
+    try:
+        while(not prompt.search(output)):
+            data = os.read(process.stdout.fileno(), 4096)
+            if(not data):
+                raise RuntimeError("%s exited before prompting:\n%s"
+                                   % (command[-1], output))
+            output += data
+        return time.time() - start
+    finally:
+        if(process.poll() is None):
+            process.kill()
+        process.wait()
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def time_command(command):
+# Runs a command args.runs times, each in a fresh empty directory, and
+# returns the median and fastest times in milliseconds
+
+    times = []
+    for _ in xrange(args.runs):
+        work_dir = tempfile.mkdtemp()
+        try:
+            times.append(time_to_prompt(command, work_dir))
+        finally:
+            shutil.rmtree(work_dir)
+    return median(times) * 1000, min(times) * 1000
+
+# The interpreter on its own, as a floor for the times below
+times = []
+for _ in xrange(args.runs):
+    start = time.time()
+    subprocess.call([sys.executable, '-c', 'pass'])
+    times.append(time.time() - start)
+print "Python startup: %.0f ms" % (median(times) * 1000)
+print
+
+print "%-26s %18s %24s" % ('Time to first prompt', 'median (fastest)',
+                           'bs4+requests up front')
+for script in args.scripts:
+    script = os.path.join(package_dir, script)
+    lazy = time_command([sys.executable, '-u', script])
+    eager = time_command([sys.executable, '-u', '-c',
+                          'import sys, bs4, requests; '
+                          'sys.argv = [sys.argv[1]]; '
+                          'sys.path.insert(0, %r); '
+                          'execfile(sys.argv[0])' % package_dir, script])
+    print "%-26s %8.0f ms (%4.0f) %14.0f ms (%4.0f)" \
+          % (os.path.basename(script), lazy[0], lazy[1], eager[0], eager[1])
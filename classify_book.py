@@ -24,45 +24,88 @@ THE SOFTWARE.
 """
 
 from BookToLCC import *
+import sys
 
 # Number of links to search through before giving up
 link_limit = 5
 
-while(1):
-    try:
-        title_csv = open_title_author_csv("TitleAuthorLCC.csv")
-        isbn_csv = open_isbn_csv("ISBNsLCC.csv")
-        break
-    except IOError:
-        print 'ERROR: Unable to open CSV file. '\
-        'Check to see if it is open in another program or if you '\
-        'have permissions to modify it. \nPress enter to continue.'
-        raw_input()
-    
-# Main Loop
-while(1):
-    
-    # Request an ISBN number from the user, and clean it up
-    ISBN = raw_input("\nEnter ISBN: ")
-    ISBN = ''.join(ISBN.split()) #Remove all whitespace
-    ISBN = ISBN.replace("-","") #Remove all hyphens
+# With --metrics, timings and counts for each stage of the lookups are
+# written to LookupMetrics.json and LookupMetrics.prom on exit
+if('--metrics' in sys.argv[1:]):
+    export_metrics("LookupMetrics.json", "LookupMetrics.prom")
+
+# With --xml, books are searched through the classify XML service rather
+# than its web pages
+if('--xml' in sys.argv[1:]):
+    configure_classify(backend='xml')
+
+# With --service http://host:8090, books are looked up through an
+# lcc_server.py service shared with the other stations
+service_url = service_url_argument(sys.argv)
+if(service_url is not None):
+    configure_classify(backend='service', base_url=service_url)
+
+# With --profile, the session's call stacks are sampled and its memory use
+# tracked, and on exit they are written to LookupProfile.folded (for a
+# flame graph) and LookupAllocations.txt
+if('--profile' in sys.argv[1:]):
+    profile_session()
+
+# Keep classify.oclc.org responses so repeated lookups are answered locally
+open_response_cache("ClassifyCache.db")
+# Searches that found nothing are not repeated for a few days
+open_negative_cache("ClassifyMisses.db")
+
+# With --catalog, books are kept in Catalog.db instead of the CSV files
+# (export_catalog.py writes the CSV files from it)
+if('--catalog' in sys.argv[1:]):
+    catalog = open_catalog_store("Catalog.db")
+    known = catalog
+    open_title_author_index("TitleAuthorLCC.csv").load_catalog_store(catalog)
+else:
+    catalog = None
+    # Books already in the CSV files are answered without searching again
+    known = open_classified_index("ISBNsLCC.csv")
+    # and close spellings of them are offered before searching the website.
+    # TitleAuthorLCC.csv is read once for both.
+    title_index = open_title_author_index("TitleAuthorLCC.csv")
+    known.load_title_author_index(title_index)
+# ISBNs in the offline LCC index, if one was built with import_LCC_dump.py,
+# are answered without searching the website
+open_lcc_dump_index("LCCDump.idx")
+
+if(catalog is not None):
+    title_csv = isbn_csv = catalog
+else:
+    while(1):
+        try:
+            title_csv = BufferedCSVWriter(
+                            open_title_author_csv("TitleAuthorLCC.csv"))
+            isbn_csv = BufferedCSVWriter(open_isbn_csv("ISBNsLCC.csv"))
+            break
+        except IOError:
+            print 'ERROR: Unable to open CSV file. '\
+            'Check to see if it is open in another program or if you '\
+            'have permissions to modify it. \nPress enter to continue.'
+            raw_input()
     
-    # Check if we should be done
-    if(ISBN == "exit"):
-        break
+# With --pipeline, each ISBN is looked up in the background while the
+# previous book is being checked
+pipeline = '--pipeline' in sys.argv[1:]
+pending = [] # (ISBN, lookup) pairs waiting to be checked, oldest first
+exited = False # True once exit is typed while a book is being checked
 
-    # Verify the ISBN has a valid format, if not, break
-    if(not validate_ISBN(ISBN)):
-        continue
-        
-    # Try to get the book's information
-    title, author, lcc = search_classify(ISBN, link_limit)
+def save_book(ISBN, record):
+    # Saves the book's information, falling back on its title and author
+    # if the ISBN search failed. Returns False if the user asked to exit.
     
     # If the information is valid, save the info and continue
-    if(validate_info(title, author, lcc)):
+    title, author, lcc = record
+    if(validate_record(record)):
         # Save the information to the CSV file
-	write_isbn_csv(ISBN, lcc, isbn_csv)
-        continue
+        write_isbn_csv(ISBN, lcc, isbn_csv)
+        known.add_isbn(ISBN, lcc)
+        return True
     else:
         print "    ISBN did not return any results. Try the title and author."
         
@@ -72,18 +115,93 @@ while(1):
     
     # Check if we should exit the program
     if(title == "exit"):
-        break    
+        return False
     
-    title, author, lcc = search_classify(title, author, link_limit)
+    # The book may have been saved by its title and author before. It is
+    # not saved again under its ISBN, which would list it twice.
+    lcc = known.lookup_title_author(title, author)
+    if(lcc is not None):
+        print "    Already classified. LC Classification: " + lcc
+        return True
+    
+    typed_title, typed_author = title, author
+    title, author, lcc = search_classify_concurrent(title, author, link_limit)
     
     # Check if we actually got the book's information
     if(validate_info(title, author, lcc)):
-	write_title_author_csv(title, author, lcc, title_csv);
-        continue       
+        write_title_author_csv(title, author, lcc, title_csv)
+        known.add_title_author(title, author, lcc)
+        known.add_title_author(typed_title, typed_author, lcc)
+        known.add_isbn(ISBN, lcc)
     else:
         print("    ERROR: Title and author did not return any results.")
         print("           Try again, or set aside for later processing.") 
+    return True
+
+def check_oldest():
+    ISBN, lookup = pending.pop(0)
+    print "\nResults for ISBN " + ISBN + ":"
+    
+    # The same book may have been scanned twice in a row, and saved since
+    # this one was queued
+    lcc = known.lookup_isbn(ISBN)
+    if(lcc is not None):
+        print "    Already classified. LC Classification: " + lcc
+        return True
+    
+    try:
+        record = lookup.validate()
+    except requests.RequestException:
+        print("    ERROR: Unable to access website. "
+              "Check your internet connection.")
+        print("           Try again, or set aside for later processing.")
+        return True
+    return save_book(ISBN, record)
+
+# Main Loop
+while(1):
+    
+    # Request an ISBN number from the user, and clean it up
+    ISBN = raw_input("\nEnter ISBN: ")
+    ISBN = ''.join(ISBN.split()) #Remove all whitespace
+    ISBN = ISBN.replace("-","") #Remove all hyphens
+    
+    # Check if we should be done
+    if(ISBN == "exit"):
+        break
+
+    # Verify the ISBN has a valid format, if not, break
+    if(not validate_ISBN(ISBN)):
+        continue
+        
+    # Books that were already saved don't need to be searched again
+    lcc = known.lookup_isbn(ISBN)
+    if(lcc is not None):
+        print "    Already classified. LC Classification: " + lcc
+        continue
+        
+    # Start the lookup, and check the previous book while it runs
+    if(pipeline):
+        pending.append((ISBN, prefetch_classify(ISBN, link_limit)))
+        if(len(pending) > 1 and not check_oldest()):
+            exited = True
+            break
+        continue
+        
+    # Try to get the book's information
+    if(not save_book(ISBN, search_classify_concurrent(ISBN, link_limit))):
+        break
+    
+# Check the books still waiting, unless exit was typed while checking one
+while(pending and not exited):
+    if(not check_oldest()):
+        break
+
+# Any books left were not saved, so list them to be scanned again
+if(pending):
+    print "\nThese books were not saved. Scan them again later:"
+    for ISBN, lookup in pending:
+        print "    ISBN " + ISBN
     
 isbn_csv.close()
 title_csv.close()
-
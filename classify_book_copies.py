@@ -24,20 +24,71 @@ THE SOFTWARE.
 """
 
 from BookToLCC import *
+import sys
 
 # Number of links to search through before giving up
 link_limit = 5
 
-while(1):
-    try:
-        title_csv = open_title_author_csv("TitleAuthorLCC.csv")
-        isbn_csv = open_isbn_csv("ISBNsLCC.csv")
-        break
-    except IOError:
-        print 'ERROR: Unable to open CSV file. '\
-        'Check to see if it is open in another program or if you '\
-        'have permissions to modify it. \nPress enter to continue.'
-        raw_input()
+# With --metrics, timings and counts for each stage of the lookups are
+# written to LookupMetrics.json and LookupMetrics.prom on exit
+if('--metrics' in sys.argv[1:]):
+    export_metrics("LookupMetrics.json", "LookupMetrics.prom")
+
+# With --xml, books are searched through the classify XML service rather
+# than its web pages
+if('--xml' in sys.argv[1:]):
+    configure_classify(backend='xml')
+
+# With --service http://host:8090, books are looked up through an
+# lcc_server.py service shared with the other stations
+service_url = service_url_argument(sys.argv)
+if(service_url is not None):
+    configure_classify(backend='service', base_url=service_url)
+
+# With --profile, the session's call stacks are sampled and its memory use
+# tracked, and on exit they are written to LookupProfile.folded (for a
+# flame graph) and LookupAllocations.txt
+if('--profile' in sys.argv[1:]):
+    profile_session()
+
+# Keep classify.oclc.org responses so repeated lookups are answered locally
+open_response_cache("ClassifyCache.db")
+# Searches that found nothing are not repeated for a few days
+open_negative_cache("ClassifyMisses.db")
+
+# With --catalog, books are kept in Catalog.db instead of the CSV files
+# (export_catalog.py writes the CSV files from it)
+if('--catalog' in sys.argv[1:]):
+    catalog = open_catalog_store("Catalog.db")
+    known = catalog
+    title_index = open_title_author_index("TitleAuthorLCC.csv")
+    title_index.load_catalog_store(catalog)
+else:
+    catalog = None
+    # Books already in the CSV files are answered without searching again
+    known = open_classified_index("ISBNsLCC.csv")
+    # and close spellings of them are offered before searching the website.
+    # TitleAuthorLCC.csv is read once for both.
+    title_index = open_title_author_index("TitleAuthorLCC.csv")
+    known.load_title_author_index(title_index)
+# ISBNs in the offline LCC index, if one was built with import_LCC_dump.py,
+# are answered without searching the website
+open_lcc_dump_index("LCCDump.idx")
+
+if(catalog is not None):
+    title_csv = isbn_csv = catalog
+else:
+    while(1):
+        try:
+            title_csv = BufferedCSVWriter(
+                            open_title_author_csv("TitleAuthorLCC.csv"))
+            isbn_csv = BufferedCSVWriter(open_isbn_csv("ISBNsLCC.csv"))
+            break
+        except IOError:
+            print 'ERROR: Unable to open CSV file. '\
+            'Check to see if it is open in another program or if you '\
+            'have permissions to modify it. \nPress enter to continue.'
+            raw_input()
     
 # Main Loop
 while(1):
@@ -55,15 +106,25 @@ while(1):
     if(not validate_ISBN(ISBN)):
         continue
         
+    # Books that were already saved don't need to be searched again, but
+    # their new copies are still added
+    lcc = known.lookup_isbn(ISBN)
+    if(lcc is not None):
+        print "    Already classified. LC Classification: " + lcc
+        num_copies = get_num_copies()
+        write_isbn_csv(ISBN, lcc, isbn_csv, num_copies)
+        continue
+        
     # Try to get the book's information
-    title, author, lcc = search_classify(ISBN, link_limit)
+    record = search_classify_concurrent(ISBN, link_limit)
+    title, author, lcc = record
     
     # If the information is valid, save the info and continue
-    if(validate_info(title, author, lcc)):
+    if(validate_record(record)):
         # Save the information to the CSV file
         num_copies = get_num_copies()
-        for _ in xrange(num_copies):
-            write_isbn_csv(ISBN, lcc, isbn_csv)
+        write_isbn_csv(ISBN, lcc, isbn_csv, num_copies)
+        known.add_isbn(ISBN, lcc)
         continue
     else:
         print "    ISBN did not return any results. Try the title and author."
@@ -76,7 +137,19 @@ while(1):
     if(title == "exit"):
         break    
     
-    title, author, lcc = search_classify(title, author, link_limit)
+    # The book may have been saved by its title and author before. Its new
+    # copies are saved under the title and author it was saved with, not
+    # as they were typed.
+    lcc = known.lookup_title_author(title, author)
+    if(lcc is not None):
+        print "    Already classified. LC Classification: " + lcc
+        num_copies = get_num_copies()
+        title, author = title_index.stored_spelling(title, author, lcc)
+        write_title_author_csv(title, author, lcc, title_csv, num_copies)
+        continue
+    
+    typed_title, typed_author = title, author
+    title, author, lcc = search_classify_concurrent(title, author, link_limit)
     
     # Check if we actually got the book's information
     if(not validate_info(title, author, lcc)):
@@ -85,8 +158,10 @@ while(1):
         continue
     if(validate_info(title, author, lcc)):
         num_copies = get_num_copies()
-        for _ in xrange(num_copies):
-            write_title_author_csv(title, author, lcc, title_csv);
+        write_title_author_csv(title, author, lcc, title_csv, num_copies)
+        known.add_title_author(title, author, lcc)
+        known.add_title_author(typed_title, typed_author, lcc)
+        title_index.add_alias(typed_title, typed_author, title, author)
         continue
     
     
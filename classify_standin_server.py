@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# A local stand-in for the classify XML service, so that the XML backend
+# can be run and tested without the real service. Recorded responses are
+# served from a directory, one file per search, named after the search's
+# query (for example isbn=9780306406157.xml or wi=12345.xml). Searches
+# with no recording get the service's "no results" response.
+#
+# With --record, searches without a recording are passed on to the real
+# service, and its responses are saved for next time. Error responses are
+# saved with their status, in a second file ending in .status.
+#
+# Usage
+# python classify_standin_server.py recordings/
+# python classify_standin_server.py --port 8080 --record recordings/
+#
+# Then, in the program using BookToLCC:
+# configure_classify(backend='xml', base_url='http://localhost:8080')
+
+import argparse
+import BaseHTTPServer
+import os
+import re
+import SocketServer
+import urllib2
+import urlparse
+
+parser = argparse.ArgumentParser(description='Serve recorded classify XML '
+                                 'responses on localhost.')
+parser.add_argument('directory', help='directory of recorded responses')
+parser.add_argument('--port', type=int, default=8080,
+                    help='port to listen on (default 8080)')
+parser.add_argument('--record', action='store_true',
+                    help='fetch and save responses that are not recorded')
+parser.add_argument('--service', default='http://classify.oclc.org',
+                    help='service to record from (default '
+                    'http://classify.oclc.org)')
+args = parser.parse_args()
+
+not_found = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<classify xmlns="http://classify.oclc.org">\n'
+             '  <response code="102"/>\n'
+             '</classify>\n')
+
+def recording_name(query):
+# Returns the file name of the recording for a search's query. The
+# summary parameter is left out, and the rest are sorted, so the same
+# search always has the same name.
+
+    params = sorted((name, value) for name, value
+                    in urlparse.parse_qsl(query, True)
+                    if name != 'summary')
+    name = '&'.join('%s=%s' % param for param in params).lower()
+    return re.sub(r'[^a-z0-9=&._-]+', '_', name)[:200] + '.xml'
+
+def read_recording(file_name):
+# Returns the status and body of a recorded response. The status of an
+# error is kept next to its body, in a file ending in .status.
+
+    with open(file_name, 'rb') as recording:
+        body = recording.read()
+    status = 200
+    if(os.path.isfile(file_name + '.status')):
+        with open(file_name + '.status', 'r') as status_file:
+            status = int(status_file.read())
+    return status, body
+
+def write_recording(file_name, status, body):
+# Saves a response for read_recording
+
+    with open(file_name, 'wb') as recording:
+        recording.write(body)
+    if(status != 200):
+        with open(file_name + '.status', 'w') as status_file:
+            status_file.write('%d\n' % status)
+
+class StandinHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse.urlsplit(self.path)
+        file_name = os.path.join(args.directory, recording_name(url.query))
+
+        if(os.path.isfile(file_name)):
+            status, body = read_recording(file_name)
+        elif(args.record):
+            try:
+                response = urllib2.urlopen(args.service + self.path)
+                status, body = 200, response.read()
+            except urllib2.HTTPError as error:
+                # Errors are recorded too, so they can be replayed
+                status, body = error.code, error.read()
+            except urllib2.URLError as error:
+                # Nothing was answered, so there is nothing to record
+                self.send_body(502, 'text/plain', 'Unable to reach %s: %s'
+                               % (args.service, error.reason))
+                return
+            write_recording(file_name, status, body)
+        else:
+            status, body = 200, not_found
+
+        self.send_body(status, 'application/xml', body)
+
+    def send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code='-', size='-'):
+        # Only errors are worth a line on the console
+        if(isinstance(code, int) and code >= 400):
+            BaseHTTPServer.BaseHTTPRequestHandler.log_request(self, code,
+                                                              size)
+
+class StandinServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+if(not os.path.isdir(args.directory)):
+    os.makedirs(args.directory)
+
+server = StandinServer(('localhost', args.port), StandinHandler)
+print "Serving %s on http://localhost:%d" % (args.directory, args.port)
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Cleans a file of ISBNs before they are searched for. Every ISBN is
+# checked against its check digit and written out in its ISBN-13 form, so
+# typos are caught without searching for them and the ISBN-10 and ISBN-13
+# of a book become the same line. Rejected lines are written to a separate
+# file to be fixed by hand.
+#
+# Usage
+# python clean_ISBN_list.py intake.txt cleaned.txt [rejected.txt]
+
+from BulkISBN import *
+import sys
+
+if(len(sys.argv) not in (3, 4)):
+    print "Usage: python clean_ISBN_list.py input output [rejects]"
+    sys.exit(1)
+
+in_file = open(sys.argv[1], 'r')
+out_file = open(sys.argv[2], 'w')
+if(len(sys.argv) == 4):
+    reject_file = open(sys.argv[3], 'w')
+else:
+    reject_file = None
+
+num_valid, num_rejected = clean_isbn_file(in_file, out_file, reject_file)
+print "%d valid ISBNs written, %d rejected." % (num_valid, num_rejected)
+
+in_file.close()
+out_file.close()
+if(reject_file is not None):
+    reject_file.close()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Moves books between Catalog.db, the SQLite catalog kept by the programs
+# when run with --catalog, and the CSV files. export writes
+# ISBNsLCC.csv and TitleAuthorLCC.csv from the catalog, in the layout
+# Readerware imports; import adds the books in existing CSV files to the
+# catalog, leaving out any that it already holds.
+#
+# Usage
+# python export_catalog.py export
+# python export_catalog.py export --shelf-order --isbn-csv Shelf.csv
+# python export_catalog.py import
+
+from BookToLCC import *
+import argparse
+
+parser = argparse.ArgumentParser(description='Export the catalog to CSV '
+                                 'files, or import CSV files into it.')
+parser.add_argument('action', choices=('export', 'import'),
+                    help='export the catalog to the CSV files, or import '
+                    'the CSV files into the catalog')
+parser.add_argument('--catalog', default='Catalog.db',
+                    help='catalog file (default Catalog.db)')
+parser.add_argument('--isbn-csv', default='ISBNsLCC.csv',
+                    help='ISBN CSV file (default ISBNsLCC.csv)')
+parser.add_argument('--title-author-csv', default='TitleAuthorLCC.csv',
+                    help='title/author CSV file (default TitleAuthorLCC.csv)')
+parser.add_argument('--shelf-order', action='store_true',
+                    help='export the books in shelf order rather than the '
+                    'order they were added')
+args = parser.parse_args()
+
+if(args.action == 'export' and not os.path.isfile(args.catalog)):
+    parser.error('%s does not exist' % args.catalog)
+
+store = open_catalog_store(args.catalog, max_rows=10000)
+if(args.action == 'export'):
+    counts = export_catalog_store(store, args.isbn_csv,
+                                  args.title_author_csv, args.shelf_order)
+    for file_name in (args.isbn_csv, args.title_author_csv):
+        print "%d books written to %s." % (counts[file_name], file_name)
+else:
+    # Books already in the catalog are not added again, so importing the
+    # same files twice is harmless
+    for file_name, load in ((args.isbn_csv, store.load_isbn_csv),
+                            (args.title_author_csv,
+                             store.load_title_author_csv)):
+        print "%d books added to %s from %s." % (load(file_name),
+                                                args.catalog, file_name)
+    store.commit()
+store.close()
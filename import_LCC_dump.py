@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Builds the offline LCC index from bulk bibliographic dumps, so that most
+# ISBNs can be classified without the website. Each dump may be a file of
+# MARC 21 records (.mrc or .marc) or a CSV export with a header row naming
+# the ISBN and call number (050) columns. The records of every dump are
+# sorted into one index file, LCCDump.idx by default, which the other
+# programs check before searching the website.
+#
+# Usage
+# python import_LCC_dump.py records.mrc [more.mrc export.csv ...]
+# python import_LCC_dump.py --output LCCDump.idx export.csv
+
+from BookToLCC import *
+import argparse
+import itertools
+
+parser = argparse.ArgumentParser(description='Build the offline LCC index '
+                                 'from MARC or CSV dumps.')
+parser.add_argument('dumps', nargs='+',
+                    help='MARC (.mrc, .marc) or CSV files to import')
+parser.add_argument('--output', default='LCCDump.idx',
+                    help='index file to write (default LCCDump.idx)')
+parser.add_argument('--format', choices=('marc', 'csv'),
+                    help='format of the dumps, if not clear from their names')
+args = parser.parse_args()
+
+def read_dump(file_name):
+# Yields the records of one dump, read according to its format
+
+    dump_format = args.format
+    if(dump_format is None):
+        if(file_name.lower().endswith('.csv')):
+            dump_format = 'csv'
+        else:
+            dump_format = 'marc'
+
+    print "Reading %s" % file_name
+    with open(file_name, 'rb') as dump_file:
+        if(dump_format == 'csv'):
+            records = read_dump_csv_records(dump_file)
+        else:
+            records = read_marc_records(dump_file)
+        for record in records:
+            yield record
+
+records = itertools.chain.from_iterable(read_dump(file_name)
+                                        for file_name in args.dumps)
+count = build_lcc_dump_index(records, args.output)
+print "Done. %d ISBNs written to %s." % (count, args.output)
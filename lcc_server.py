@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# A lookup service shared by several scanning stations, so that each book
+# is searched for once rather than once per station. It answers
+#     /lcc?isbn=9780306406157
+#     /lcc?title=Programming%20Python&author=Lutz
+# with a JSON object holding the title, author and LCC found. Identical
+# lookups that arrive while one is running share it, and results are kept
+# in memory and in the response cache for the next station to ask.
+# /stats shows how lookups were answered, and /metrics gives the lookup
+# metrics in the Prometheus text format.
+#
+# The stations use it by running with --service http://host:8090, or
+# through configure_classify(backend='service', base_url=...).
+#
+# Usage
+# python lcc_server.py
+# python lcc_server.py --host 0.0.0.0 --port 8090
+
+from BookToLCC import *
+import argparse
+import BaseHTTPServer
+import SocketServer
+
+parser = argparse.ArgumentParser(description='Serve LCC lookups to the '
+                                 'scanning stations.')
+parser.add_argument('--host', default='127.0.0.1',
+                    help='address to listen on (default 127.0.0.1, this '
+                    'computer only)')
+parser.add_argument('--port', type=int, default=8090,
+                    help='port to listen on (default 8090)')
+parser.add_argument('--link-limit', type=int, default=5,
+                    help='number of links to search through before giving up')
+parser.add_argument('--rate', type=float,
+                    default=scheduler_settings['rate'],
+                    help='average requests per second sent to the website')
+parser.add_argument('--backend', choices=('html', 'xml'),
+                    default=classify_settings['backend'],
+                    help='search the classify web pages (html, the '
+                    'default) or its XML service (xml)')
+parser.add_argument('--base-url',
+                    help='send searches to this address instead of '
+                    'classify.oclc.org, such as a classify_standin_server.py')
+args = parser.parse_args()
+
+configure_scheduler(rate=args.rate)
+configure_classify(backend=args.backend, base_url=args.base_url)
+
+# The same local data the stations use on their own
+open_response_cache("ClassifyCache.db")
+open_negative_cache("ClassifyMisses.db")
+open_lcc_dump_index("LCCDump.idx")
+open_title_author_index("TitleAuthorLCC.csv")
+
+lookups = CoalescingLookup(search_classify_auto)
+
+class LookupHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse.urlsplit(self.path)
+        query = dict(urlparse.parse_qsl(url.query))
+
+        if(url.path == '/lcc'):
+            self.lookup(query)
+        elif(url.path == '/stats'):
+            self.send_json(200, lookups.stats())
+        elif(url.path == '/metrics'):
+            self.send_text(200, metrics.to_prometheus(),
+                           'text/plain; version=0.0.4')
+        else:
+            self.send_json(404, {'error': 'unknown path'})
+
+    def lookup(self, query):
+    # Answers /lcc for an ISBN, or a title and author
+
+        if('isbn' in query):
+            ISBN = ''.join(query['isbn'].split()).replace('-', '')
+            if(not is_ISBN(ISBN)):
+                self.send_json(400, {'error': 'not a valid ISBN'})
+                return
+            search = (ISBN, args.link_limit)
+        elif('title' in query):
+            search = (query['title'].decode('utf-8', 'replace'),
+                      query.get('author', '').decode('utf-8', 'replace'),
+                      args.link_limit)
+        else:
+            self.send_json(400, {'error': 'give an isbn, or a title and '
+                                 'author'})
+            return
+
+        try:
+            record, how = lookups.get(search_miss_key(search), *search)
+        except requests.RequestException:
+            self.send_json(502, {'error': 'classify.oclc.org could not be '
+                                 'reached'})
+            return
+
+        title, author, lcc = record
+        found = validate_record(record)
+        self.send_json(200 if found else 404,
+                       {'found': found, 'title': title, 'author': author,
+                        'lcc': lcc, 'how': how})
+
+    def send_json(self, status, value):
+        self.send_text(status, json.dumps(value), 'application/json')
+
+    def send_text(self, status, text, content_type):
+        if(isinstance(text, unicode)):
+            text = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def log_request(self, code='-', size='-'):
+        # Only errors are worth a line on the console
+        if(isinstance(code, int) and code >= 400):
+            BaseHTTPServer.BaseHTTPRequestHandler.log_request(self, code,
+                                                              size)
+
+class LookupServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+server = LookupServer((args.host, args.port), LookupHandler)
+print "Serving LCC lookups on http://%s:%d" % (args.host, args.port)
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
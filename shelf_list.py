@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Writes shelf lists: copies of ISBNsLCC.csv and TitleAuthorLCC.csv with
+# the books in the order they stand on the shelf rather than the order
+# they were scanned, as ISBNsLCCShelf.csv and TitleAuthorLCCShelf.csv.
+# They keep the same columns, so they can be imported into Readerware in
+# the same way.
+#
+# Usage
+# python shelf_list.py
+# python shelf_list.py ISBNsLCC.csv --chunk-size 50000
+
+from BookToLCC import *
+import argparse
+
+parser = argparse.ArgumentParser(description='Sort the CSV files into '
+                                 'shelf order.')
+parser.add_argument('files', nargs='*',
+                    default=['ISBNsLCC.csv', 'TitleAuthorLCC.csv'],
+                    help='CSV files to sort (default ISBNsLCC.csv and '
+                    'TitleAuthorLCC.csv)')
+parser.add_argument('--chunk-size', type=int, default=200000,
+                    help='rows sorted in memory at a time (default 200000)')
+args = parser.parse_args()
+
+for file_name in args.files:
+    if(not os.path.isfile(file_name)):
+        print "%s does not exist, skipping it." % file_name
+        continue
+    base, extension = os.path.splitext(file_name)
+    shelf_file_name = base + 'Shelf' + (extension or '.csv')
+    count = write_shelf_list(file_name, shelf_file_name, args.chunk_size)
+    print "%d books from %s written to %s." % (count, file_name,
+                                               shelf_file_name)
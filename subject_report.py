@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015 Dominic Antonacci
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Reports how many books of the collection fall in each class and
+# subclass of the Library of Congress Classification, from ISBNsLCC.csv
+# and TitleAuthorLCC.csv. The classes come from LCCOutline.txt; ranges of
+# your own, such as QA76-QA76.9, can be counted as well with --range.
+#
+# Usage
+# python subject_report.py
+# python subject_report.py --depth 3 --range QA76-QA76.9 --csv Subjects.csv
+
+from BookToLCC import *
+import argparse
+
+parser = argparse.ArgumentParser(description='Count the books in each LCC '
+                                 'class and subclass.')
+parser.add_argument('files', nargs='*',
+                    default=['ISBNsLCC.csv', 'TitleAuthorLCC.csv'],
+                    help='CSV files to count (default ISBNsLCC.csv and '
+                    'TitleAuthorLCC.csv)')
+parser.add_argument('--outline',
+                    help='outline file to use instead of LCCOutline.txt')
+parser.add_argument('--depth', type=int, default=2,
+                    help='levels of the outline to show (default 2, '
+                    'classes and subclasses)')
+parser.add_argument('--range', action='append', default=[],
+                    dest='ranges', metavar='RANGE',
+                    help='also count a range such as QA76-QA76.9 (may be '
+                    'given more than once)')
+parser.add_argument('--all', action='store_true',
+                    help='also show ranges with no books')
+parser.add_argument('--csv',
+                    help='also write the counts to this CSV file')
+args = parser.parse_args()
+
+outline = load_lcc_outline(args.outline)
+outline_size = len(outline.ranges)
+for range_text in args.ranges:
+    try:
+        outline.add(range_text, 'Range ' + range_text)
+    except ValueError as error:
+        parser.error(str(error))
+outline.build()
+
+counts = count_subjects(outline, args.files)
+# The ranges given with --range are listed on their own, so they must not
+# push the outline's ranges inside them down a level
+depths = outline.depths(outline_size)
+
+# The outline's ranges in shelf order, each after those it is inside
+order = sorted(xrange(outline_size),
+               key=lambda number: (outline.ranges[number][0], depths[number]))
+rows = []
+for number in order:
+    count = counts.get(number, 0)
+    if(depths[number] < args.depth and (count or args.all)):
+        rows.append((depths[number], number, count))
+
+for depth, number, count in rows:
+    range_text, caption = outline.ranges[number][2:]
+    print "%s%-*s %7d  %s" % ('  ' * depth, 14 - 2 * depth, range_text,
+                              count, caption)
+for number in xrange(outline_size, len(outline.ranges)):
+    print "%-14s %7d" % (outline.ranges[number][2],
+                         counts.get(number, 0))
+print "%-14s %7d" % ('Unclassified', counts['unclassified'])
+print "%-14s %7d" % ('Total', counts['total'])
+
+if(args.csv):
+    with open(args.csv, 'wb') as csv_file:
+        csv_file.write(format_csv_row(['Range', 'Caption', 'Books']))
+        for depth, number, count in rows:
+            range_text, caption = outline.ranges[number][2:]
+            csv_file.write(format_csv_row([range_text, caption, str(count)]))
+        for number in xrange(outline_size, len(outline.ranges)):
+            range_text, caption = outline.ranges[number][2:]
+            csv_file.write(format_csv_row([range_text, caption,
+                                           str(counts.get(number, 0))]))
@@ -0,0 +1,90 @@
+# The BeautifulSoup extractors that ClassifyPageParser replaced, kept to
+# check the parser against (test_page_parser.py) and to time it against
+# (benchmark_extractor.py). They need bs4, which BookToLCC.py no longer
+# uses.
+
+import support
+from BookToLCC import get_url_segment
+
+def get_classify_info(page):
+# Attempts to parse a classify.oclc.org webpage and scrape the title,
+# author, and LC Classification. If it fails, it will return empty
+# strings for each of these values.
+#
+# Usage
+# title, author, LCC = get_classify_info(page)
+#
+# Inputs
+# page: The page returned by requests.get
+#
+# Outputs
+# title: a string containing the title.
+# author: a string containing the author.
+# LCC: a string containing the LCC classification.
+# All of these will be blank if the webpage doesn't contain this information
+
+    from bs4 import BeautifulSoup
+
+    # Convert the HTML file into an organized array
+    soup = BeautifulSoup(page.text)
+
+    text = soup.get_text()
+    data =  filter(None,text.split('\n'))
+
+    # Search for the title, author, and LCC
+    try:
+        data = data[data.index("Summary"):-1]
+    except ValueError:
+        return '','',''
+
+    try:
+        i_title = data.index("Title:")+1
+        title = data[i_title]
+    except ValueError:
+        title = ''
+
+    try:
+        i_author = data.index("Author:")+1
+        author = data[i_author]
+    except ValueError:
+        author = ''
+
+    try:
+        i_lcc = data.index("LCC:")+5
+        lcc = data[i_lcc]
+    except ValueError:
+        lcc = ''
+
+    # Return the data
+    return title, author, lcc
+
+def get_classify_search_links(page):
+# Gets all links for books to search through on a classify.oclc.org
+# webpage. It assumes that books will start on the 8th link
+# (found through empirical testing) and will be an internal link,
+# beginning with /classify2/ClassifyDemo?wi=
+#
+# Usage
+# links = get_classify_search_links(soup)
+#
+# Inputs
+# page: The output of responses.get(url)
+#
+# Outputs
+# links: an array of strings, each string is a link to a search result
+
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # The constant part of an internal classify search link
+    search_url = get_url_segment('search_url')
+
+    # Extract all the hyperlinks from the webpage
+    a_tags = BeautifulSoup(page.text, parse_only=SoupStrainer('a'))
+    links = []
+    for link in a_tags.find_all('a'):
+        href = link.get('href')
+        # If they match the URL for a search result, add them to the list
+        if(search_url in href):
+            links.append(href)
+
+    return links
@@ -0,0 +1,211 @@
+# Helpers shared by the tests: a local web server standing in for
+# classify.oclc.org (or an lcc_server.py service), sample pages, and a way
+# to put BookToLCC's module state back between tests.
+#
+# Run the tests from the top directory with
+# python -m unittest discover tests
+
+import contextlib
+import errno
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import BaseHTTPServer
+import SocketServer
+from cStringIO import StringIO
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(TESTS_DIR, 'fixtures')
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+import BookToLCC
+
+
+def summary_page(title, author, lcc):
+# Returns a ClassifyDemo page holding a single book's summary
+
+    return ('<html><body><a href="/classify2/">Home</a>\n'
+            '<div>Summary</div>\n<div>\n'
+            '<dt>Title:</dt>\n<dd>%s</dd>\n'
+            '<dt>Author:</dt>\n<dd>%s</dd>\n</div>\n'
+            '<table><tr><th>Class Scheme</th></tr>\n'
+            '<tr><td>DDC:</td>\n<td>1</td>\n<td>Top</td>\n<td>More</td>\n'
+            '<td>2</td>\n<td>005.133</td>\n</tr>\n'
+            '<tr><td>LCC:</td>\n<td>1</td>\n<td>Top</td>\n<td>More</td>\n'
+            '<td>2</td>\n<td>%s</td>\n</tr></table>\n'
+            '</body></html>' % (title, author, lcc))
+
+def service_response(status, **fields):
+# Returns an lcc_server.py answer holding the fields as JSON
+
+    return (status, 'application/json', json.dumps(fields))
+
+def list_page(works=()):
+# Returns a ClassifyDemo page listing links to works; with no works it is
+# the page returned for a search that found nothing
+
+    links = ''.join('<tr><td><a href="/classify2/ClassifyDemo?wi=%s">'
+                    'Book %s</a></td></tr>\n' % (work, work)
+                    for work in works)
+    return ('<html><body><a href="/classify2/">Home</a>\n'
+            '<table>%s</table></body></html>' % links)
+
+
+def free_port():
+# Returns a port on localhost that nothing is listening on
+
+    listener = socket.socket()
+    listener.bind(('localhost', 0))
+    port = listener.getsockname()[1]
+    listener.close()
+    return port
+
+def wait_for_port(port, process, timeout=10):
+# Waits for a server started in process to listen on port. Returns False
+# if it exits or timeout seconds pass first.
+
+    deadline = time.time() + timeout
+    while(time.time() < deadline and process.poll() is None):
+        try:
+            socket.create_connection(('localhost', port), 0.5).close()
+            return True
+        except socket.error:
+            time.sleep(0.05)
+    return False
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.stub.requests.append(self.path)
+        status, content_type, body = self.server.stub.respond(self.path)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up early, as timed out and streamed fetches
+        # do, are expected
+        error = sys.exc_info()[1]
+        if(isinstance(error, socket.error) and
+           error.errno in (errno.EPIPE, errno.ECONNRESET)):
+            return
+        BaseHTTPServer.HTTPServer.handle_error(self, request, client_address)
+
+
+class StubServer(object):
+# A web server on localhost answering each request from a table of
+# responses. Every path requested is kept in requests.
+#
+# Usage
+# server = StubServer({'wi=111': (200, 'text/html', page)})
+# ...
+# server.stop()
+#
+# Inputs
+# responses: a dictionary from a string the end of the path must match to
+#            (status, content type, body)
+# default: the response for any other path
+
+    def __init__(self, responses=None, default=None):
+        self.responses = dict(responses or {})
+        self.default = default or (200, 'text/html; charset=utf-8',
+                                   list_page())
+        self.requests = []
+        self.server = StubHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.stub = self
+        self.url = 'http://127.0.0.1:%d' % self.server.server_port
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  args=(0.05,))
+        thread.daemon = True
+        thread.start()
+
+    def respond(self, path):
+        for suffix, response in self.responses.items():
+            if(path.endswith(suffix)):
+                return response
+        return self.default
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StatusServer(StubServer):
+# Answers with each status in turn, then keeps giving the last one
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        StubServer.__init__(self)
+
+    def respond(self, path):
+        if(len(self.statuses) > 1):
+            status = self.statuses.pop(0)
+        else:
+            status = self.statuses[0]
+        return (status, 'text/plain', 'Status %d' % status)
+
+
+class SlowServer(StubServer):
+# Takes delay seconds to answer each request
+
+    def __init__(self, delay):
+        self.delay = delay
+        StubServer.__init__(self)
+
+    def respond(self, path):
+        time.sleep(self.delay)
+        return StubServer.respond(self, path)
+
+
+def reset_book_to_lcc():
+# Closes anything a test opened in BookToLCC and goes back to the default
+# classify backend
+
+    for name in ('response_cache', 'negative_cache', 'title_author_index',
+                 'lcc_dump_index'):
+        value = getattr(BookToLCC, name)
+        if(value is not None and hasattr(value, 'close')):
+            value.close()
+        setattr(BookToLCC, name, None)
+    BookToLCC.configure_classify(backend='html', base_url=None)
+
+
+@contextlib.contextmanager
+def captured_output():
+# Keeps what is printed inside the with block off the console, and gives
+# it as a StringIO
+
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        yield sys.stdout
+    finally:
+        sys.stdout = stdout
+
+
+class TempDirMixin(object):
+# Gives each test a temporary directory, removed afterwards
+
+    def make_temp_dir(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        return self.temp_dir
+
+    def temp_path(self, name):
+        return os.path.join(self.temp_dir, name)
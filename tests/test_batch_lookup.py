@@ -0,0 +1,84 @@
+import csv
+import os
+import subprocess
+import sys
+import unittest
+
+import support
+
+
+class BatchLookupTest(support.TempDirMixin, unittest.TestCase):
+# Runs batch_ISBN_to_LCC.py in a temporary directory against a stand-in
+# for classify.oclc.org
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.server = support.StubServer({
+            'txt=9780306406157': (200, 'text/html', support.summary_page(
+                'Programming Python', 'Lutz, Mark', 'QA76.73.P98 L88')),
+            'txt=0131103628': (200, 'text/html', support.summary_page(
+                'The C Programming Language', 'Kernighan, Brian',
+                'QA76.73.C15 K47')),
+        })
+        self.addCleanup(self.server.stop)
+
+    def run_script(self, args, input_text=''):
+        script = os.path.join(os.path.dirname(support.TESTS_DIR),
+                              'batch_ISBN_to_LCC.py')
+        process = subprocess.Popen([sys.executable, script, '--workers', '3',
+                                    '--base-url', self.server.url] + args,
+                                   cwd=self.temp_dir, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        output, errors = process.communicate(input_text)
+        self.assertEqual(process.returncode, 0, errors)
+        return output, errors
+
+    def read_rows(self):
+        with open(self.temp_path('ISBNsLCC.csv'), 'rb') as csv_file:
+            return sorted(list(csv.reader(csv_file))[1:])
+
+    def test_isbns_from_a_file(self):
+        with open(self.temp_path('ISBNsLCC.csv'), 'w') as csv_file:
+            csv_file.write('"ISBN","Call_Number"\n'
+                           '"9781234567897","QA1 .A1"\n')
+        with open(self.temp_path('isbns.txt'), 'w') as isbn_file:
+            isbn_file.write('978-0-306-40615-7\n'
+                            'not an ISBN\n'
+                            '0131103628\n'
+                            '\n'
+                            '9780201633610\n'
+                            '9780306406157\n'
+                            '9781234567897\n')
+
+        output, errors = self.run_script(['isbns.txt'])
+        self.assertIn('2 ISBNs found, 2 already classified, 2 set aside',
+                      output)
+        self.assertIn('Line 2: notanISBN is not a valid ISBN', errors)
+        self.assertIn('Line 5: 9780201633610 did not return any results',
+                      errors)
+        self.assertEqual(self.read_rows(),
+                         [['0131103628', 'QA76.73.C15 K47'],
+                          ['9780306406157', 'QA76.73.P98 L88'],
+                          ['9781234567897', 'QA1 .A1']])
+        # Books already in the output file are not searched for
+        self.assertFalse([path for path in self.server.requests
+                          if path.endswith('9781234567897')])
+
+    def test_isbns_from_stdin(self):
+        output, errors = self.run_script([], '9780306406157\n')
+        self.assertIn('1 ISBNs found', output)
+        self.assertEqual(self.read_rows(),
+                         [['9780306406157', 'QA76.73.P98 L88']])
+
+    def test_parse_processes(self):
+        output, errors = self.run_script(['--parse-processes', '2'],
+                                         '9780306406157\n0131103628\n')
+        self.assertIn('2 ISBNs found', output)
+        self.assertEqual(self.read_rows(),
+                         [['0131103628', 'QA76.73.C15 K47'],
+                          ['9780306406157', 'QA76.73.P98 L88']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+import support
+import BookToLCC
+
+
+class BookCatalogTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = BookToLCC.BookCatalog()
+
+    def test_books_read_back(self):
+        self.catalog.add('0306406152', u'Caf\xe9 Society', u'Smith, J.',
+                         'QA76.73.P98 L88 2013')
+        self.catalog.add('', 'Title', 'Author', 'PS3545 .H16')
+        self.assertEqual(len(self.catalog), 2)
+        self.assertEqual(self.catalog[0],
+                         (u'Caf\xe9 Society', u'Smith, J.',
+                          u'QA76.73.P98 L88 2013'))
+        self.assertEqual(self.catalog[-1],
+                         ('Title', 'Author', 'PS3545 .H16'))
+        self.assertEqual(self.catalog.isbn(0), '9780306406157')
+        self.assertEqual(self.catalog.isbn(1), '')
+        self.assertRaises(IndexError, self.catalog.__getitem__, 2)
+
+    def test_bytes_that_are_not_utf8(self):
+        self.catalog.add('', 'caf\xe9', 'Andr\xe9', 'QA76.73.P98 L\xe9')
+        title, author, lcc = self.catalog[0]
+        self.assertEqual(title, u'caf\ufffd')
+        self.assertEqual(author, u'Andr\ufffd')
+        self.assertEqual(lcc, u'QA76.73.P98 L\ufffd')
+
+    def test_authors_and_classes_are_shared(self):
+        self.catalog.add('', 'One', 'Author', 'QA76.73.P98 L88')
+        self.catalog.add('', 'Two', 'Author', 'QA76.73.C15 K47')
+        self.assertEqual(len(self.catalog.strings), 2)
+
+    def test_find_ISBN(self):
+        self.catalog.add('9780306406157', '', '', 'QA1 .A1')
+        self.catalog.add('9780131103627', '', '', 'QA76.73.C15 K47')
+        self.assertEqual(self.catalog.find_ISBN('0131103628').lcc,
+                         'QA76.73.C15 K47')
+        # The book added last wins, also after a search
+        self.catalog.add('0306406152', '', '', 'QA2 .B2')
+        self.assertEqual(self.catalog.find_ISBN('9780306406157').lcc,
+                         'QA2 .B2')
+        self.assertEqual(self.catalog.find_ISBN('9780201633610'), None)
+        self.assertEqual(self.catalog.find_ISBN(''), None)
+
+    def test_load_csv_files(self):
+        self.make_temp_dir()
+        with open(self.temp_path('isbn.csv'), 'wb') as csv_file:
+            csv_file.write('ISBN,Call_Number\n9780306406157,QA1 .A1\n')
+        with open(self.temp_path('ta.csv'), 'wb') as csv_file:
+            csv_file.write('Title,Author,Call_Number\nTitle,Author,PS1 .A1\n')
+        catalog = BookToLCC.load_book_catalog(self.temp_path('isbn.csv'),
+                                              self.temp_path('ta.csv'))
+        self.assertEqual(list(catalog.items()),
+                         [('9780306406157', ('', '', 'QA1 .A1')),
+                          ('', ('Title', 'Author', 'PS1 .A1'))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import random
+import unittest
+
+import support
+import BookToLCC
+
+try:
+    import numpy
+    import BulkISBN
+except ImportError:
+    numpy = None
+
+
+def random_isbns(count):
+    # Returns a mix of valid ISBN-10s and ISBN-13s, the same with typos,
+    # and strings of other shapes
+    rand = random.Random(7)
+    isbns = []
+    for i in xrange(count):
+        digits = ''.join(rand.choice('0123456789') for j in xrange(12))
+        isbn13 = BookToLCC.ISBN_13_check_digit(rand.choice(['978', '979'])
+                                               + digits[3:])
+        total = sum((10 - j) * int(c) for j, c in enumerate(digits[:9]))
+        check = (11 - total % 11) % 11
+        isbn10 = digits[:9] + ('X' if check == 10 else str(check))
+        isbn = rand.choice([isbn10, isbn13])
+
+        change = rand.randrange(6)
+        if(change == 1):
+            # One digit mistyped
+            place = rand.randrange(len(isbn) - 1)
+            isbn = isbn[:place] + rand.choice('0123456789') + isbn[place + 1:]
+        elif(change == 2):
+            # Two digits swapped
+            place = rand.randrange(len(isbn) - 1)
+            isbn = (isbn[:place] + isbn[place + 1] + isbn[place] +
+                    isbn[place + 2:])
+        elif(change == 3):
+            # Too long or too short
+            isbn = rand.choice([isbn[:-1], isbn + '0',
+                                digits[:rand.randrange(14)]])
+        elif(change == 4):
+            # A letter in place of a digit
+            place = rand.randrange(len(isbn))
+            isbn = isbn[:place] + rand.choice('XxAb') + isbn[place + 1:]
+        isbns.append(isbn)
+    return isbns
+
+def scalar_key(isbn):
+    # What the one-at-a-time functions make of an ISBN, once the
+    # separators BulkISBN ignores are removed
+    isbn = isbn.replace(' ', '').replace('-', '')
+    if(not BookToLCC.is_ISBN(isbn)):
+        return None
+    return BookToLCC.canonical_ISBN(isbn)
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class CanonicalizeISBNsTest(unittest.TestCase):
+# Checks that canonicalize_isbns accepts and converts exactly what
+# is_ISBN and canonical_ISBN do
+
+    def assertSameAsScalar(self, isbns):
+        keys, rejected = BulkISBN.canonicalize_isbns(isbns)
+        formatted = BulkISBN.format_isbn_keys(keys)
+        for isbn, key, was_rejected in zip(isbns, formatted, rejected):
+            expected = scalar_key(isbn)
+            self.assertEqual(was_rejected, expected is None, repr(isbn))
+            if(expected is not None):
+                self.assertEqual(key, expected, repr(isbn))
+
+    def test_examples(self):
+        self.assertSameAsScalar([
+            '0306406152', '9780306406157', '080442957X', '080442957x',
+            '0-306-40615-2', '978 0 306 40615 7', '9791090636071',
+            '0306406153', '9780306406158', '3064061520', '978030640615',
+            '97803064061577', '', 'X306406152', '03064X6152',
+            '978030640615X', 'ISBN030640', '0000000000', '0000000000000'])
+        keys, rejected = BulkISBN.canonicalize_isbns(['0306406152'])
+        self.assertEqual(list(BulkISBN.format_isbn_keys(keys)),
+                         ['9780306406157'])
+
+    def test_random_isbns(self):
+        isbns = random_isbns(5000)
+        self.assertSameAsScalar(isbns)
+        # Make sure the mix covers both outcomes for both lengths
+        outcomes = set((len(isbn), scalar_key(isbn) is None)
+                       for isbn in isbns)
+        self.assertTrue(set([(10, True), (10, False), (13, True),
+                             (13, False)]) <= outcomes)
+
+    def test_unicode_and_empty_input(self):
+        self.assertSameAsScalar([u'0306406152', u'9780306406158'])
+        keys, rejected = BulkISBN.canonicalize_isbns([])
+        self.assertEqual((len(keys), len(rejected)), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import csv
+import unittest
+
+import support
+import BookToLCC
+
+
+class CatalogStoreTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.store = self.open_store()
+
+    def open_store(self):
+        store = BookToLCC.open_catalog_store(self.temp_path('Catalog.db'))
+        self.addCleanup(store.close)
+        return store
+
+    def reopen(self):
+        self.store.close()
+        self.store = self.open_store()
+
+    def test_lookup_waiting_and_committed_books(self):
+        BookToLCC.write_isbn_csv('0306406152', 'QA76.73.P98 L88',
+                                 self.store)
+        BookToLCC.write_title_author_csv(u'Title', u'Author', 'PS3545 .H16',
+                                         self.store)
+        self.check_lookups()
+        self.reopen()
+        self.check_lookups()
+
+    def check_lookups(self):
+        self.assertEqual(self.store.lookup_isbn('9780306406157'),
+                         'QA76.73.P98 L88')
+        self.assertEqual(self.store.lookup_title_author('title', 'AUTHOR'),
+                         'PS3545 .H16')
+        self.assertEqual(self.store.lookup_isbn('9780131103627'), None)
+
+    def test_newest_book_wins(self):
+        self.store.write_isbn('9780306406157', 'QA1 .A1')
+        self.store.commit()
+        self.store.write_isbn('9780306406157', 'QA2 .B2')
+        self.assertEqual(self.store.lookup_isbn('9780306406157'), 'QA2 .B2')
+
+    def test_books_in_shelf_order(self):
+        for ISBN, lcc in (('9780306406157', 'QA76.8 .A1'),
+                          ('9780131103627', 'QA9 .B2'),
+                          ('9780201633610', 'QA76.73 .C3')):
+            self.store.write_isbn(ISBN, lcc)
+        self.assertEqual([row[1] for row in self.store.books('isbn')],
+                         ['QA76.8 .A1', 'QA9 .B2', 'QA76.73 .C3'])
+        self.assertEqual([row[1] for row in
+                          self.store.books('isbn', shelf_order=True)],
+                         ['QA9 .B2', 'QA76.73 .C3', 'QA76.8 .A1'])
+
+    def test_export_writes_each_copy(self):
+        self.store.write_isbn('9780306406157', 'QA76.73.P98 L88', copies=2)
+        self.store.write_title_author('Title', 'Author', 'PS3545 .H16')
+        counts = BookToLCC.export_catalog_store(
+                self.store, self.temp_path('isbn.csv'),
+                self.temp_path('ta.csv'))
+        self.assertEqual(counts[self.temp_path('isbn.csv')], 2)
+        with open(self.temp_path('isbn.csv'), 'rb') as csv_file:
+            rows = list(csv.reader(csv_file))
+        self.assertEqual(rows, [['ISBN', 'Call_Number'],
+                                ['9780306406157', 'QA76.73.P98 L88'],
+                                ['9780306406157', 'QA76.73.P98 L88']])
+
+    def test_aliases_are_kept(self):
+        # A book found by its title and author after its ISBN search
+        # failed, under another spelling than the one typed
+        self.store.write_title_author('The C Programming Language',
+                                      'Kernighan', 'QA76.73.C15 K47')
+        self.store.add_title_author('C programing language', 'kernighan',
+                                    'QA76.73.C15 K47')
+        self.store.add_isbn('0131103628', 'QA76.73.C15 K47')
+        self.reopen()
+        self.assertEqual(self.store.lookup_isbn('9780131103627'),
+                         'QA76.73.C15 K47')
+        self.assertEqual(self.store.lookup_title_author(
+                'C programing language', 'kernighan'), 'QA76.73.C15 K47')
+
+    def test_aliases_are_not_books(self):
+        self.store.add_isbn('9780131103627', 'QA76.73.C15 K47')
+        self.assertEqual(self.store.lookup_isbn('9780131103627'),
+                         'QA76.73.C15 K47')
+        self.assertEqual(list(self.store.books('isbn')), [])
+
+    def test_books_win_over_aliases(self):
+        self.store.add_isbn('9780131103627', 'QA1 .A1')
+        self.store.write_isbn('9780131103627', 'QA76.73.C15 K47')
+        self.reopen()
+        self.assertEqual(self.store.lookup_isbn('9780131103627'),
+                         'QA76.73.C15 K47')
+
+    def write_csv(self, name, rows):
+        with open(self.temp_path(name), 'wb') as csv_file:
+            csv.writer(csv_file).writerows(rows)
+        return self.temp_path(name)
+
+    def test_importing_again_adds_nothing(self):
+        isbn_csv = self.write_csv('isbn.csv', [
+                ['ISBN', 'Call_Number'],
+                ['9780306406157', 'QA76.73.P98 L88'],
+                ['9780306406157', 'QA76.73.P98 L88'],
+                ['0131103628', 'QA76.73.C15 K47']])
+        ta_csv = self.write_csv('ta.csv', [
+                ['Title', 'Author', 'Call_Number'],
+                ['Title', 'Author', 'PS3545 .H16']])
+        self.assertEqual(self.store.load_isbn_csv(isbn_csv), 3)
+        self.assertEqual(self.store.load_title_author_csv(ta_csv), 1)
+        self.assertEqual(self.store.load_isbn_csv(isbn_csv), 0)
+        self.assertEqual(self.store.load_title_author_csv(ta_csv), 0)
+        self.assertEqual(len(list(self.store.books('isbn'))), 3)
+        self.assertEqual(len(list(self.store.books('title_author'))), 1)
+
+    def test_importing_a_longer_file_adds_the_new_rows(self):
+        rows = [['ISBN', 'Call_Number'],
+                ['9780306406157', 'QA76.73.P98 L88']]
+        self.store.load_isbn_csv(self.write_csv('isbn.csv', rows))
+        rows += [['9780306406157', 'QA76.73.P98 L88'],
+                 ['9780131103627', 'QA76.73.C15 K47']]
+        self.assertEqual(
+                self.store.load_isbn_csv(self.write_csv('isbn.csv', rows)), 2)
+        self.assertEqual(len(list(self.store.books('isbn'))), 3)
+
+    def test_importing_books_already_added(self):
+        self.store.write_isbn('9780306406157', 'QA76.73.P98 L88', copies=2)
+        isbn_csv = self.write_csv('isbn.csv', [
+                ['9780306406157', 'QA76.73.P98 L88'],
+                ['9780306406157', 'QA76.73.P98 L88']])
+        self.assertEqual(self.store.load_isbn_csv(isbn_csv), 0)
+
+    def test_closing_twice(self):
+        self.store.write_isbn('9780306406157', 'QA76.73.P98 L88')
+        self.store.close()
+        self.store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import csv
+import os
+import subprocess
+import sys
+import unittest
+
+import support
+import BookToLCC
+
+
+class ClassifiedIndexTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        with open(self.temp_path('ISBNsLCC.csv'), 'wb') as csv_file:
+            csv_file.write('"ISBN","Call_Number"\n'
+                           '"0306406152","QA76.73.P98 L88"\n'
+                           '\n'
+                           '"9780131103627","QA76.73.C15 K47"\n'
+                           '"not a book"\n')
+        with open(self.temp_path('TitleAuthorLCC.csv'), 'wb') as csv_file:
+            csv_file.write('"Title","Author","Call_Number"\n'
+                           '"Cafe Society","Smith, J.","PS3545.H16 C34"\n')
+        self.index = BookToLCC.open_classified_index(
+                self.temp_path('ISBNsLCC.csv'),
+                self.temp_path('TitleAuthorLCC.csv'))
+
+    def test_either_form_of_an_ISBN(self):
+        for ISBN in ('0306406152', '9780306406157'):
+            self.assertEqual(self.index.lookup_isbn(ISBN), 'QA76.73.P98 L88')
+        self.assertEqual(self.index.lookup_isbn('0131103628'),
+                         'QA76.73.C15 K47')
+        self.assertEqual(self.index.lookup_isbn('9780201633610'), None)
+        self.assertEqual(len(self.index.isbns), 2)
+
+    def test_title_and_author_as_typed(self):
+        self.assertEqual(self.index.lookup_title_author(u'  caf\xe9 society!',
+                                                        u'SMITH J'),
+                         'PS3545.H16 C34')
+        self.assertEqual(self.index.lookup_title_author(u'Cafe Society',
+                                                        u'Jones, J.'), None)
+
+    def test_added_books(self):
+        self.index.add_isbn('9780201633610', 'QA76.64 .D47')
+        self.index.add_title_author(u'Design Patterns', u'Gamma, Erich',
+                                    'QA76.64 .D47')
+        self.assertEqual(self.index.lookup_isbn('0201633612'),
+                         'QA76.64 .D47')
+        self.assertEqual(self.index.lookup_title_author(u'design patterns',
+                                                        u'gamma erich'),
+                         'QA76.64 .D47')
+
+    def test_missing_files_are_empty(self):
+        index = BookToLCC.open_classified_index(self.temp_path('none.csv'),
+                                                self.temp_path('none.csv'))
+        self.assertEqual((index.isbns, index.titles), ({}, {}))
+
+
+class KnownBookTest(support.TempDirMixin, unittest.TestCase):
+# Runs ISBN_to_LCC.py in a temporary directory that already has some books
+# in its CSV file
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.server = support.StubServer(default=support.service_response(
+                200, found=True, title='Title', author='Author',
+                lcc='QA1 .A1', how='searched'))
+        self.addCleanup(self.server.stop)
+        with open(self.temp_path('ISBNsLCC.csv'), 'wb') as csv_file:
+            csv_file.write('"ISBN","Call_Number"\n'
+                           '"0306406152","QA76.73.P98 L88"\n')
+
+    def test_known_books_are_not_searched_again(self):
+        script = os.path.join(os.path.dirname(support.TESTS_DIR),
+                              'ISBN_to_LCC.py')
+        process = subprocess.Popen([sys.executable, script, '--service',
+                                    self.server.url],
+                                   cwd=self.temp_dir, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        output = process.communicate('9780306406157\nexit\n')[0]
+        self.assertEqual(process.returncode, 0, output)
+        self.assertIn('Already classified. LC Classification: '
+                      'QA76.73.P98 L88', output)
+        self.assertEqual(self.server.requests, [])
+        with open(self.temp_path('ISBNsLCC.csv'), 'rb') as csv_file:
+            self.assertEqual(len(list(csv.reader(csv_file))), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import time
+import unittest
+
+import support
+import BookToLCC
+
+
+class ResultServer(support.StubServer):
+# Lists three works for any search. Each work's page takes a different
+# time to arrive, the first one the longest.
+
+    delays = {'111': 0.3, '222': 0.1, '333': 0.2}
+
+    def respond(self, path):
+        work = path[-3:]
+        if(work not in self.delays):
+            return (200, 'text/html', support.list_page(['111', '222',
+                                                         '333']))
+        time.sleep(self.delays[work])
+        return (200, 'text/html', support.summary_page(
+            'Book ' + work, 'Author', 'QA%s .A1' % work))
+
+
+class ConcurrentSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ResultServer()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(support.reset_book_to_lcc)
+        BookToLCC.configure_classify(base_url=self.server.url)
+        BookToLCC.configure_scheduler()
+        self.addCleanup(BookToLCC.configure_scheduler)
+
+    def search(self, accept, concurrent):
+        url, link_limit = BookToLCC.classify_search_args(('9780306406157',
+                                                          5))
+        start = time.time()
+        record = BookToLCC.search_classify_url(url, link_limit, accept,
+                                               quiet=True,
+                                               concurrent=concurrent)
+        return record, time.time() - start
+
+    def test_candidates_in_link_order(self):
+        offered = []
+        def reject(title, author, lcc):
+            offered.append(lcc)
+            return False
+        record, elapsed = self.search(reject, True)
+        self.assertEqual(record, BookToLCC.BookRecord())
+        self.assertEqual(offered, ['QA111 .A1', 'QA222 .A1', 'QA333 .A1'])
+        # Together the pages take as long as the slowest, not the sum
+        self.assertTrue(elapsed < 0.5, elapsed)
+
+    def test_same_answer_as_one_at_a_time(self):
+        accept_second = lambda title, author, lcc: title == 'Book 222'
+        concurrent, concurrent_elapsed = self.search(accept_second, True)
+        serial, serial_elapsed = self.search(accept_second, False)
+        self.assertEqual(concurrent, serial)
+        self.assertEqual(concurrent.lcc, 'QA222 .A1')
+        self.assertTrue(serial_elapsed >= 0.4, serial_elapsed)
+
+    def test_links_beyond_the_limit_are_not_fetched(self):
+        url, link_limit = BookToLCC.classify_search_args(('9780306406157',
+                                                          2))
+        BookToLCC.search_classify_url(url, link_limit,
+                                      lambda *info: False, quiet=True,
+                                      concurrent=True)
+        self.assertEqual(sorted(path[-3:] for path in self.server.requests
+                                if 'wi=' in path), ['111', '222'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+import textwrap
+import time
+import unittest
+
+import support
+import BookToLCC
+
+
+class BufferedCSVWriterTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.file_name = self.temp_path('ISBNsLCC.csv')
+
+    def open_writer(self, **settings):
+        writer = BookToLCC.BufferedCSVWriter(
+                BookToLCC.open_isbn_csv(self.file_name), **settings)
+        self.addCleanup(writer.close)
+        return writer
+
+    def read_lines(self):
+        with open(self.file_name, 'rb') as csv_file:
+            return csv_file.read().splitlines()[1:]
+
+    def test_committed_after_max_rows(self):
+        writer = self.open_writer(max_rows=3, max_delay=60)
+        BookToLCC.write_isbn_csv('9780306406157', 'QA1 .A1', writer)
+        BookToLCC.write_isbn_csv('9780131103627', 'QA2 .B2', writer)
+        self.assertEqual(self.read_lines(), [])
+        BookToLCC.write_isbn_csv('9780201633610', 'QA3 .C3', writer)
+        self.assertEqual(self.read_lines(),
+                         ['"9780306406157","QA1 .A1"',
+                          '"9780131103627","QA2 .B2"',
+                          '"9780201633610","QA3 .C3"'])
+
+    def test_copies_count_as_rows(self):
+        writer = self.open_writer(max_rows=3, max_delay=60)
+        BookToLCC.write_isbn_csv('9780306406157', 'QA1 .A1', writer, 3)
+        self.assertEqual(len(self.read_lines()), 3)
+
+    def test_committed_after_max_delay(self):
+        writer = self.open_writer(max_rows=100, max_delay=0.1)
+        BookToLCC.write_isbn_csv('9780306406157', 'QA1 .A1', writer)
+        self.assertEqual(self.read_lines(), [])
+        deadline = time.time() + 5
+        while(not self.read_lines() and time.time() < deadline):
+            time.sleep(0.02)
+        self.assertEqual(self.read_lines(), ['"9780306406157","QA1 .A1"'])
+
+    def test_committed_on_close(self):
+        writer = self.open_writer(max_rows=100, max_delay=60)
+        BookToLCC.write_isbn_csv('9780306406157', 'QA1 .A1', writer)
+        writer.close()
+        self.assertTrue(writer.csv_file.closed)
+        self.assertEqual(self.read_lines(), ['"9780306406157","QA1 .A1"'])
+        # Closing twice, or committing after the file is closed, is harmless
+        writer.close()
+        writer.commit()
+
+    def run_program(self, body):
+        # Runs body in a separate Python process that has a writer open on
+        # the test file
+        program = textwrap.dedent('''\
+            import os, sys
+            sys.path.insert(0, %r)
+            from BookToLCC import *
+            writer = BufferedCSVWriter(open_isbn_csv(%r), max_rows=100,
+                                       max_delay=60)
+            ''') % (os.path.dirname(support.TESTS_DIR), self.file_name)
+        subprocess.check_call([sys.executable, '-c',
+                               program + textwrap.dedent(body)])
+
+    def test_rows_survive_up_to_the_last_commit(self):
+        self.run_program('''\
+            write_isbn_csv('9780306406157', 'QA1 .A1', writer)
+            writer.commit()
+            write_isbn_csv('9780131103627', 'QA2 .B2', writer)
+            # A crash skips the exit handlers
+            os._exit(0)
+            ''')
+        self.assertEqual(self.read_lines(), ['"9780306406157","QA1 .A1"'])
+
+    def test_committed_at_exit(self):
+        self.run_program('''\
+            write_isbn_csv('9780306406157', 'QA1 .A1', writer)
+            ''')
+        self.assertEqual(self.read_lines(), ['"9780306406157","QA1 .A1"'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import time
+import unittest
+
+import support
+import BookToLCC
+
+
+class HTTPSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        settings = dict(BookToLCC.http_settings)
+        self.addCleanup(BookToLCC.configure_session, **settings)
+        BookToLCC.configure_session(backoff=0.01)
+        BookToLCC.configure_scheduler()
+        self.addCleanup(BookToLCC.configure_scheduler)
+
+    def test_one_session_is_shared(self):
+        session = BookToLCC.get_session()
+        self.assertTrue(BookToLCC.get_session() is session)
+        # New settings give a new session
+        BookToLCC.configure_session(pool_size=16)
+        self.assertFalse(BookToLCC.get_session() is session)
+        adapter = BookToLCC.get_session().get_adapter('http://127.0.0.1/')
+        self.assertEqual(adapter.poolmanager.connection_pool_kw['maxsize'],
+                         16)
+        self.assertRaises(ValueError, BookToLCC.configure_session, pool=16)
+
+    def test_server_errors_are_retried(self):
+        server = support.StatusServer([500, 502, 200])
+        self.addCleanup(server.stop)
+        page = BookToLCC.fetch_page(server.url + '/page')
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(len(server.requests), 3)
+
+    def test_retries_are_bounded(self):
+        BookToLCC.configure_session(retries=2)
+        server = support.StatusServer([500])
+        self.addCleanup(server.stop)
+        page = BookToLCC.fetch_page(server.url + '/page')
+        self.assertEqual(page.status_code, 500)
+        self.assertEqual(len(server.requests), 3)
+
+    def test_refused_connections_are_retried(self):
+        BookToLCC.configure_session(retries=2)
+        self.assertRaises(BookToLCC.requests.ConnectionError,
+                          BookToLCC.fetch_page, 'http://127.0.0.1:1/page')
+
+    def test_stalled_server_times_out(self):
+        BookToLCC.configure_session(read_timeout=0.1, retries=0)
+        server = support.SlowServer(1)
+        self.addCleanup(server.stop)
+        start = time.time()
+        self.assertRaises(BookToLCC.requests.RequestException,
+                          BookToLCC.fetch_page, server.url + '/page')
+        self.assertTrue(time.time() - start < 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+import support
+import BookToLCC
+
+
+class JobJournalTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.file_name = self.temp_path('ISBNsLCC.csv.journal')
+        self.journal = self.open_journal()
+
+    def open_journal(self, compact_every=10000):
+        journal = BookToLCC.open_job_journal(self.file_name, compact_every)
+        self.addCleanup(journal.close)
+        return journal
+
+    def reopen(self, compact_every=10000):
+        self.journal.close()
+        self.journal = self.open_journal(compact_every)
+
+    def read_lines(self):
+        with open(self.file_name, 'rb') as journal_file:
+            return journal_file.read().splitlines()
+
+    def test_states_are_read_back(self):
+        self.journal.record('9780306406157', 'pending')
+        self.journal.record('9780306406157', 'resolved', u'QA76.73.P98 L88')
+        self.journal.record('9780131103627', 'pending')
+        self.journal.record('9780201633610', 'missing')
+        self.reopen()
+        self.assertEqual(self.journal.state('9780306406157'),
+                         ('resolved', 'QA76.73.P98 L88'))
+        self.assertEqual(self.journal.state('9781234567897'), None)
+        self.assertTrue(self.journal.is_done('9780306406157'))
+        self.assertTrue(self.journal.is_done('9780201633610'))
+        self.assertFalse(self.journal.is_done('9780131103627'))
+        self.assertEqual(self.journal.counts(),
+                         {'resolved': 1, 'pending': 1, 'missing': 1})
+
+    def test_half_written_line_is_dropped(self):
+        self.journal.record('9780306406157', 'resolved', 'QA76.73.P98 L88')
+        self.journal.close()
+        with open(self.file_name, 'ab') as journal_file:
+            journal_file.write('resolved\t9780131103627\tQA7')
+        self.journal = self.open_journal()
+        self.assertEqual(self.journal.state('9780131103627'), None)
+        self.journal.record('9780201633610', 'missing')
+        self.assertEqual(self.read_lines(),
+                         ['resolved\t9780306406157\tQA76.73.P98 L88',
+                          'missing\t9780201633610\t'])
+
+    def test_values_stay_on_one_line(self):
+        self.journal.record('9780306406157', 'failed', 'Read\ttimed\nout')
+        self.reopen()
+        self.assertEqual(self.journal.state('9780306406157'),
+                         ('failed', 'Read timed out'))
+
+    def test_compaction_keeps_latest_states(self):
+        self.reopen(compact_every=4)
+        for ISBN in ('9780306406157', '9780131103627'):
+            self.journal.record(ISBN, 'pending')
+            self.journal.record(ISBN, 'resolved', 'QA1 .A1')
+        self.assertEqual(sorted(self.read_lines()),
+                         ['resolved\t9780131103627\tQA1 .A1',
+                          'resolved\t9780306406157\tQA1 .A1'])
+        self.journal.record('9780201633610', 'pending')
+        self.reopen()
+        self.assertEqual(self.journal.counts(),
+                         {'resolved': 2, 'pending': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import support
+import BookToLCC
+
+PACKAGE_DIR = os.path.dirname(support.TESTS_DIR)
+
+
+class LazyModuleTest(unittest.TestCase):
+
+    def test_imported_on_first_use(self):
+        module = BookToLCC.LazyModule('json')
+        self.assertEqual(module._module, None)
+        self.assertEqual(module.loads('[1]'), [1])
+        self.assertTrue(module._module is sys.modules['json'])
+
+    def test_usable_in_except_clauses(self):
+        try:
+            raise BookToLCC.requests.ConnectionError('refused')
+        except BookToLCC.requests.RequestException as error:
+            self.assertEqual(str(error), 'refused')
+
+
+class StartupTest(support.TempDirMixin, unittest.TestCase):
+# Checks in a fresh interpreter which modules are loaded at startup
+
+    def setUp(self):
+        self.make_temp_dir()
+
+    def loaded_after(self, code, input_text=''):
+        # Runs code in a new Python in the temporary directory, then
+        # returns which of the heavy modules it had loaded
+        check = ('\nimport sys\n'
+                 'print "\\n", sorted(name for name in ("requests", "bs4") '
+                 'if name in sys.modules)\n')
+        process = subprocess.Popen([sys.executable, '-c', code + check],
+                                   cwd=self.temp_dir, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        output = process.communicate(input_text)[0]
+        self.assertEqual(process.returncode, 0, output)
+        return output.splitlines()[-1].strip()
+
+    def test_import_loads_no_backend(self):
+        self.assertEqual(self.loaded_after(
+                'import sys; sys.path.insert(0, %r)\n'
+                'from BookToLCC import *\n'
+                'lcc_sort_key("QA76.73.P98 L88")\n'
+                'extract_classify_page(CachedPage("", "<p>Summary</p>", '
+                '"utf-8"))' % PACKAGE_DIR), '[]')
+
+    def test_script_up_to_its_first_prompt(self):
+        # ISBN_to_LCC.py opens its caches and indexes before the prompt
+        self.assertEqual(self.loaded_after(
+                'import sys; sys.argv = [%r]; sys.path.insert(0, %r)\n'
+                'execfile(sys.argv[0])'
+                % (os.path.join(PACKAGE_DIR, 'ISBN_to_LCC.py'), PACKAGE_DIR),
+                'exit\n'), '[]')
+
+    def test_loaded_by_the_first_fetch(self):
+        self.assertEqual(self.loaded_after(
+                'import sys; sys.path.insert(0, %r)\n'
+                'from BookToLCC import *\n'
+                'get_session()' % PACKAGE_DIR), "['requests']")
+
+
+if __name__ == '__main__':
+    unittest.main()
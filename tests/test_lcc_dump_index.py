@@ -0,0 +1,81 @@
+import unittest
+
+import support
+import BookToLCC
+
+
+class LCCDumpIndexTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.addCleanup(support.reset_book_to_lcc)
+        records = [(['9780306406157'], 'QA76.73.P98 L88', 'Programming'),
+                   (['9780131103627'], 'QA76.73.C15 K47', ''),
+                   # A later dump with the same ISBN
+                   (['9780306406157'], 'QA76.73.P98 A12', 'Programming'),
+                   (['9780201633610'], 'QA', 'Too short')]
+        self.count = BookToLCC.build_lcc_dump_index(
+                records, self.temp_path('LCCDump.idx'))
+        self.index = BookToLCC.open_lcc_dump_index(
+                self.temp_path('LCCDump.idx'))
+
+    def test_lookup(self):
+        self.assertEqual(self.count, 2)
+        self.assertEqual(self.index.lookup('0131103628'),
+                         ('', 'QA76.73.C15 K47'))
+        self.assertEqual(self.index.lookup('9780201633610'), None)
+
+    def test_repeated_ISBN_keeps_smallest_LCC(self):
+        self.assertEqual(self.index.lookup('9780306406157'),
+                         ('Programming', 'QA76.73.P98 A12'))
+
+    def test_search_without_title(self):
+        offered = []
+        def accept(title, author, lcc):
+            offered.append((title, author, lcc))
+            return True
+        self.assertEqual(BookToLCC.search_lcc_dump_index(
+                ('9780131103627', 5), accept, quiet=True),
+                ('', '', 'QA76.73.C15 K47'))
+        self.assertEqual(offered, [('', '', 'QA76.73.C15 K47')])
+
+    def test_only_offline_books_need_no_title(self):
+        record = BookToLCC.search_classify_auto('9780131103627', 5)
+        self.assertTrue(BookToLCC.validate_record(record))
+        self.assertFalse(BookToLCC.validate_info(*record))
+
+        # A page from the website still needs a title
+        page = support.summary_page('', 'Author', 'QA1 .A1').replace(
+                '<dt>Title:</dt>\n<dd></dd>\n', '')
+        server = support.StubServer(default=(200, 'text/html', page))
+        self.addCleanup(server.stop)
+        BookToLCC.configure_classify(backend='html', base_url=server.url)
+        record = BookToLCC.search_classify_auto('9781234567897', 5)
+        self.assertFalse(BookToLCC.validate_record(record))
+
+    def test_prefetch_checks_the_index_first(self):
+        server = support.StubServer(default=(200, 'text/html',
+                                             support.summary_page(
+                                                 'Website', 'Author',
+                                                 'QA1 .A1')))
+        self.addCleanup(server.stop)
+        BookToLCC.configure_classify(backend='html', base_url=server.url)
+
+        lookup = BookToLCC.prefetch_classify('9780131103627', 5)
+        self.assertTrue(lookup.ready())
+        with support.captured_output():
+            self.assertEqual(lookup.validate(BookToLCC.accept_info),
+                             ('', '', 'QA76.73.C15 K47'))
+        self.assertEqual(server.requests, [])
+
+        # The website is only searched if the match is rejected
+        lookup = BookToLCC.prefetch_classify('9780131103627', 5)
+        reject_index = lambda title, author, lcc: title == 'Website'
+        with support.captured_output():
+            self.assertEqual(lookup.validate(reject_index),
+                             ('Website', 'Author', 'QA1 .A1'))
+        self.assertEqual(len(server.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import support
+import BookToLCC
+
+
+class LCCOutlineTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.outline = BookToLCC.LCCOutline()
+        for range_text, caption in (('Q-QR', 'Science'),
+                                    ('QA', 'Mathematics'),
+                                    ('QA75.5-76.95', 'Computer science'),
+                                    ('QA76.7-76.73', 'Programming languages'),
+                                    ('QB', 'Astronomy')):
+            self.outline.add(range_text, caption)
+        self.outline.build()
+
+    def test_classify_nested_ranges(self):
+        self.assertEqual(self.outline.classify('QA76.73.P98 L88 2013'),
+                         [('Q-QR', 'Science'), ('QA', 'Mathematics'),
+                          ('QA75.5-76.95', 'Computer science'),
+                          ('QA76.7-76.73', 'Programming languages')])
+        self.assertEqual(self.outline.classify('QA76.8 .A1'),
+                         [('Q-QR', 'Science'), ('QA', 'Mathematics'),
+                          ('QA75.5-76.95', 'Computer science')])
+        self.assertEqual(self.outline.classify('QB43 .A1'),
+                         [('Q-QR', 'Science'), ('QB', 'Astronomy')])
+
+    def test_classify_outside_every_range(self):
+        self.assertEqual(self.outline.classify('PS3545 .H16'), [])
+        self.assertEqual(self.outline.classify(''), [])
+
+    def test_depths(self):
+        self.assertEqual(self.outline.depths(), [0, 1, 2, 3, 1])
+
+    def test_depths_leave_out_added_ranges(self):
+        self.outline.add('A-ZZ', 'Everything')
+        self.outline.add('QA76-76.9', 'Range of my own')
+        self.outline.build()
+        self.assertEqual(self.outline.depths(5), [0, 1, 2, 3, 1, 0, 3])
+        self.assertEqual(self.outline.depths()[:5], [1, 2, 3, 5, 2])
+
+    def test_count_subjects(self):
+        self.make_temp_dir()
+        with open(self.temp_path('isbn.csv'), 'wb') as csv_file:
+            csv_file.write('ISBN,Call_Number\n'
+                           '9780306406157,QA76.73.P98 L88\n'
+                           '9780306406157,QA76.73.P98 L88\n'
+                           '9780131103627,QB43 .A1\n'
+                           '9780201633610,PS3545 .H16\n'
+                           '9780201633611,\n')
+        counts = BookToLCC.count_subjects(
+                self.outline, [self.temp_path('isbn.csv'),
+                               self.temp_path('missing.csv')])
+        self.assertEqual([counts.get(number, 0) for number in xrange(5)],
+                         [3, 2, 2, 2, 1])
+        self.assertEqual(counts['total'], 5)
+        self.assertEqual(counts['unclassified'], 2)
+
+    def test_bundled_outline(self):
+        outline = BookToLCC.load_lcc_outline()
+        self.assertEqual(outline.classify('QA76.73.P98 L88')[-1],
+                         ('QA76.7-76.73', 'Programming languages'))
+        self.assertEqual(max(outline.depths()), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
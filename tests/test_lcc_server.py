@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import support
+import BookToLCC
+
+
+class LCCServerTest(support.TempDirMixin, unittest.TestCase):
+# Runs lcc_server.py in a temporary directory, searching a stand-in for
+# classify.oclc.org
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.classify = support.StubServer(
+            {'txt=9780306406157': (200, 'text/html', support.summary_page(
+                'Programming Python', 'Lutz, Mark', 'QA76.73.P98 L88'))})
+        self.addCleanup(self.classify.stop)
+
+        port = support.free_port()
+        script = os.path.join(os.path.dirname(support.TESTS_DIR),
+                              'lcc_server.py')
+        self.log_file = open(self.temp_path('server.log'), 'w+')
+        self.addCleanup(self.log_file.close)
+        self.process = subprocess.Popen([sys.executable, script, '--port',
+                                         str(port), '--base-url',
+                                         self.classify.url],
+                                        cwd=self.temp_dir,
+                                        stdout=self.log_file,
+                                        stderr=subprocess.STDOUT)
+        self.addCleanup(self.stop)
+        if(not support.wait_for_port(port, self.process)):
+            self.fail('lcc_server.py did not start')
+        self.url = 'http://localhost:%d' % port
+
+    def stop(self):
+        if(self.process.poll() is None):
+            self.process.terminate()
+        self.process.wait()
+
+    def get(self, path):
+        return BookToLCC.requests.get(self.url + path, timeout=10)
+
+    def test_lookups(self):
+        response = self.get('/lcc?isbn=978-0-306-40615-7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['lcc'], 'QA76.73.P98 L88')
+        response = self.get('/lcc?isbn=9780201633610')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['found'], False)
+        self.assertEqual(self.get('/lcc?isbn=123').status_code, 400)
+
+    def test_only_errors_are_logged(self):
+        self.get('/lcc?isbn=9780306406157')
+        self.get('/stats')
+        self.get('/lcc?isbn=123')
+        self.get('/nowhere')
+        self.stop()
+
+        self.log_file.seek(0)
+        lines = self.log_file.read().splitlines()
+        logged = [line.split('"')[1:] for line in lines if '"GET' in line]
+        self.assertEqual(logged, [['GET /lcc?isbn=123 HTTP/1.1', ' 400 -'],
+                                  ['GET /nowhere HTTP/1.1', ' 404 -']])
+
+
+if __name__ == '__main__':
+    unittest.main()
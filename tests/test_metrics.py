@@ -0,0 +1,147 @@
+import json
+import os
+import unittest
+
+import support
+import BookToLCC
+
+
+def counter_value(snapshot, name, **labels):
+    for counter in snapshot['counters']:
+        if(counter['name'] == name and counter['labels'] == labels):
+            return counter['value']
+    return 0
+
+def histogram_count(snapshot, name, **labels):
+    for histogram in snapshot['histograms']:
+        if(histogram['name'] == name and histogram['labels'] == labels):
+            return histogram['count']
+    return 0
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_quantiles_and_buckets(self):
+        histogram = BookToLCC.Histogram((0.1, 1.0))
+        self.assertEqual(histogram.quantile(0.5), None)
+        for seconds in (0.05, 0.05, 0.5, 2.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.75), 1.0)
+        self.assertEqual(histogram.quantile(1.0), float('inf'))
+        self.assertEqual(histogram.cumulative_counts(),
+                         [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertAlmostEqual(histogram.sum, 2.6)
+
+
+class MetricsRegistryTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = BookToLCC.MetricsRegistry()
+        self.metrics.count('searches_total', labels={'result': 'found'})
+        self.metrics.count('searches_total', 2, {'result': 'found'})
+        self.metrics.count('csv_rows_total')
+        self.metrics.observe('fetch_seconds', 0.2, {'source': 'web'})
+        with self.metrics.timer('parse_seconds'):
+            pass
+
+    def test_snapshot(self):
+        snapshot = json.loads(self.metrics.to_json())
+        self.assertEqual(counter_value(snapshot, 'searches_total',
+                                       result='found'), 3)
+        self.assertEqual(counter_value(snapshot, 'csv_rows_total'), 1)
+        self.assertEqual(histogram_count(snapshot, 'fetch_seconds',
+                                         source='web'), 1)
+        self.assertEqual(histogram_count(snapshot, 'parse_seconds'), 1)
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot()['counters'], [])
+
+    def test_prometheus_text(self):
+        lines = self.metrics.to_prometheus(prefix='').splitlines()
+        for line in ('# TYPE searches_total counter',
+                     'searches_total{result="found"} 3',
+                     '# TYPE fetch_seconds histogram',
+                     'fetch_seconds_bucket{source="web",le="0.1"} 0',
+                     'fetch_seconds_bucket{source="web",le="0.25"} 1',
+                     'fetch_seconds_bucket{source="web",le="+Inf"} 1',
+                     'fetch_seconds_sum{source="web"} 0.200000',
+                     'fetch_seconds_count{source="web"} 1'):
+            self.assertIn(line, lines)
+        self.assertIn('booktolcc_csv_rows_total 1',
+                      self.metrics.to_prometheus().splitlines())
+
+    def test_files_are_written_whole(self):
+        self.make_temp_dir()
+        BookToLCC.metrics.reset()
+        self.addCleanup(BookToLCC.metrics.reset)
+        BookToLCC.metrics.count('csv_rows_total')
+        BookToLCC.write_metrics(self.temp_path('metrics.json'),
+                                self.temp_path('metrics.prom'))
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         ['metrics.json', 'metrics.prom'])
+        with open(self.temp_path('metrics.json')) as json_file:
+            self.assertEqual(counter_value(json.load(json_file),
+                                           'csv_rows_total'), 1)
+        with open(self.temp_path('metrics.prom')) as prom_file:
+            self.assertIn('booktolcc_csv_rows_total 1\n', prom_file.read())
+
+
+class LookupMetricsTest(support.TempDirMixin, unittest.TestCase):
+# Checks that each stage of a lookup is recorded
+
+    def setUp(self):
+        self.make_temp_dir()
+        server = support.StubServer({'wi=111': (200, 'text/html',
+                                                support.summary_page(
+                                                    'Title', 'Author',
+                                                    'QA1 .A1'))},
+                                    (200, 'text/html',
+                                     support.list_page(['111'])))
+        self.addCleanup(server.stop)
+        self.addCleanup(support.reset_book_to_lcc)
+        BookToLCC.configure_classify(base_url=server.url)
+        BookToLCC.open_response_cache(self.temp_path('cache.db'))
+        BookToLCC.metrics.reset()
+        self.addCleanup(BookToLCC.metrics.reset)
+
+    def test_fetch_parse_links_and_cache(self):
+        url, link_limit = BookToLCC.classify_search_args(('9780306406157',
+                                                          5))
+        for i in xrange(2):
+            BookToLCC.search_classify_url(url, link_limit,
+                                          BookToLCC.accept_info, quiet=True)
+        snapshot = BookToLCC.metrics.snapshot()
+        self.assertEqual(counter_value(snapshot, 'searches_total',
+                                       result='found'), 2)
+        self.assertEqual(counter_value(snapshot, 'candidate_links_total'), 2)
+        self.assertEqual(histogram_count(snapshot, 'candidate_link_seconds'),
+                         2)
+        self.assertTrue(histogram_count(snapshot, 'fetch_seconds',
+                                        source='web') > 0)
+        self.assertTrue(histogram_count(snapshot, 'fetch_seconds',
+                                        source='cache') > 0)
+        self.assertTrue(histogram_count(snapshot, 'parse_seconds') > 0)
+        self.assertTrue(counter_value(snapshot, 'cache_hits_total') > 0)
+        self.assertTrue(counter_value(snapshot, 'cache_misses_total') > 0)
+
+    def test_validation_and_csv_write(self):
+        BookToLCC.raw_input = lambda prompt: ''
+        self.addCleanup(delattr, BookToLCC, 'raw_input')
+        with support.captured_output():
+            self.assertTrue(BookToLCC.user_validation('Title', 'Author',
+                                                      'QA1 .A1'))
+        csv_file = BookToLCC.open_isbn_csv(self.temp_path('ISBNsLCC.csv'))
+        BookToLCC.write_isbn_csv('9780306406157', 'QA1 .A1', csv_file, 2)
+        csv_file.close()
+
+        snapshot = BookToLCC.metrics.snapshot()
+        self.assertEqual(counter_value(snapshot, 'validations_total',
+                                       answer='yes'), 1)
+        self.assertEqual(histogram_count(snapshot,
+                                         'validation_wait_seconds'), 1)
+        self.assertEqual(counter_value(snapshot, 'csv_rows_total'), 2)
+        self.assertEqual(histogram_count(snapshot, 'csv_write_seconds'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import time
+import unittest
+
+import support
+import BookToLCC
+
+
+class NegativeCacheTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.cache = BookToLCC.NegativeCache(self.temp_path('misses.db'), 60)
+        self.addCleanup(self.cache.close)
+
+    def test_add_and_remove(self):
+        self.assertFalse(self.cache.is_miss('isbn:9780306406157'))
+        self.cache.add('isbn:9780306406157')
+        self.assertTrue(self.cache.is_miss('isbn:9780306406157'))
+        self.cache.remove('isbn:9780306406157')
+        self.assertFalse(self.cache.is_miss('isbn:9780306406157'))
+
+    def test_refresh_mode_searches_misses_again(self):
+        self.cache.add('isbn:9780306406157')
+        self.cache.refresh = True
+        self.assertFalse(self.cache.is_miss('isbn:9780306406157'))
+        self.assertEqual(self.cache.keys(), ['isbn:9780306406157'])
+
+    def test_expired_misses(self):
+        self.cache.ttl = -1
+        self.cache.add('isbn:9780306406157')
+        self.assertFalse(self.cache.is_miss('isbn:9780306406157'))
+        self.assertEqual(self.cache.keys(), [])
+
+    def test_keys_by_prefix_oldest_first(self):
+        self.cache.add('isbn:2')
+        time.sleep(0.01)
+        self.cache.add('title:a|b')
+        time.sleep(0.01)
+        self.cache.add('isbn:1')
+        self.assertEqual(self.cache.keys('isbn:'), ['isbn:2', 'isbn:1'])
+
+    def test_misses_survive_reopening(self):
+        self.cache.add('isbn:9780306406157')
+        self.cache.close()
+        self.cache = BookToLCC.NegativeCache(self.temp_path('misses.db'), 60)
+        self.assertTrue(self.cache.is_miss('isbn:9780306406157'))
+
+
+class MissedSearchTest(support.TempDirMixin, unittest.TestCase):
+# A search that finds nothing must reach the website again when it is
+# retried, not be answered from the response cache
+
+    ISBN = '9780306406157'
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.server = support.StubServer()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(support.reset_book_to_lcc)
+        BookToLCC.configure_classify(backend='html', base_url=self.server.url)
+        BookToLCC.open_response_cache(self.temp_path('cache.db'))
+        self.misses = BookToLCC.open_negative_cache(
+                self.temp_path('misses.db'))
+
+    def search(self):
+        return BookToLCC.search_classify_auto(self.ISBN, 5)
+
+    def test_known_miss_is_not_searched(self):
+        self.assertEqual(self.search(), BookToLCC.BookRecord())
+        requests = len(self.server.requests)
+        self.assertTrue(requests > 0)
+        self.assertEqual(self.search(), BookToLCC.BookRecord())
+        self.assertEqual(len(self.server.requests), requests)
+
+    def test_refreshed_miss_reaches_website(self):
+        self.search()
+        requests = len(self.server.requests)
+        self.misses.refresh = True
+        self.search()
+        self.assertTrue(len(self.server.requests) > requests)
+
+    def test_refreshed_miss_is_found(self):
+        self.search()
+        self.server.default = (200, 'text/html',
+                               support.summary_page('Title', 'Author',
+                                                    'QA76.73.P98 L88'))
+        self.misses.refresh = True
+        self.assertEqual(self.search(),
+                         ('Title', 'Author', 'QA76.73.P98 L88'))
+        self.misses.refresh = False
+        self.assertFalse(self.misses.is_miss(
+                BookToLCC.search_miss_key((self.ISBN, 5))))
+
+    def test_expired_miss_reaches_website(self):
+        self.misses.ttl = -1
+        self.search()
+        requests = len(self.server.requests)
+        self.search()
+        self.assertTrue(len(self.server.requests) > requests)
+
+    def test_prefetched_miss_reaches_website(self):
+        BookToLCC.prefetch_classify(self.ISBN, 5).validate(
+                BookToLCC.accept_info)
+        requests = len(self.server.requests)
+        self.misses.refresh = True
+        BookToLCC.prefetch_classify(self.ISBN, 5).validate(
+                BookToLCC.accept_info)
+        self.assertTrue(len(self.server.requests) > requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
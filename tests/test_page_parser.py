@@ -0,0 +1,77 @@
+import os
+import unittest
+import warnings
+
+import support
+import BookToLCC
+
+try:
+    import bs4
+except ImportError:
+    bs4 = None
+import bs4_extractors
+
+HTML_DIR = os.path.join(support.FIXTURES_DIR, 'classify_html')
+
+
+def read_page(name):
+    with open(os.path.join(HTML_DIR, name), 'rb') as page_file:
+        return BookToLCC.CachedPage(name, page_file.read(), 'utf-8')
+
+def old_info_and_links(page):
+# Reads a page with the BeautifulSoup extractors, which warn that no
+# parser was named
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return (bs4_extractors.get_classify_info(page),
+                bs4_extractors.get_classify_search_links(page))
+
+
+@unittest.skipIf(bs4 is None, 'bs4 is not installed')
+class ParserParityTest(unittest.TestCase):
+# Checks ClassifyPageParser against the BeautifulSoup code it replaced,
+# on the pages in fixtures/classify_html
+
+    def assertSameAsBeautifulSoup(self, name):
+        page = read_page(name)
+        record = BookToLCC.extract_classify_page(page)
+        info, links = old_info_and_links(page)
+        self.assertEqual((record['title'], record['author'], record['lcc']),
+                         info, name)
+        self.assertEqual(record['links'], links, name)
+        return record
+
+    def test_summary(self):
+        record = self.assertSameAsBeautifulSoup('summary.html')
+        self.assertEqual((record['title'], record['author'], record['lcc'],
+                          record['ddc']),
+                         (u'Programming Python', u'Lutz, Mark',
+                          u'QA76.73.P98 L88 2013', u'005.133'))
+
+    def test_search_results(self):
+        record = self.assertSameAsBeautifulSoup('search_results.html')
+        self.assertEqual(record['lcc'], '')
+        # The link to the next page of results is not a result
+        self.assertEqual(record['links'],
+                         ['/classify2/ClassifyDemo?wi=111',
+                          '/classify2/ClassifyDemo?wi=222',
+                          '/classify2/ClassifyDemo?wi=333'])
+
+    def test_no_results(self):
+        record = self.assertSameAsBeautifulSoup('no_results.html')
+        self.assertEqual(record['links'], [])
+
+    def test_field_on_the_last_line(self):
+        # The old code skipped the page's last line, and failed on an LCC
+        # found there; the parser keeps it
+        page = read_page('lcc_on_last_line.html')
+        record = BookToLCC.extract_classify_page(page)
+        self.assertRaises(IndexError, old_info_and_links, page)
+        self.assertEqual((record['title'], record['author'], record['lcc']),
+                         (u'Caf\xe9 Society', u'Smith, J.',
+                          u'PS3545.H16 C34'))
+
+
+if __name__ == '__main__':
+    unittest.main()
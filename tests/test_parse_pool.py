@@ -0,0 +1,105 @@
+import json
+import os
+import unittest
+
+import support
+import BookToLCC
+
+HTML_DIR = os.path.join(support.FIXTURES_DIR, 'classify_html')
+XML_DIR = os.path.join(support.FIXTURES_DIR, 'classify_xml')
+
+
+def read_fixture(directory, name):
+    with open(os.path.join(directory, name), 'rb') as page_file:
+        return BookToLCC.CachedPage(name, page_file.read(), 'utf-8')
+
+
+@unittest.skipIf(os.name == 'nt', 'no parse pool on Windows')
+class ParsePoolTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        BookToLCC.open_parse_pool(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        BookToLCC.close_parse_pool()
+
+    def setUp(self):
+        # Count the pages handed to the pool
+        pool = BookToLCC.parse_pool
+        apply = pool.apply
+        self.parsed = []
+        def counting_apply(function, args):
+            self.parsed.append(args[2])
+            return apply(function, args)
+        pool.apply = counting_apply
+        self.addCleanup(delattr, pool, 'apply')
+
+    def parse_here(self, page, parser_class):
+        pool = BookToLCC.parse_pool
+        BookToLCC.parse_pool = None
+        try:
+            return BookToLCC.parse_classify_page(page, parser_class)
+        finally:
+            BookToLCC.parse_pool = pool
+
+    def assertSameRecord(self, page, parser_class):
+        record = BookToLCC.parse_classify_page(page, parser_class)
+        self.assertEqual(record, self.parse_here(page, parser_class))
+        self.assertEqual(self.parsed[-1], parser_class.__name__)
+        return record
+
+    def test_same_records_as_parsing_here(self):
+        for name in ('summary.html', 'search_results.html',
+                     'lcc_on_last_line.html'):
+            self.assertSameRecord(read_fixture(HTML_DIR, name),
+                                  BookToLCC.ClassifyPageParser)
+        for name in ('isbn=9780306406157.xml', 'wi=111.xml'):
+            self.assertSameRecord(read_fixture(XML_DIR, name),
+                                  BookToLCC.ClassifyXMLParser)
+        page = BookToLCC.CachedPage('', json.dumps(
+                {'title': 'Title', 'author': 'Author', 'lcc': 'QA1 .A1'}),
+                None)
+        record = self.assertSameRecord(page, BookToLCC.ClassifyServiceParser)
+        self.assertEqual(record['lcc'], 'QA1 .A1')
+        self.assertEqual(len(self.parsed), 6)
+
+    def test_fetched_pages_are_parsed_whole_in_the_pool(self):
+        server = support.StubServer(default=(200, 'text/html',
+                                             support.summary_page(
+                                                 'Title', 'Author',
+                                                 'QA1 .A1')))
+        self.addCleanup(server.stop)
+        record = BookToLCC.fetch_classify_record(server.url + '/page',
+                                                 parser_class=
+                                                 BookToLCC.ClassifyPageParser)
+        self.assertEqual((record['title'], record['author'], record['lcc']),
+                         ('Title', 'Author', 'QA1 .A1'))
+        self.assertFalse(record['truncated'])
+        self.assertEqual(self.parsed, ['ClassifyPageParser'])
+
+    def test_records_pickle(self):
+        # Records found through the pool may be handed between processes
+        import pickle
+        record = BookToLCC.BookRecord('Title', 'Author', 'QA1 .A1',
+                                      offline=True)
+        copy = pickle.loads(pickle.dumps(record, 2))
+        self.assertEqual(copy, record)
+        self.assertTrue(copy.offline)
+
+
+class ClosedParsePoolTest(unittest.TestCase):
+
+    def test_parsed_here_once_closed(self):
+        BookToLCC.open_parse_pool(1)
+        BookToLCC.close_parse_pool()
+        self.assertEqual(BookToLCC.parse_pool, None)
+        record = BookToLCC.parse_classify_page(
+                read_fixture(HTML_DIR, 'summary.html'),
+                BookToLCC.ClassifyPageParser)
+        self.assertEqual(record['lcc'], u'QA76.73.P98 L88 2013')
+
+
+if __name__ == '__main__':
+    unittest.main()
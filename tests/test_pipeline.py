@@ -0,0 +1,88 @@
+import csv
+import os
+import subprocess
+import sys
+import unittest
+
+import support
+import BookToLCC
+import requests
+
+
+class PrefetchedLookupTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.server = support.StubServer()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(support.reset_book_to_lcc)
+        BookToLCC.configure_classify(backend='service',
+                                     base_url=self.server.url)
+        self.misses = BookToLCC.open_negative_cache(
+                self.temp_path('misses.db'))
+
+    def test_errors_are_raised_not_missed(self):
+        self.server.default = support.service_response(
+                400, error='not a valid ISBN')
+        lookup = BookToLCC.prefetch_classify('9780306406157', 5)
+        self.assertRaises(requests.RequestException, lookup.validate,
+                          BookToLCC.accept_info)
+        self.assertFalse(self.misses.is_miss('isbn:9780306406157'))
+
+    def test_not_found(self):
+        self.server.default = support.service_response(
+                404, found=False, title='', author='', lcc='', how='searched')
+        lookup = BookToLCC.prefetch_classify('9780306406157', 5)
+        self.assertEqual(lookup.validate(BookToLCC.accept_info),
+                         BookToLCC.BookRecord())
+        self.assertTrue(self.misses.is_miss('isbn:9780306406157'))
+
+
+class ISBNPipelineTest(support.TempDirMixin, unittest.TestCase):
+# Runs ISBN_to_LCC.py --pipeline in a temporary directory, typing the
+# given lines at its prompts
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.server = support.StubServer()
+        self.addCleanup(self.server.stop)
+
+    def run_script(self, lines):
+        script = os.path.join(os.path.dirname(support.TESTS_DIR),
+                              'ISBN_to_LCC.py')
+        process = subprocess.Popen([sys.executable, script, '--pipeline',
+                                    '--service', self.server.url],
+                                   cwd=self.temp_dir, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        output = process.communicate(''.join(line + '\n'
+                                             for line in lines))[0]
+        self.assertEqual(process.returncode, 0, output)
+        return output
+
+    def read_rows(self):
+        with open(self.temp_path('ISBNsLCC.csv'), 'rb') as csv_file:
+            return list(csv.reader(csv_file))[1:]
+
+    def test_same_ISBN_scanned_twice_is_saved_once(self):
+        self.server.default = support.service_response(
+                200, found=True, title='Title', author='Author',
+                lcc='QA76.73.P98 L88', how='searched')
+        # Both scans are queued before the first is checked
+        output = self.run_script(['9780306406157', '9780306406157', '',
+                                  'exit'])
+        self.assertEqual(self.read_rows(),
+                         [['9780306406157', 'QA76.73.P98 L88']])
+        self.assertEqual(output.count('Is this correct?'), 1)
+        self.assertIn('Already classified', output)
+
+    def test_website_errors_are_reported(self):
+        self.server.default = support.service_response(
+                400, error='not a valid ISBN')
+        output = self.run_script(['9780306406157', 'exit'])
+        self.assertIn('Unable to access website', output)
+        self.assertNotIn('did not return any results', output)
+        self.assertEqual(self.read_rows(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+import support
+import BookToLCC
+
+
+class Allocated(object):
+    pass
+
+def busy_loop(seconds):
+    end = time.time() + seconds
+    while(time.time() < end):
+        pass
+
+
+class SamplingProfilerTest(support.TempDirMixin, unittest.TestCase):
+
+    def test_collapsed_stacks(self):
+        self.make_temp_dir()
+        profiler = BookToLCC.SamplingProfiler(interval=0.001)
+        profiler.start()
+        thread = threading.Thread(target=busy_loop, args=(0.2,),
+                                  name='busy-thread')
+        thread.start()
+        thread.join()
+        profiler.stop()
+        profiler.write_collapsed(self.temp_path('profile.folded'))
+
+        with open(self.temp_path('profile.folded')) as profile_file:
+            lines = profile_file.read().splitlines()
+        stacks = [line.rsplit(' ', 1) for line in lines]
+        counts = [int(count) for stack, count in stacks]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        busy = [int(count) for stack, count in stacks
+                if stack.startswith('busy-thread;') and
+                stack.endswith(';test_profiler.py:busy_loop')]
+        self.assertTrue(sum(busy) > 10, lines)
+        # The profiler does not sample itself
+        self.assertFalse([stack for stack, count in stacks
+                          if 'BookToLCC.py:_run' in stack])
+
+
+class AllocationTrackerTest(unittest.TestCase):
+
+    def test_report_names_what_grew(self):
+        tracker = BookToLCC.AllocationTracker()
+        tracker.start()
+        kept = [Allocated() for i in xrange(20000)]
+        report = tracker.report(5)
+        if(tracker.tracemalloc is not None):
+            self.assertIn('test_profiler.py', report)
+        else:
+            lines = report.splitlines()
+            self.assertIn('Top 5 object types by growth:', lines)
+            self.assertTrue(lines[3].split()[:2] == ['Allocated', '+20000'],
+                            report)
+        self.assertEqual(len(kept), 20000)
+
+
+class ProfileSessionTest(support.TempDirMixin, unittest.TestCase):
+
+    def test_files_written_on_exit(self):
+        self.make_temp_dir()
+        script = os.path.join(os.path.dirname(support.TESTS_DIR),
+                              'ISBN_to_LCC.py')
+        process = subprocess.Popen([sys.executable, script, '--profile'],
+                                   cwd=self.temp_dir, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        output = process.communicate('exit\n')[0]
+        self.assertEqual(process.returncode, 0, output)
+
+        with open(self.temp_path('LookupProfile.folded')) as profile_file:
+            self.assertIn('MainThread;ISBN_to_LCC.py:<module>',
+                          profile_file.read())
+        with open(self.temp_path('LookupAllocations.txt')) as report_file:
+            self.assertIn('Top 25 ', report_file.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
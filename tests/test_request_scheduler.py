@@ -0,0 +1,98 @@
+import time
+import unittest
+
+import support
+import BookToLCC
+
+
+class ScheduledGetTest(unittest.TestCase):
+
+    def setUp(self):
+        settings = dict(BookToLCC.http_settings)
+        BookToLCC.configure_session(retries=2, backoff=0.2)
+        self.addCleanup(BookToLCC.configure_session,
+                        retries=settings['retries'],
+                        backoff=settings['backoff'])
+        # A new scheduler for each test
+        BookToLCC.configure_scheduler()
+        self.addCleanup(BookToLCC.configure_scheduler)
+
+    def get(self, statuses):
+        server = support.StatusServer(statuses)
+        self.addCleanup(server.stop)
+        start = time.time()
+        response = BookToLCC.scheduled_get(server.url + '/page')
+        return response, time.time() - start, server
+
+    def test_busy_without_retry_after_waits_before_retrying(self):
+        response, elapsed, server = self.get([503, 200])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(server.requests), 2)
+        self.assertTrue(elapsed >= 0.2, elapsed)
+
+    def test_backoff_doubles(self):
+        response, elapsed, server = self.get([429, 429, 200])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(server.requests), 3)
+        self.assertTrue(elapsed >= 0.6, elapsed)
+
+    def test_gives_up_after_the_retries(self):
+        response, elapsed, server = self.get([503])
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(server.requests), 3)
+
+    def test_slot_is_released_on_errors(self):
+        scheduler = BookToLCC.get_scheduler()
+        self.assertRaises(BookToLCC.requests.RequestException,
+                          BookToLCC.scheduled_get, 'http://127.0.0.1:1/')
+        self.assertEqual(scheduler.stats()['active'], 0)
+
+        # Also for errors that are not from requests
+        session = BookToLCC.get_session()
+        def interrupted(*args, **kwargs):
+            raise KeyboardInterrupt
+        session.get = interrupted
+        self.addCleanup(delattr, session, 'get')
+        self.assertRaises(KeyboardInterrupt, BookToLCC.scheduled_get,
+                          'http://127.0.0.1:1/')
+        self.assertEqual(scheduler.stats()['active'], 0)
+
+
+class ConcurrencyTest(unittest.TestCase):
+
+    def setUp(self):
+        BookToLCC.configure_scheduler()
+        self.addCleanup(BookToLCC.configure_scheduler)
+
+    def test_starts_at_the_host_fetch_limit(self):
+        self.assertEqual(BookToLCC.get_scheduler().stats()['concurrency'],
+                         BookToLCC.host_fetch_limit)
+        BookToLCC.configure_scheduler(initial_concurrency=2)
+        self.assertEqual(BookToLCC.get_scheduler().stats()['concurrency'], 2)
+
+    def test_links_are_fetched_together(self):
+        server = support.SlowServer(0.3)
+        self.addCleanup(server.stop)
+        urls = [server.url + '/page%d' % n
+                for n in xrange(BookToLCC.host_fetch_limit)]
+        start = time.time()
+        for fetch in BookToLCC.fetch_pages(urls):
+            self.assertEqual(fetch.result().status_code, 200)
+        elapsed = time.time() - start
+        self.assertTrue(elapsed < 0.6, elapsed)
+
+    def test_streamed_response_holds_its_slot(self):
+        server = support.StubServer()
+        self.addCleanup(server.stop)
+        scheduler = BookToLCC.get_scheduler()
+        response = BookToLCC.scheduled_get(server.url + '/page', stream=True)
+        self.assertEqual(scheduler.stats()['active'], 1)
+        response.close()
+        self.assertEqual(scheduler.stats()['active'], 0)
+        # Closing it again does not give back another slot
+        response.close()
+        self.assertEqual(scheduler.stats()['active'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
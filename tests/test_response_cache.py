@@ -0,0 +1,107 @@
+import os
+import time
+import unittest
+
+import support
+import BookToLCC
+
+
+def page_content(size):
+    # Random bytes barely shrink when compressed, so each page takes about
+    # size bytes of the cache
+    return os.urandom(size)
+
+
+class ResponseCacheTest(support.TempDirMixin, unittest.TestCase):
+
+    url = 'http://classify.oclc.org/classify2/ClassifyDemo?wi=111'
+
+    def setUp(self):
+        self.make_temp_dir()
+
+    def open_cache(self, ttl=3600, max_bytes=1024 * 1024):
+        cache = BookToLCC.ResponseCache(self.temp_path('cache.db'), ttl,
+                                        max_bytes)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_hit(self):
+        cache = self.open_cache()
+        self.assertEqual(cache.get(self.url), None)
+        cache.put(self.url, '<html>Page</html>', 'utf-8')
+        page = cache.get(self.url)
+        self.assertEqual(page.content, '<html>Page</html>')
+        self.assertEqual(page.text, u'<html>Page</html>')
+        self.assertTrue(page.from_cache)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_same_page_under_another_spelling_of_the_url(self):
+        cache = self.open_cache()
+        cache.put('http://classify.oclc.org/classify2/ClassifyDemo?'
+                  'wi=111&editions=true', 'Page', 'utf-8')
+        page = cache.get('HTTP://Classify.OCLC.org/classify2/'
+                         'ClassifyDemo?editions=true&wi=111')
+        self.assertEqual(page.content, 'Page')
+
+    def test_kept_when_reopened(self):
+        cache = self.open_cache()
+        cache.put(self.url, 'Page', 'utf-8')
+        cache.close()
+        cache = self.open_cache()
+        self.assertEqual(cache.get(self.url).content, 'Page')
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_expiry(self):
+        cache = self.open_cache(ttl=0.05)
+        cache.put(self.url, 'Page', 'utf-8')
+        cache.put(self.url + '2', 'Page', 'utf-8', ttl=3600)
+        self.assertNotEqual(cache.get(self.url), None)
+        time.sleep(0.1)
+        self.assertEqual(cache.get(self.url), None)
+        self.assertNotEqual(cache.get(self.url + '2'), None)
+
+    def test_least_recently_used_are_evicted(self):
+        cache = self.open_cache(max_bytes=3500)
+        for n in xrange(3):
+            cache.put(self.url + str(n), page_content(1000), 'utf-8')
+            time.sleep(0.01)
+        # Reading the first page makes the second the least recently used
+        cache.get(self.url + '0')
+        time.sleep(0.01)
+        cache.put(self.url + '3', page_content(1000), 'utf-8')
+
+        self.assertNotEqual(cache.get(self.url + '0'), None)
+        self.assertEqual(cache.get(self.url + '1'), None)
+        self.assertNotEqual(cache.get(self.url + '2'), None)
+        self.assertNotEqual(cache.get(self.url + '3'), None)
+        self.assertTrue(cache.stats()['bytes'] <= 3500)
+
+    def test_expired_are_evicted_first(self):
+        cache = self.open_cache(max_bytes=2500)
+        cache.put(self.url + '0', page_content(1000), 'utf-8')
+        time.sleep(0.01)
+        cache.put(self.url + '1', page_content(1000), 'utf-8', ttl=0.01)
+        time.sleep(0.02)
+        cache.put(self.url + '2', page_content(1000), 'utf-8')
+        self.assertNotEqual(cache.get(self.url + '0'), None)
+        self.assertEqual(cache.stats()['entries'], 2)
+
+    def test_partial_pages(self):
+        cache = self.open_cache()
+        cache.put(self.url, '<html>Start', 'utf-8', partial=True)
+        self.assertEqual(cache.get(self.url), None)
+        page = cache.get(self.url, allow_partial=True)
+        self.assertTrue(page.partial)
+        self.assertEqual(page.content, '<html>Start')
+
+    def test_remove(self):
+        cache = self.open_cache()
+        cache.put(self.url, 'Page', 'utf-8')
+        cache.remove([self.url, self.url + '2'])
+        self.assertEqual(cache.get(self.url), None)
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
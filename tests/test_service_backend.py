@@ -0,0 +1,94 @@
+import unittest
+
+import support
+import BookToLCC
+import requests
+
+
+class ServiceBackendTest(support.TempDirMixin, unittest.TestCase):
+
+    ISBN = '9780306406157'
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.server = support.StubServer()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(support.reset_book_to_lcc)
+        # The session would retry 5xx responses with a backoff
+        BookToLCC.configure_session(retries=0)
+        self.addCleanup(BookToLCC.configure_session,
+                        retries=BookToLCC.http_settings['retries'])
+        BookToLCC.configure_classify(backend='service',
+                                     base_url=self.server.url)
+        self.cache = BookToLCC.open_response_cache(self.temp_path('cache.db'))
+        self.misses = BookToLCC.open_negative_cache(
+                self.temp_path('misses.db'))
+
+    def test_found(self):
+        self.server.default = support.service_response(
+                200, found=True, title='Title', author='Author',
+                lcc='QA76.73.P98 L88', how='searched')
+        self.assertEqual(BookToLCC.search_classify_auto(self.ISBN, 5),
+                         ('Title', 'Author', 'QA76.73.P98 L88'))
+
+    def test_not_found_is_a_miss(self):
+        self.server.default = support.service_response(
+                404, found=False, title='', author='', lcc='', how='searched')
+        self.assertEqual(BookToLCC.search_classify_auto(self.ISBN, 5),
+                         BookToLCC.BookRecord())
+        self.assertTrue(self.misses.is_miss('isbn:' + self.ISBN))
+
+    def test_service_errors_are_raised(self):
+        for response in (support.service_response(
+                             502, error='classify.oclc.org could not be '
+                             'reached'),
+                         support.service_response(
+                             400, error='not a valid ISBN'),
+                         support.service_response(200, error='unexpected'),
+                         (500, 'text/html', '<html>Server error</html>')):
+            self.server.default = response
+            self.assertRaises(requests.RequestException,
+                              BookToLCC.search_classify_auto, self.ISBN, 5)
+            self.assertFalse(self.misses.is_miss('isbn:' + self.ISBN))
+
+    def test_errors_are_not_misses_when_not_raised(self):
+        self.server.default = support.service_response(
+                400, error='not a valid ISBN')
+        with support.captured_output():
+            record = BookToLCC.search_classify(self.ISBN, 5)
+        self.assertEqual(record, BookToLCC.BookRecord())
+        self.assertFalse(self.misses.is_miss('isbn:' + self.ISBN))
+
+    def test_responses_are_not_cached(self):
+        self.server.default = support.service_response(
+                200, found=True, title='Title', author='Author',
+                lcc='QA76.73.P98 L88', how='searched')
+        BookToLCC.search_classify_auto(self.ISBN, 5)
+        BookToLCC.search_classify_auto(self.ISBN, 5)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+class ServiceArgumentTest(unittest.TestCase):
+
+    def test_url(self):
+        self.assertEqual(BookToLCC.service_url_argument(
+                ['ISBN_to_LCC.py', '--service', 'http://host:8090',
+                 '--pipeline']), 'http://host:8090')
+
+    def test_not_given(self):
+        self.assertEqual(BookToLCC.service_url_argument(
+                ['ISBN_to_LCC.py', '--pipeline']), None)
+
+    def test_missing_url(self):
+        for argv in (['ISBN_to_LCC.py', '--service'],
+                     ['ISBN_to_LCC.py', '--service', '--pipeline'],
+                     ['ISBN_to_LCC.py', '--service', 'host:8090']):
+            with support.captured_output() as output:
+                self.assertRaises(SystemExit, BookToLCC.service_url_argument,
+                                  argv)
+            self.assertTrue('Usage' in output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import csv
+import random
+import unittest
+
+import support
+import BookToLCC
+
+
+class LCCSortKeyTest(unittest.TestCase):
+
+    def assertShelfOrder(self, lccs):
+        shuffled = list(reversed(lccs))
+        self.assertEqual(sorted(shuffled, key=BookToLCC.lcc_sort_key), lccs)
+
+    def test_class_numbers_compare_as_numbers(self):
+        self.assertShelfOrder(['QA9 .A1', 'QA76 .A1', 'QA76.73 .A1',
+                               'QA76.8 .A1', 'QA101 .A1'])
+
+    def test_letters_before_numbers(self):
+        self.assertShelfOrder(['Q1 .A1', 'Q350 .A1', 'QA1 .A1', 'QB1 .A1',
+                               'R1 .A1'])
+
+    def test_cutters_compare_as_decimals(self):
+        self.assertShelfOrder(['QA76.73.P98 L2', 'QA76.73.P98 L88',
+                               'QA76.73.P98 L9', 'QA76.73.P98 M1'])
+
+    def test_volumes_and_dates(self):
+        self.assertShelfOrder(['QA76.73.P98 L88 2001',
+                               'QA76.73.P98 L88 2013',
+                               'QA76.73.P98 L88 2013 v.2',
+                               'QA76.73.P98 L88 2013 v.10'])
+
+    def test_unreadable_and_blank_sort_last(self):
+        self.assertShelfOrder(['QA76 .A1', 'ZA4080 .B2', 'not an LCC', ''])
+
+    def test_keys_have_one_width(self):
+        widths = set(len(BookToLCC.lcc_sort_key(lcc)) for lcc in
+                     ('Q1', 'QA76.73.P98 L88 2013 v.10', 'not an LCC', '',
+                      u'QA76.73.P98 L88'))
+        self.assertEqual(widths, set([BookToLCC.lcc_sort_key_width]))
+
+    def test_spacing_and_case_do_not_matter(self):
+        self.assertEqual(BookToLCC.lcc_sort_key('qa76.73 .p98 l88'),
+                         BookToLCC.lcc_sort_key('QA76.73.P98 L88'))
+
+    def test_lcc_sort_keys(self):
+        lccs = ['QA76.8 .A1', 'QA9 .B2', 'QA76.8 .A1']
+        self.assertEqual(BookToLCC.lcc_sort_keys(lccs),
+                         [BookToLCC.lcc_sort_key(lcc) for lcc in lccs])
+
+    def test_lcc_sort_keys_of_a_mixed_column(self):
+        lccs = ['QA76.73.P98 L88 2013', 'qa76.73 .p98 l88', 'not an LCC',
+                '', '   ', u'QA76.73.P98 L88 v.\xe9', u'caf\xe9',
+                'QA76.73.A1 B2 C3 D4 E5 2001 v.10', 'QA76.1234567891 .A12',
+                'KF4550.A2 1925 a rest longer than the key has room for']
+        column = [random.choice(lccs) for i in xrange(1000)] + lccs
+        self.assertEqual(BookToLCC.lcc_sort_keys(column),
+                         [BookToLCC.lcc_sort_key(lcc) for lcc in column])
+
+    def test_range_bounds(self):
+        start, end = BookToLCC.lcc_range_bounds('QA75.5-76.95')
+        for lcc, inside in (('QA75.5 .A1', True), ('QA76.951 .A1', True),
+                            ('QA75.4 .A1', False), ('QA77 .A1', False)):
+            key = BookToLCC.lcc_sort_key(lcc)
+            self.assertEqual(start <= key < end, inside, lcc)
+        self.assertRaises(ValueError, BookToLCC.lcc_range_bounds, '76-QA')
+
+
+class ExternalSortTest(unittest.TestCase):
+
+    def test_fixed_width_records_in_several_runs(self):
+        records = ['%06d' % random.randrange(1000000) for i in xrange(1000)]
+        self.assertEqual(list(BookToLCC.external_sort(records, 64)),
+                         sorted(records))
+
+    def test_records_of_any_width(self):
+        records = [str(random.randrange(10 ** random.randrange(1, 9)))
+                   + '\n,"x' * random.randrange(3) for i in xrange(500)]
+        self.assertEqual(list(BookToLCC.external_sort(records, 50,
+                                                      fixed_width=False)),
+                         sorted(records))
+
+    def test_fewer_records_than_a_chunk(self):
+        self.assertEqual(list(BookToLCC.external_sort(['b', 'a'], 10)),
+                         ['a', 'b'])
+        self.assertEqual(list(BookToLCC.external_sort([], 10)), [])
+
+
+class ShelfListTest(support.TempDirMixin, unittest.TestCase):
+
+    def test_rows_in_shelf_order(self):
+        self.make_temp_dir()
+        rows = [['ISBN', 'Call_Number'],
+                ['9780306406157', 'QA76.8 .A1'],
+                ['9780131103627', 'QA9 .B2'],
+                [],
+                ['9780201633610', 'QA76.8 .A1'],
+                ['9781234567897', '']]
+        with open(self.temp_path('isbn.csv'), 'wb') as csv_file:
+            csv.writer(csv_file).writerows(rows)
+        count = BookToLCC.write_shelf_list(self.temp_path('isbn.csv'),
+                                           self.temp_path('shelf.csv'),
+                                           chunk_size=2)
+        self.assertEqual(count, 4)
+        with open(self.temp_path('shelf.csv'), 'rb') as csv_file:
+            self.assertEqual(list(csv.reader(csv_file)),
+                             [rows[0], rows[2], rows[1], rows[4], rows[5]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import support
+import BookToLCC
+
+
+def start_standin(options, log_file):
+# Starts classify_standin_server.py with the given options, writing what
+# it prints to log_file. Returns the process and the server's URL. The
+# process gets none of the test's sockets, so a stub server stopped by the
+# test stops answering.
+
+    port = support.free_port()
+    script = os.path.join(os.path.dirname(support.TESTS_DIR),
+                          'classify_standin_server.py')
+    process = subprocess.Popen([sys.executable, script, '--port', str(port)]
+                               + options, stdout=log_file,
+                               stderr=subprocess.STDOUT, close_fds=True)
+    if(not support.wait_for_port(port, process)):
+        stop_standin(process)
+        raise RuntimeError('classify_standin_server.py did not start')
+    return process, 'http://localhost:%d' % port
+
+def stop_standin(process):
+    if(process.poll() is None):
+        process.terminate()
+    process.wait()
+
+
+class StandinServerTest(unittest.TestCase):
+# Runs classify_standin_server.py on the recordings in
+# fixtures/classify_xml, and searches it through the XML backend
+
+    @classmethod
+    def setUpClass(cls):
+        cls.log_file = tempfile.TemporaryFile()
+        cls.process, cls.base_url = start_standin(
+                [os.path.join(support.FIXTURES_DIR, 'classify_xml')],
+                cls.log_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        stop_standin(cls.process)
+        cls.log_file.close()
+
+    def setUp(self):
+        self.addCleanup(support.reset_book_to_lcc)
+        BookToLCC.configure_classify(backend='xml', base_url=self.base_url)
+
+    def test_found(self):
+        self.assertEqual(BookToLCC.search_classify_auto('9780306406157', 5),
+                         ('Programming Python', 'Lutz, Mark',
+                          'QA76.73.P98 L88 2013'))
+
+    def test_several_works(self):
+        # The first work has no LCC, so the second one is used
+        self.assertEqual(BookToLCC.search_classify_auto('9780131103627', 5),
+                         ('The C Programming Language', 'Kernighan, Brian',
+                          'QA76.73.C15 K47 1988'))
+
+    def test_link_limit(self):
+        self.assertEqual(BookToLCC.search_classify_auto('9780131103627', 1),
+                         BookToLCC.BookRecord())
+
+    def test_not_found(self):
+        self.assertEqual(BookToLCC.search_classify_auto('9781234567897', 5),
+                         BookToLCC.BookRecord())
+
+    def test_not_recorded(self):
+        self.assertEqual(BookToLCC.search_classify_auto('9780201633610', 5),
+                         BookToLCC.BookRecord())
+
+    def test_title_and_author(self):
+        self.assertEqual(BookToLCC.search_classify_auto(
+                u'The C Programming Language', u'Kernighan', 5),
+                ('The C Programming Language', 'Kernighan, Brian',
+                 'QA76.73.C15 K47 1988'))
+
+    def test_nothing_logged(self):
+        BookToLCC.search_classify_auto('9780306406157', 5)
+        self.log_file.seek(0)
+        self.assertFalse([line for line in self.log_file
+                          if line.startswith('127.0.0.1')])
+
+
+class RecordTest(support.TempDirMixin, unittest.TestCase):
+# Records the responses of a stand-in for the real service with --record,
+# then replays them once it is gone
+
+    def setUp(self):
+        self.make_temp_dir()
+        with open(os.path.join(support.FIXTURES_DIR, 'classify_xml',
+                               'isbn=9780306406157.xml'), 'rb') as xml_file:
+            self.found = xml_file.read()
+        self.service = support.StubServer({
+            'isbn=9780306406157': (200, 'application/xml', self.found),
+            'isbn=9781234567897': (503, 'text/plain', 'Try again later'),
+        })
+        self.addCleanup(self.service.stop)
+        self.log_file = open(self.temp_path('standin.log'), 'w+')
+        self.addCleanup(self.log_file.close)
+        self.process, self.base_url = start_standin(
+                [self.temp_path('recordings'), '--record', '--service',
+                 self.service.url], self.log_file)
+        self.addCleanup(stop_standin, self.process)
+
+    def get(self, query):
+        response = BookToLCC.requests.get(self.base_url +
+                                          '/classify2/Classify?' + query,
+                                          timeout=10)
+        return response.status_code, response.content
+
+    def test_errors_are_recorded_and_replayed(self):
+        for i in xrange(2):
+            self.assertEqual(self.get('summary=true&isbn=9780306406157'),
+                             (200, self.found))
+            self.assertEqual(self.get('summary=true&isbn=9781234567897'),
+                             (503, 'Try again later'))
+            # The second time round, the recordings answer
+            self.service.stop()
+        self.assertEqual(len(self.service.requests), 2)
+        self.assertEqual(sorted(os.listdir(self.temp_path('recordings'))),
+                         ['isbn=9780306406157.xml', 'isbn=9781234567897.xml',
+                          'isbn=9781234567897.xml.status'])
+
+        # Only the errors are logged
+        stop_standin(self.process)
+        self.log_file.seek(0)
+        logged = [line.split('"')[2] for line in self.log_file
+                  if line.startswith('127.0.0.1')]
+        self.assertEqual(logged, [' 503 -\n', ' 503 -\n'])
+
+    def test_unreachable_service_is_not_recorded(self):
+        self.service.stop()
+        status, body = self.get('summary=true&isbn=9780306406157')
+        self.assertEqual(status, 502)
+        self.assertEqual(os.listdir(self.temp_path('recordings')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+import support
+import BookToLCC
+
+
+def long_summary_page():
+    # A book's summary followed by a long tail, with a result link at the
+    # very end
+    return support.summary_page(
+        'Programming Python', 'Lutz, Mark', 'QA76.73.P98 L88').replace(
+            '</body>', '<p>%s</p>\n<a href="/classify2/ClassifyDemo?wi=999">'
+            'Another edition</a></body>' % ('Boilerplate ' * 50000))
+
+
+class StreamingFetchTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.page = long_summary_page()
+        self.server = support.StubServer(default=(200, 'text/html',
+                                                  self.page))
+        self.addCleanup(self.server.stop)
+        self.addCleanup(support.reset_book_to_lcc)
+        settings = dict(BookToLCC.http_settings)
+        self.addCleanup(BookToLCC.configure_session, **settings)
+        BookToLCC.configure_scheduler()
+        self.addCleanup(BookToLCC.configure_scheduler)
+        self.cache = BookToLCC.open_response_cache(self.temp_path('cache.db'))
+        self.url = self.server.url + '/classify2/ClassifyDemo?wi=111'
+
+    def assertSummary(self, record):
+        self.assertEqual((record['title'], record['author'], record['lcc']),
+                         ('Programming Python', 'Lutz, Mark',
+                          'QA76.73.P98 L88'))
+
+    def test_stops_once_the_summary_is_read(self):
+        record = BookToLCC.fetch_classify_record(self.url)
+        self.assertSummary(record)
+        self.assertTrue(record['truncated'])
+        self.assertEqual(record['links'], [])
+        # Only the start of the page was read, and is kept as partial
+        page = self.cache.get(self.url, allow_partial=True)
+        self.assertTrue(page.partial)
+        self.assertTrue(len(page.content) < len(self.page) / 10,
+                        len(page.content))
+
+    def test_partial_page_answers_the_next_fetch(self):
+        BookToLCC.fetch_classify_record(self.url)
+        self.assertSummary(BookToLCC.fetch_classify_record(self.url))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_whole_page_read_for_links(self):
+        BookToLCC.fetch_classify_record(self.url)
+        record = BookToLCC.fetch_classify_record(self.url, need_links=True)
+        self.assertSummary(record)
+        self.assertFalse(record['truncated'])
+        self.assertEqual(record['links'], ['/classify2/ClassifyDemo?wi=999'])
+        self.assertEqual(len(self.server.requests), 2)
+        page = self.cache.get(self.url)
+        self.assertEqual(page.content, self.page)
+
+    def test_same_record_without_streaming(self):
+        BookToLCC.configure_session(stream=False)
+        record = BookToLCC.fetch_classify_record(self.url)
+        self.assertSummary(record)
+        self.assertFalse(record['truncated'])
+        self.assertEqual(record['links'], ['/classify2/ClassifyDemo?wi=999'])
+
+    def test_slot_given_back_after_stopping(self):
+        BookToLCC.fetch_classify_record(self.url)
+        self.assertEqual(BookToLCC.get_scheduler().stats()['active'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
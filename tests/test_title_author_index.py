@@ -0,0 +1,153 @@
+import csv
+import os
+import subprocess
+import sys
+import unittest
+
+import support
+import BookToLCC
+
+
+class TitleAuthorIndexTest(support.TempDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.addCleanup(support.reset_book_to_lcc)
+        with open(self.temp_path('TitleAuthorLCC.csv'), 'wb') as csv_file:
+            csv_file.write('Title,Author,Call_Number\n'
+                           'The C Programming Language,"Kernighan, Brian",'
+                           'QA76.73.C15 K47\n'
+                           'Programming Python,"Lutz, Mark",'
+                           'QA76.73.P98 L88\n')
+        self.index = BookToLCC.open_title_author_index(
+                self.temp_path('TitleAuthorLCC.csv'))
+
+    def test_search_finds_close_spellings(self):
+        match = self.index.search(u'The C Programing Language',
+                                  u'Kernighan, Brian')
+        self.assertEqual(match[:3], ('The C Programming Language',
+                                     'Kernighan, Brian', 'QA76.73.C15 K47'))
+        self.assertEqual(self.index.lookup(u'The C Programing Language',
+                                           u'Kernighan, Brian'), None)
+
+    def test_lookup_ignores_case_and_punctuation(self):
+        self.assertEqual(self.index.lookup(u'programming python!',
+                                           u'LUTZ, MARK'),
+                         ('Programming Python', 'Lutz, Mark',
+                          'QA76.73.P98 L88', 1.0))
+
+    def test_classified_index_from_title_author_index(self):
+        known = BookToLCC.open_classified_index()
+        known.load_title_author_index(self.index)
+        self.assertEqual(known.lookup_title_author(u'Programming Python',
+                                                   u'Lutz, Mark'),
+                         'QA76.73.P98 L88')
+        self.assertEqual(len(known.titles), 2)
+
+    def test_unattended_searches_need_the_same_title(self):
+        server = support.StubServer(default=(200, 'text/html',
+                                             support.list_page()))
+        self.addCleanup(server.stop)
+        BookToLCC.configure_classify(backend='html', base_url=server.url)
+
+        self.assertEqual(BookToLCC.search_classify_auto(
+                u'programming python', u'Lutz, Mark', 5),
+                ('Programming Python', 'Lutz, Mark', 'QA76.73.P98 L88'))
+        self.assertEqual(server.requests, [])
+
+        # A close spelling is searched for on the website instead
+        self.assertEqual(BookToLCC.search_classify_auto(
+                u'Programing Python', u'Lutz, Mark', 5),
+                BookToLCC.BookRecord())
+        self.assertEqual(len(server.requests), 1)
+
+    def test_aliases(self):
+        self.index.add_alias(u'Python Programming 4th ed', u'Lutz',
+                             'Programming Python', 'Lutz, Mark')
+        self.assertEqual(self.index.lookup(u'python programming 4th ed',
+                                           u'lutz')[:3],
+                         ('Programming Python', 'Lutz, Mark',
+                          'QA76.73.P98 L88'))
+        # Only indexed books get aliases, and books are not made aliases
+        self.index.add_alias(u'Typed', u'Author', 'Not Indexed', 'Author')
+        self.index.add_alias(u'The C Programming Language',
+                             u'Kernighan, Brian', 'Programming Python',
+                             'Lutz, Mark')
+        self.assertEqual(self.index.lookup(u'Typed', u'Author'), None)
+        self.assertEqual(self.index.lookup(u'The C Programming Language',
+                                           u'Kernighan, Brian')[2],
+                         'QA76.73.C15 K47')
+
+    def test_stored_spelling(self):
+        self.assertEqual(self.index.stored_spelling(u'programming python!',
+                                                    u'LUTZ MARK',
+                                                    'QA76.73.P98 L88'),
+                         ('Programming Python', 'Lutz, Mark'))
+        # A close spelling of a book with the same LCC
+        self.assertEqual(self.index.stored_spelling(
+                u'The C Programing Language', u'Kernighan, Brian',
+                'QA76.73.C15 K47'),
+                ('The C Programming Language', 'Kernighan, Brian'))
+        # Books with another LCC are not used
+        self.assertEqual(self.index.stored_spelling(u'Programming Python',
+                                                    u'Lutz, Mark', 'QA1'),
+                         (u'Programming Python', u'Lutz, Mark'))
+
+
+class BookCopiesTest(support.TempDirMixin, unittest.TestCase):
+# Runs classify_book_copies.py in a temporary directory, searching a
+# stand-in lcc_server.py service that finds no ISBNs
+
+    def setUp(self):
+        self.make_temp_dir()
+        self.server = support.StubServer({
+            'isbn=9781234567897': support.service_response(
+                404, found=False, title='', author='', lcc='',
+                how='searched'),
+            'author=schwartz': support.service_response(
+                200, found=True, title='Learning Perl',
+                author='Schwartz, Randal', lcc='QA76.73.P22 S38',
+                how='searched'),
+        })
+        self.addCleanup(self.server.stop)
+        with open(self.temp_path('TitleAuthorLCC.csv'), 'wb') as csv_file:
+            csv_file.write('"Title","Author","Call_Number"\n'
+                           '"Programming Python","Lutz, Mark",'
+                           '"QA76.73.P98 L88"\n')
+
+    def run_script(self, lines):
+        script = os.path.join(os.path.dirname(support.TESTS_DIR),
+                              'classify_book_copies.py')
+        process = subprocess.Popen([sys.executable, script, '--service',
+                                    self.server.url],
+                                   cwd=self.temp_dir, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        output = process.communicate(''.join(line + '\n'
+                                             for line in lines))[0]
+        self.assertEqual(process.returncode, 0, output)
+        return output
+
+    def read_rows(self):
+        with open(self.temp_path('TitleAuthorLCC.csv'), 'rb') as csv_file:
+            return list(csv.reader(csv_file))[2:]
+
+    def test_copies_use_the_stored_spelling(self):
+        self.run_script(['9781234567897', 'programming python!', 'LUTZ MARK',
+                         '2', 'exit'])
+        self.assertEqual(self.read_rows(),
+                         [['Programming Python', 'Lutz, Mark',
+                           'QA76.73.P98 L88']] * 2)
+
+    def test_copies_of_a_book_found_by_another_spelling(self):
+        output = self.run_script(['9781234567897', 'learning perl 7th ed',
+                                  'schwartz', '', '1',
+                                  '9781234567897', 'learning perl 7th ed',
+                                  'schwartz', '2', 'exit'])
+        self.assertIn('Already classified', output)
+        self.assertEqual(self.read_rows(),
+                         [['Learning Perl', 'Schwartz, Randal',
+                           'QA76.73.P22 S38']] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
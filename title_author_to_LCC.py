@@ -24,21 +24,61 @@ THE SOFTWARE.
 """
 
 from BookToLCC import *
+import sys
 
 
 #Number of links to search through
 link_limit = 5
 
-# Open or create CSV file for editing
-while(1):
-    try:
-        csv_file = open_isbn_csv("TitleAuthorLCC.csv")
-        break
-    except IOError:
-        print 'ERROR: Unable to open CSV file. '\
-        'Check to see if it is open in another program or if you '\
-        'have permissions to modify it. \nPress enter to continue.'
-        raw_input()
+# With --metrics, timings and counts for each stage of the lookups are
+# written to LookupMetrics.json and LookupMetrics.prom on exit
+if('--metrics' in sys.argv[1:]):
+    export_metrics("LookupMetrics.json", "LookupMetrics.prom")
+
+# With --xml, books are searched through the classify XML service rather
+# than its web pages
+if('--xml' in sys.argv[1:]):
+    configure_classify(backend='xml')
+
+# With --service http://host:8090, books are looked up through an
+# lcc_server.py service shared with the other stations
+service_url = service_url_argument(sys.argv)
+if(service_url is not None):
+    configure_classify(backend='service', base_url=service_url)
+
+# Keep classify.oclc.org responses so repeated lookups are answered locally
+open_response_cache("ClassifyCache.db")
+# Searches that found nothing are not repeated for a few days
+open_negative_cache("ClassifyMisses.db")
+
+# With --catalog, books are kept in Catalog.db instead of the CSV files
+# (export_catalog.py writes the CSV files from it)
+if('--catalog' in sys.argv[1:]):
+    catalog = open_catalog_store("Catalog.db")
+    known = catalog
+    open_title_author_index("TitleAuthorLCC.csv").load_catalog_store(catalog)
+else:
+    catalog = None
+    # Books already in the CSV file are answered without searching again
+    known = open_classified_index()
+    # and close spellings of them are offered before searching the website.
+    # TitleAuthorLCC.csv is read once for both.
+    title_index = open_title_author_index("TitleAuthorLCC.csv")
+    known.load_title_author_index(title_index)
+
+if(catalog is not None):
+    csv_file = catalog
+else:
+    # Open or create CSV file for editing
+    while(1):
+        try:
+            csv_file = BufferedCSVWriter(open_isbn_csv("TitleAuthorLCC.csv"))
+            break
+        except IOError:
+            print 'ERROR: Unable to open CSV file. '\
+            'Check to see if it is open in another program or if you '\
+            'have permissions to modify it. \nPress enter to continue.'
+            raw_input()
     
 # Main Loop
 while(1):
@@ -51,8 +91,15 @@ while(1):
     if(title == "exit"):
         break
         
+    # Books that were already saved don't need to be searched again
+    lcc = known.lookup_title_author(title, author)
+    if(lcc is not None):
+        print "    Already classified. LC Classification: " + lcc
+        continue
+        
     # Try to get the book's information
-    title, author, lcc = search_classify(title, author, link_limit)
+    typed_title, typed_author = title, author
+    title, author, lcc = search_classify_concurrent(title, author, link_limit)
     
     # Check if we actually got the book's information
     if(not validate_info(title, author, lcc)):
@@ -62,5 +109,7 @@ while(1):
         
     # Save the information to the CSV file
     write_title_author_csv(title, author, lcc, csv_file)
+    known.add_title_author(title, author, lcc)
+    known.add_title_author(typed_title, typed_author, lcc)
     
 csv_file.close()